@@ -1,24 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
 from typing import List
 from decimal import Decimal
 from ..database import get_db
 from ..models import Holding, Portfolio
 from ..schemas.holding import HoldingCreate, HoldingUpdate, HoldingResponse, HoldingBatch
+from ..services.alias_service import alias_service
+from ..utils.response_cache import response_cache
 
 router = APIRouter(prefix="/api", tags=["holdings"])
 
+holding_list_adapter = TypeAdapter(List[HoldingResponse])
+
 
 @router.get("/portfolios/{portfolio_id}/holdings", response_model=List[HoldingResponse])
 def get_holdings(portfolio_id: int, db: Session = Depends(get_db)):
     """获取持仓列表"""
-    # 检查组合是否存在
-    portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
-    if not portfolio:
-        raise HTTPException(status_code=404, detail="组合不存在")
+    def build():
+        # 检查组合是否存在
+        portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
+        if not portfolio:
+            raise HTTPException(status_code=404, detail="组合不存在")
+
+        holdings = db.query(Holding).filter(Holding.portfolio_id == portfolio_id).all()
+        return holding_list_adapter.dump_json(holding_list_adapter.validate_python(holdings))
 
-    holdings = db.query(Holding).filter(Holding.portfolio_id == portfolio_id).all()
-    return holdings
+    return response_cache.respond("holdings", (portfolio_id,), portfolio_id, build)
 
 
 @router.post("/portfolios/{portfolio_id}/holdings", response_model=HoldingResponse)
@@ -42,12 +50,15 @@ def create_holding(portfolio_id: int, holding: HoldingCreate, db: Session = Depe
 
     db_holding = Holding(
         portfolio_id=portfolio_id,
-        **holding.model_dump(),
+        **holding.model_dump(exclude={"cost_nav", "ocr_name"}),
         cost_nav=cost_nav
     )
     db.add(db_holding)
+    if holding.ocr_name:
+        alias_service.record(db, [(holding.ocr_name, holding.fund_code, holding.fund_name)])
     db.commit()
     db.refresh(db_holding)
+    response_cache.bump(portfolio_id)
     return db_holding
 
 
@@ -62,6 +73,12 @@ def create_holdings_batch(portfolio_id: int, batch: HoldingBatch, db: Session =
     created_count = 0
     skipped_count = 0
 
+    # 已存在而跳过的持仓同样是用户确认过的识别结果
+    alias_service.record(db, [
+        (holding.ocr_name, holding.fund_code, holding.fund_name)
+        for holding in batch.holdings if holding.ocr_name
+    ])
+
     for holding in batch.holdings:
         # 检查是否已存在
         existing = db.query(Holding).filter(
@@ -78,13 +95,15 @@ def create_holdings_batch(portfolio_id: int, batch: HoldingBatch, db: Session =
 
         db_holding = Holding(
             portfolio_id=portfolio_id,
-            **holding.model_dump(),
+            **holding.model_dump(exclude={"cost_nav", "ocr_name"}),
             cost_nav=cost_nav
         )
         db.add(db_holding)
         created_count += 1
 
     db.commit()
+    if created_count:
+        response_cache.bump(portfolio_id)
     return {
         "message": "批量导入完成",
         "created": created_count,
@@ -113,6 +132,7 @@ def update_holding(holding_id: int, holding_update: HoldingUpdate, db: Session =
 
     db.commit()
     db.refresh(holding)
+    response_cache.bump(holding.portfolio_id)
     return holding
 
 
@@ -123,6 +143,8 @@ def delete_holding(holding_id: int, db: Session = Depends(get_db)):
     if not holding:
         raise HTTPException(status_code=404, detail="持仓不存在")
 
+    portfolio_id = holding.portfolio_id
     db.delete(holding)
     db.commit()
+    response_cache.bump(portfolio_id)
     return {"message": "删除成功"}
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
-import cv2
-import numpy as np
-from ..services.ocr_service import ocr_service
+from pydantic_core import to_json
+from typing import List, Dict, Optional
+from functools import partial
+from contextlib import AsyncExitStack
+import asyncio
+import time
+from ..config import settings
+from ..services.ocr_service import ocr_service, OCRNotReadyError, OCRBusyError
+from ..services.ocr_jobs import ocr_job_service, FINISHED_STATES
+from ..utils.image_io import EncodedImage, ImageDecodeError, ImageTooLargeError
+from ..utils.log import enable_debug_request
 
 router = APIRouter(prefix="/api/ocr", tags=["ocr"])
 
@@ -12,20 +20,44 @@ class OCRBase64Request(BaseModel):
     image: str
 
 
-@router.post("/upload")
-async def upload_ocr(file: UploadFile = File(...)):
-    """上传图片进行OCR识别"""
+# 事件流轮询任务状态的间隔和心跳间隔（秒）
+EVENT_POLL_INTERVAL = 0.5
+EVENT_HEARTBEAT_INTERVAL = 15
+
+
+async def debug_request(debug: bool = Query(False, description="在服务端日志中输出识别出的全部文本（需开启OCR_DEBUG_ENABLED）")):
+    """按请求开启识别过程的调试日志
+
+    需为异步依赖：与接口在同一个上下文中执行，设置的上下文变量对后续识别（包括后台任务）可见。
+    """
+    if debug and settings.OCR_DEBUG_ENABLED:
+        enable_debug_request()
+
+
+def _decode_error(e: ValueError) -> HTTPException:
+    status_code = 413 if isinstance(e, ImageTooLargeError) else 400
+    return HTTPException(status_code=status_code, detail=str(e))
+
+
+async def _open_upload(file: UploadFile) -> EncodedImage:
+    """在线程中读取上传文件，大文件读取不阻塞事件循环"""
+    try:
+        return await asyncio.to_thread(EncodedImage.from_upload, file, settings.OCR_MAX_UPLOAD_MB * 1024 * 1024)
+    except (ImageDecodeError, ImageTooLargeError) as e:
+        raise _decode_error(e)
+
+
+async def _open_base64(data: str) -> EncodedImage:
     try:
-        # 读取文件
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        return await asyncio.to_thread(EncodedImage.from_base64, data, settings.OCR_MAX_UPLOAD_MB * 1024 * 1024)
+    except (ImageDecodeError, ImageTooLargeError) as e:
+        raise _decode_error(e)
 
-        if image is None:
-            raise HTTPException(status_code=400, detail="无法读取图片")
 
-        # OCR识别
-        results = await ocr_service.recognize_from_image(image)
+async def _recognize(encoded: EncodedImage) -> Dict:
+    """经过像素预算准入后解码并识别"""
+    try:
+        results = await ocr_service.recognize_from_encoded(encoded)
 
         return {
             "success": True,
@@ -33,21 +65,142 @@ async def upload_ocr(file: UploadFile = File(...)):
             "data": results
         }
 
+    except (ImageDecodeError, ImageTooLargeError) as e:
+        raise _decode_error(e)
+    except (OCRNotReadyError, OCRBusyError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR识别失败: {str(e)}")
 
 
-@router.post("/upload-base64")
-async def upload_ocr_base64(request: OCRBase64Request):
-    """上传base64图片进行OCR识别"""
+async def _submit_job(encoded: EncodedImage) -> Dict:
+    """准入并解码后创建识别任务，像素预算在任务结束时释放"""
+    admission = AsyncExitStack()
     try:
-        results = await ocr_service.recognize_from_base64(request.image)
+        image = await admission.enter_async_context(ocr_service.admit(encoded))
+    except (ImageDecodeError, ImageTooLargeError) as e:
+        raise _decode_error(e)
+    except OCRBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        job = await ocr_job_service.submit(image, on_finish=admission.aclose)
+    except Exception:
+        await admission.aclose()
+        raise
+    return ocr_job_service.summary(job)
 
-        return {
-            "success": True,
-            "count": len(results),
-            "data": results
-        }
 
+@router.post("/upload", dependencies=[Depends(debug_request)])
+async def upload_ocr(file: UploadFile = File(...)):
+    """上传图片进行OCR识别"""
+    return await _recognize(await _open_upload(file))
+
+
+@router.post("/upload-batch", dependencies=[Depends(debug_request)])
+async def upload_ocr_batch(files: List[UploadFile] = File(...)):
+    """上传多张截图，并行识别并合并结果
+
+    返回的 data 与单张识别格式相同，可直接用于持仓批量导入；
+    images 按上传顺序给出每张图片识别到的基金数或失败原因。
+    """
+    if len(files) > settings.OCR_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"单次最多上传 {settings.OCR_MAX_IMAGES} 张图片")
+    max_bytes = settings.OCR_MAX_UPLOAD_MB * 1024 * 1024
+
+    try:
+        result = await ocr_service.recognize_from_images(
+            [partial(asyncio.to_thread, EncodedImage.from_upload, file, max_bytes) for file in files]
+        )
+    except (OCRNotReadyError, OCRBusyError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR识别失败: {str(e)}")
+
+    return {
+        "success": True,
+        "count": len(result["data"]),
+        "data": result["data"],
+        "images": [
+            {"filename": file.filename, **summary}
+            for file, summary in zip(files, result["images"])
+        ]
+    }
+
+
+@router.post("/upload-base64", dependencies=[Depends(debug_request)])
+async def upload_ocr_base64(request: OCRBase64Request):
+    """上传base64图片进行OCR识别"""
+    return await _recognize(await _open_base64(request.image))
+
+
+@router.post("/jobs", status_code=202, dependencies=[Depends(debug_request)])
+async def create_ocr_job(file: UploadFile = File(...)):
+    """提交图片创建异步识别任务，立即返回任务ID"""
+    return await _submit_job(await _open_upload(file))
+
+
+@router.post("/jobs/base64", status_code=202, dependencies=[Depends(debug_request)])
+async def create_ocr_job_base64(request: OCRBase64Request):
+    """提交base64图片创建异步识别任务"""
+    return await _submit_job(await _open_base64(request.image))
+
+
+@router.get("/jobs/{job_id}")
+def get_ocr_job(job_id: str):
+    """查询识别任务状态、已识别的部分结果和最终结果"""
+    job = ocr_job_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return ocr_job_service.summary(job)
+
+
+def _format_event(event: Dict) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (
+        event["seq"], event["event"].encode(), to_json(event["data"])
+    )
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_ocr_job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """以Server-Sent Events推送识别进度
+
+    事件: segmented / segment / extracted / enriching / done / failed。
+    断线重连时浏览器会带上 Last-Event-ID，只推送之后的事件。
+    """
+    if not await asyncio.to_thread(ocr_job_service.get, job_id):
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    try:
+        start_seq = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        start_seq = 0
+
+    def poll(last_seq: int):
+        """读取任务和新事件，在线程中执行"""
+        job = ocr_job_service.get(job_id)
+        return job, (ocr_job_service.events_since(job, last_seq) if job is not None else [])
+
+    async def event_stream():
+        last_seq = start_seq
+        last_sent = time.monotonic()
+        while True:
+            job, events = await asyncio.to_thread(poll, last_seq)
+            if job is None:
+                yield _format_event({"seq": last_seq + 1, "event": "failed", "data": {"detail": "任务不存在或已过期"}})
+                return
+            for event in events:
+                yield _format_event(event)
+                last_seq = event["seq"]
+                last_sent = time.monotonic()
+            if job["status"] in FINISHED_STATES:
+                return
+            if time.monotonic() - last_sent > EVENT_HEARTBEAT_INTERVAL:
+                # 注释行作为心跳，防止代理断开空闲连接
+                yield b": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,18 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
 from typing import List
 from ..database import get_db
 from ..models import Portfolio
 from ..schemas.portfolio import PortfolioCreate, PortfolioUpdate, PortfolioResponse
+from ..utils.response_cache import response_cache
 
 router = APIRouter(prefix="/api/portfolios", tags=["portfolios"])
 
+portfolio_list_adapter = TypeAdapter(List[PortfolioResponse])
+
 
 @router.get("", response_model=List[PortfolioResponse])
 def get_portfolios(db: Session = Depends(get_db)):
     """获取所有组合"""
-    portfolios = db.query(Portfolio).all()
-    return portfolios
+    def build():
+        portfolios = db.query(Portfolio).all()
+        return portfolio_list_adapter.dump_json(portfolio_list_adapter.validate_python(portfolios))
+
+    return response_cache.respond("portfolios", (), response_cache.PORTFOLIO_LIST, build)
 
 
 @router.post("", response_model=PortfolioResponse)
@@ -22,16 +29,20 @@ def create_portfolio(portfolio: PortfolioCreate, db: Session = Depends(get_db)):
     db.add(db_portfolio)
     db.commit()
     db.refresh(db_portfolio)
+    response_cache.bump(response_cache.PORTFOLIO_LIST)
     return db_portfolio
 
 
 @router.get("/{portfolio_id}", response_model=PortfolioResponse)
 def get_portfolio(portfolio_id: int, db: Session = Depends(get_db)):
     """获取组合详情"""
-    portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
-    if not portfolio:
-        raise HTTPException(status_code=404, detail="组合不存在")
-    return portfolio
+    def build():
+        portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
+        if not portfolio:
+            raise HTTPException(status_code=404, detail="组合不存在")
+        return PortfolioResponse.model_validate(portfolio).model_dump_json().encode()
+
+    return response_cache.respond("portfolio", (portfolio_id,), portfolio_id, build)
 
 
 @router.put("/{portfolio_id}", response_model=PortfolioResponse)
@@ -47,6 +58,7 @@ def update_portfolio(portfolio_id: int, portfolio_update: PortfolioUpdate, db: S
 
     db.commit()
     db.refresh(portfolio)
+    response_cache.bump(portfolio_id, response_cache.PORTFOLIO_LIST)
     return portfolio
 
 
@@ -59,4 +71,5 @@ def delete_portfolio(portfolio_id: int, db: Session = Depends(get_db)):
 
     db.delete(portfolio)
     db.commit()
+    response_cache.bump(portfolio_id, response_cache.PORTFOLIO_LIST)
     return {"message": "删除成功"}
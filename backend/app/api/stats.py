@@ -1,36 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models import Portfolio
 from ..schemas.stats import RealtimeStats, HistoryStats
 from ..services.stats_service import stats_service
+from ..utils.response_cache import response_cache
+from ..utils.serialization import negotiate, encode_realtime, encode_history, encoded_response
+from ..utils import timing
 
 router = APIRouter(prefix="/api/portfolios", tags=["stats"])
 
 
 @router.get("/{portfolio_id}/realtime", response_model=RealtimeStats)
-async def get_realtime_stats(portfolio_id: int, db: Session = Depends(get_db)):
-    """获取实时收益统计"""
+async def get_realtime_stats(
+    portfolio_id: int,
+    request: Request,
+    deadline: Optional[float] = Query(default=None, gt=0, le=60, description="最长等待时间（秒）"),
+    db: Session = Depends(get_db)
+):
+    """获取实时收益统计
+
+    支持通过Accept头协商紧凑格式（application/vnd.fund.columnar+json 或 application/x-msgpack）。
+    指定 deadline 时到时即返回已取到的估值，其余持仓标记为 stale/missing，估值在后台继续获取。
+    """
     # 检查组合是否存在
     portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
     if not portfolio:
         raise HTTPException(status_code=404, detail="组合不存在")
 
-    stats = await stats_service.calculate_realtime_stats(db, portfolio_id)
-    return stats
+    stats = await stats_service.calculate_realtime_stats(db, portfolio_id, deadline)
+    media_type = negotiate(request)
+    with timing.span("serialize"):
+        body = encode_realtime(stats, media_type)
+    return encoded_response(body, media_type)
 
 
 @router.get("/{portfolio_id}/history", response_model=HistoryStats)
 def get_history_stats(
     portfolio_id: int,
+    request: Request,
     days: int = Query(default=30, ge=1, le=365),
     db: Session = Depends(get_db)
 ):
     """获取历史收益统计"""
-    # 检查组合是否存在
-    portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
-    if not portfolio:
-        raise HTTPException(status_code=404, detail="组合不存在")
+    media_type = negotiate(request)
+
+    def build():
+        # 检查组合是否存在
+        portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
+        if not portfolio:
+            raise HTTPException(status_code=404, detail="组合不存在")
+
+        stats = stats_service.get_history_stats(db, portfolio_id, days)
+        return encode_history(stats, media_type)
 
-    stats = stats_service.get_history_stats(db, portfolio_id, days)
-    return stats
+    response = response_cache.respond("history", (portfolio_id, days, media_type), portfolio_id,
+                                      build, media_type=media_type)
+    response.headers["Vary"] = "Accept"
+    return response
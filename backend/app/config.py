@@ -6,6 +6,11 @@ class Settings(BaseSettings):
     # 应用配置
     APP_NAME: str = "基金估值系统"
     DEBUG: bool = True
+    LOG_LEVEL: str = "INFO"  # 日志级别，DEBUG 时输出识别过程的详细信息
+    LOG_FORMAT: str = "text"  # 日志格式: text / json（每行一条JSON）
+    SERVER_TIMING_ENABLED: bool = True  # 通过 Server-Timing 响应头返回各阶段耗时
+    PROFILE_ENABLED: bool = False  # 允许带 ?profile=1 的请求返回性能分析报告（仅用于排查问题）
+    OCR_DEBUG_ENABLED: bool = False  # 允许带 ?debug=1 的识别请求在日志中输出识别出的全部文本（含持仓信息，仅用于排查问题）
 
     # 数据库
     DATABASE_URL: str = "sqlite:///./data/database.db"
@@ -13,14 +18,52 @@ class Settings(BaseSettings):
     # OCR
     OCR_USE_GPU: bool = False
     OCR_LANG: str = "ch"
+    OCR_ENGINE: str = "paddle"  # 推理引擎: paddle / fake（不加载模型，用于测试和压测）
+    OCR_ENGINE_PROFILE: str = "default"  # 推理档位: default / accurate / cpu / cpu_fast
+    OCR_CPU_THREADS: int = 0  # 每个工作者的推理线程数，0 表示按档位设置
+    OCR_WARMUP: bool = True  # 启动时在后台加载模型
+    OCR_READY_TIMEOUT: int = 300  # 请求等待模型就绪的最长时间（秒）
+    OCR_RETRY_INTERVAL: int = 60  # 模型加载失败后，请求至少间隔该秒数才触发重新加载
+    OCR_WORKER_MODE: str = "thread"  # 推理工作池类型: thread / process
+    OCR_WORKERS: int = 1  # 工作者数量，每个工作者持有一份模型
+    OCR_MAX_QUEUE: int = 8  # 排队等待的推理任务上限
+    OCR_QUEUE_TIMEOUT: int = 30  # 排队等待超时（秒）
+    OCR_BATCH_SIZE: int = 8  # 单次批量推理的最大图片数
+    OCR_BATCH_WINDOW_MS: int = 10  # 凑批等待时间（毫秒）
+    OCR_MAX_UPLOAD_MB: int = 30  # 单张上传图片的大小上限（编码后）
+    OCR_MAX_IMAGE_MP: int = 50  # 单张图片解码后的像素上限（百万像素）
+    OCR_OVERSIZE_ACTION: str = "downscale"  # 超过像素上限的图片: downscale（解码时缩小） / reject
+    OCR_PIXEL_BUDGET_MP: int = 150  # 同时解码和识别的图片像素总量上限（百万像素）
+    OCR_ADMISSION_TIMEOUT: int = 30  # 超出像素预算时排队等待的最长时间（秒）
+    OCR_MAX_IMAGES: int = 20  # 多图识别单次最多上传的图片数
+    OCR_MULTI_IMAGE_CONCURRENCY: int = 2  # 多图识别时同时解码和识别的图片数
+    # 图片预处理配置: off / accurate / balanced / fast；有损的配置应先用 bench_preprocess --ocr 在实际截图上测过召回率再启用
+    OCR_PREPROCESS_PROFILE: str = "off"
+    OCR_JOB_STORE_PATH: str = "./data/ocr_jobs.db"  # 异步识别任务存储
+    OCR_JOB_TTL: int = 3600  # 识别任务保留时间（秒）
+    OCR_CACHE_ENABLED: bool = True  # 按图片内容缓存识别结果
+    OCR_CACHE_PATH: str = "./data/ocr_cache.db"
+    OCR_CACHE_MAX_MB: int = 64  # 缓存大小上限，超出后淘汰最久未访问的条目
+    OCR_CACHE_PHASH: bool = False  # 是否按感知哈希匹配重新压缩过的相同截图
+    OCR_CACHE_PHASH_DISTANCE: int = 6  # 感知哈希（256位）允许的最大汉明距离
 
     # 基金API
     FUND_API_TIMEOUT: int = 10
     FUND_CACHE_TTL: int = 300
+    FUND_SEARCH_MISS_TTL: int = 600  # 按名称搜索无匹配结果的缓存时间（秒），避免反复搜索识别错误的名称
+
+    # 缓存后端：memory 为进程内缓存，sqlite 为多worker共享缓存
+    CACHE_BACKEND: str = "memory"
+    CACHE_SQLITE_PATH: str = "./data/cache.db"
+    CACHE_SQLITE_BUSY_TIMEOUT: float = 0.05  # 数据库被其他worker锁住时读写估值缓存最多等待的秒数，超时按未命中处理
+
+    # 响应缓存（组合列表、持仓列表、历史收益）
+    RESPONSE_CACHE_SIZE: int = 512
 
     # 定时任务
     ENABLE_SCHEDULER: bool = True
     UPDATE_INTERVAL: int = 5
+    SCHEDULER_LOCK_PATH: str = "./data/scheduler.lock"
 
     class Config:
         env_file = ".env"
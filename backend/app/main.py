@@ -1,16 +1,46 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from .database import engine, Base
 from .api import portfolios, holdings, stats, ocr
+from .services.fund_service import fund_service
+from .services.ocr_service import ocr_service
+from .utils.image_io import UploadSizeLimitMiddleware
+from .utils.metrics import MetricsMiddleware, instrument_engine, render_metrics
+from .utils.log import setup_logging, shutdown_logging
+from .utils import timing
+from .tasks.quote_refresher import quote_refresher
+
+setup_logging()
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
+instrument_engine(engine)
+timing.instrument_engine(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 后台预加载OCR模型
+    if settings.OCR_WARMUP:
+        ocr_service.start_warmup()
+    # 启动后台任务
+    if settings.ENABLE_SCHEDULER:
+        quote_refresher.start()
+    yield
+    await quote_refresher.stop()
+    await fund_service.shutdown()
+    ocr_service.shutdown()
+    shutdown_logging()
+
 
 # 创建FastAPI应用
 app = FastAPI(
     title=settings.APP_NAME,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 # CORS配置
@@ -22,6 +52,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# OCR上传请求体上限：base64编码膨胀约4/3，另留表单字段的余量
+_upload_limit = settings.OCR_MAX_UPLOAD_MB * 1024 * 1024
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        f"{ocr.router.prefix}/upload-batch": _upload_limit * settings.OCR_MAX_IMAGES + 64 * 1024,
+        ocr.router.prefix: _upload_limit * 4 // 3 + 64 * 1024,
+    },
+)
+
+# 各阶段耗时（Server-Timing）和按请求的性能分析
+if settings.SERVER_TIMING_ENABLED or settings.PROFILE_ENABLED:
+    app.add_middleware(timing.ServerTimingMiddleware)
+
+# 请求指标，放在最外层以统计被上传大小限制拒绝的请求
+app.add_middleware(MetricsMiddleware)
+
 # 注册路由
 app.include_router(portfolios.router)
 app.include_router(holdings.router)
@@ -36,4 +83,10 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "ocr": ocr_service.status()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus文本格式的指标"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -2,5 +2,6 @@ from .portfolio import Portfolio
 from .holding import Holding
 from .fund import Fund
 from .history import History
+from .fund_alias import FundAlias
 
-__all__ = ["Portfolio", "Holding", "Fund", "History"]
+__all__ = ["Portfolio", "Holding", "Fund", "History", "FundAlias"]
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class FundAlias(Base):
+    """OCR识别出的基金名称与基金代码的对应关系，由用户确认导入的持仓记录"""
+    __tablename__ = "fund_aliases"
+
+    # 规范化后的识别名称
+    alias_key = Column(String(200), primary_key=True, index=True)
+    alias = Column(String(200), nullable=False)
+    fund_code = Column(String(20), nullable=False)
+    fund_name = Column(String(200), nullable=True)
+    # 被确认的次数
+    confirmed = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
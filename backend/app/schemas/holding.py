@@ -13,7 +13,8 @@ class HoldingBase(BaseModel):
 
 
 class HoldingCreate(HoldingBase):
-    pass
+    # 从OCR结果导入时识别出的基金名称，用于记录名称与代码的对应关系
+    ocr_name: Optional[str] = None
 
 
 class HoldingUpdate(BaseModel):
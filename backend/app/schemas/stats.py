@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from decimal import Decimal
 from datetime import date
 
@@ -13,6 +13,10 @@ class HoldingStats(BaseModel):
     value: Decimal
     profit: Decimal
     profit_rate: Decimal
+    # 估值状态：fresh 实时估值；stale 未能及时获取，使用最后一次的估值；missing 没有估值，按成本计算
+    status: str = "fresh"
+    # 所用估值的时间
+    quote_time: Optional[str] = None
 
 
 class RealtimeStats(BaseModel):
@@ -24,6 +28,8 @@ class RealtimeStats(BaseModel):
     total_profit_rate: Decimal
     holdings: List[HoldingStats]
     updated_at: str
+    # 是否有持仓未使用实时估值（status 不为 fresh）
+    partial: bool = False
 
 
 class HistoryPoint(BaseModel):
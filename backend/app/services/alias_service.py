@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from ..database import SessionLocal
+from ..models import FundAlias
+
+logger = logging.getLogger(__name__)
+
+# 支持 INSERT ... ON CONFLICT DO UPDATE 的数据库
+_DIALECT_INSERT = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def normalize_alias(name: Optional[str]) -> str:
+    """规范化识别出的基金名称，作为别名表的键
+
+    统一全角括号、去掉空白、不完整的括号后缀和末尾省略号，
+    同一截图位置被截断成的名称（如“易方达蓝筹精选混…”）得到相同的键。
+    """
+    if not name:
+        return ""
+    name = "".join(name.split()).replace('（', '(').replace('）', ')')
+    if '(' in name and ')' not in name:
+        name = name.split('(')[0]
+    return name.rstrip('.。…')
+
+
+class AliasService:
+    """OCR名称别名表
+
+    用户从识别结果导入持仓时记录“识别名称 -> 基金代码”，
+    之后的识别先按规范化名称查表，命中的基金不再调用搜索接口。
+    """
+
+    def _lookup(self, keys: List[str]) -> Dict[str, Dict]:
+        db = SessionLocal()
+        try:
+            rows = db.query(FundAlias).filter(FundAlias.alias_key.in_(keys)).all()
+            return {row.alias_key: {"fund_code": row.fund_code, "fund_name": row.fund_name} for row in rows}
+        finally:
+            db.close()
+
+    async def lookup(self, names: Iterable[str]) -> Dict[str, Dict]:
+        """按识别名称批量查询别名表
+
+        Returns:
+            {识别名称: {"fund_code": 代码, "fund_name": 名称}}，只包含命中的名称
+        """
+        keys = {name: normalize_alias(name) for name in names if name}
+        keys = {name: key for name, key in keys.items() if len(key) >= 2}
+        if not keys:
+            return {}
+        try:
+            found = await asyncio.to_thread(self._lookup, list(set(keys.values())))
+        except Exception as e:
+            # 别名表只是加速手段，查询失败时按未命中处理
+            logger.warning("查询基金别名失败: %s", e)
+            return {}
+        return {name: found[key] for name, key in keys.items() if key in found}
+
+    def record(self, db: Session, pairs: Iterable[Tuple[str, str, Optional[str]]]):
+        """记录用户确认的 (识别名称, 基金代码, 基金名称)，随调用方的事务一起提交
+
+        同一名称以最近一次确认的代码为准。使用 INSERT ... ON CONFLICT 一条语句写入，
+        并发导入同一名称时不会主键冲突；写入在保存点中执行，失败只记录日志，不影响导入本身。
+        """
+        latest = {}
+        for ocr_name, fund_code, fund_name in pairs:
+            key = normalize_alias(ocr_name)
+            if len(key) >= 2 and fund_code:
+                latest[key] = (ocr_name, fund_code, fund_name)
+        if not latest:
+            return
+
+        insert = _DIALECT_INSERT.get(db.get_bind().dialect.name)
+        if insert is None:
+            logger.warning("数据库 %s 不支持别名表的冲突更新，跳过记录", db.get_bind().dialect.name)
+            return
+
+        stmt = insert(FundAlias).values([
+            {"alias_key": key, "alias": ocr_name, "fund_code": fund_code, "fund_name": fund_name, "confirmed": 1}
+            for key, (ocr_name, fund_code, fund_name) in latest.items()
+        ])
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FundAlias.alias_key],
+            set_={
+                "alias": excluded.alias,
+                "fund_code": excluded.fund_code,
+                "fund_name": func.coalesce(excluded.fund_name, FundAlias.fund_name),
+                # 确认为其他代码时重新计数
+                "confirmed": case((FundAlias.fund_code == excluded.fund_code, FundAlias.confirmed + 1), else_=1),
+                "updated_at": func.now(),
+            },
+        )
+        # 先写入调用方待提交的对象，其错误照常抛出
+        db.flush()
+        try:
+            with db.begin_nested():
+                db.execute(stmt)
+        except SQLAlchemyError as e:
+            logger.warning("记录基金别名失败: %s", e)
+
+
+# 全局实例
+alias_service = AliasService()
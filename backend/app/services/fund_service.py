@@ -1,20 +1,53 @@
 import aiohttp
+import logging
 import asyncio
 import re
 import json
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+import time
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
 from decimal import Decimal
 from ..config import settings
+from ..utils.cache_backend import CacheBackend, CacheBusyError, create_cache_backend
+from ..utils.metrics import CACHE_REQUESTS, UPSTREAM_DURATION, UPSTREAM_ERRORS, UPSTREAM_REJECTED, Gauge
+from ..utils import timing
+
+logger = logging.getLogger(__name__)
+
+# 熔断状态在缓存后端中的键，多worker共享
+CIRCUIT_BREAKER_KEY = "circuit_breaker"
+
+JSONP_PATTERN = re.compile(r'jsonpgz\((.*?)\)')
+
+
+def parse_quote(text: str) -> Optional[Dict]:
+    """解析估值接口返回的jsonp: jsonpgz({...})，格式不符时返回None"""
+    match = JSONP_PATTERN.search(text)
+    if not match:
+        return None
+    data = json.loads(match.group(1))
+    return {
+        "fund_code": data.get("fundcode"),
+        "fund_name": data.get("name"),
+        "last_nav": Decimal(data.get("dwjz", "0")),
+        "estimated_nav": Decimal(data.get("gsz", "0")),
+        "estimated_growth_rate": Decimal(data.get("gszzl", "0")),
+        "estimated_time": data.get("gztime"),
+        "last_nav_date": data.get("jzrq")
+    }
 
 
 class FundService:
-    def __init__(self):
-        self.cache: Dict[str, Dict] = {}
-        self.cache_timestamps: Dict[str, datetime] = {}
+    def __init__(self, cache: Optional[CacheBackend] = None):
+        self.cache = cache or create_cache_backend("fund")
         self.semaphore = asyncio.Semaphore(5)  # 并发限制
         self.failure_count = 0
-        self.circuit_breaker_until: Optional[datetime] = None
+        # 正在从上游获取的基金代码及其结果，并发请求同一基金时共用一次获取
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 后台获取任务，保留引用避免被回收
+        self._background: set = set()
+        # 正在搜索的关键词及其结果，预取和补充信息同时搜索同一名称时共用一次请求
+        self._search_inflight: Dict[str, asyncio.Future] = {}
 
     def _is_trading_time(self) -> bool:
         """判断是否交易时间"""
@@ -31,127 +64,251 @@ class FundService:
             return 300  # 交易时间5分钟
         return 3600  # 非交易时间1小时
 
-    def _is_cache_valid(self, fund_code: str) -> bool:
-        """检查缓存是否有效"""
-        if fund_code not in self.cache:
+    def _is_entry_valid(self, entry, ttl: Optional[int] = None) -> bool:
+        """检查缓存条目 (值, 写入时间) 是否有效"""
+        if not entry:
             return False
-        cache_time = self.cache_timestamps.get(fund_code)
-        if not cache_time:
-            return False
-        ttl = self._get_cache_ttl()
-        return (datetime.now() - cache_time).total_seconds() < ttl
+        if ttl is None:
+            ttl = self._get_cache_ttl()
+        return time.time() - entry[1] < ttl
+
+    def _cache_get(self, key: str) -> Optional[Tuple]:
+        """读取缓存条目，共享缓存的数据库忙时按未命中处理，不在事件循环中长时间等待"""
+        try:
+            return self.cache.get(key)
+        except CacheBusyError:
+            logger.debug("缓存数据库忙，按未命中处理: %s", key)
+            return None
+
+    def _cache_get_many(self, keys: List[str]) -> Dict[str, Tuple]:
+        try:
+            return self.cache.get_many(keys)
+        except CacheBusyError:
+            logger.debug("缓存数据库忙，%d 个基金按未命中处理", len(keys))
+            return {}
+
+    def _cache_set(self, key: str, value):
+        """写入缓存，共享缓存的数据库忙时跳过"""
+        try:
+            self.cache.set(key, value)
+        except CacheBusyError:
+            logger.debug("缓存数据库忙，跳过写入: %s", key)
+
+    def _is_circuit_open(self) -> bool:
+        """熔断检查"""
+        entry = self._cache_get(CIRCUIT_BREAKER_KEY)
+        return bool(entry) and time.time() < entry[0]
 
     async def _fetch_from_api(self, session: aiohttp.ClientSession, fund_code: str) -> Optional[Dict]:
         """从天天基金API获取数据"""
         # 熔断检查
-        if self.circuit_breaker_until and datetime.now() < self.circuit_breaker_until:
+        if self._is_circuit_open():
+            UPSTREAM_REJECTED.inc("quote")
             return None
 
         url = f"http://fundgz.1234567.com.cn/js/{fund_code}.js"
 
         async with self.semaphore:
             try:
-                await asyncio.sleep(0.2)  # 请求间隔200ms
+                with timing.span("ratelimit"):
+                    await asyncio.sleep(0.2)  # 请求间隔200ms
+                start = time.perf_counter()
                 async with session.get(url, timeout=aiohttp.ClientTimeout(total=settings.FUND_API_TIMEOUT)) as response:
                     if response.status == 200:
                         text = await response.text()
-                        # 解析jsonp: jsonpgz({...})
-                        match = re.search(r'jsonpgz\((.*?)\)', text)
-                        if match:
-                            data = json.loads(match.group(1))
+                        elapsed = time.perf_counter() - start
+                        UPSTREAM_DURATION.observe(elapsed, "quote")
+                        timing.record("upstream", elapsed)
+                        data = parse_quote(text)
+                        if data:
                             self.failure_count = 0  # 重置失败计数
-                            return {
-                                "fund_code": data.get("fundcode"),
-                                "fund_name": data.get("name"),
-                                "last_nav": Decimal(data.get("dwjz", "0")),
-                                "estimated_nav": Decimal(data.get("gsz", "0")),
-                                "estimated_growth_rate": Decimal(data.get("gszzl", "0")),
-                                "estimated_time": data.get("gztime"),
-                                "last_nav_date": data.get("jzrq")
-                            }
+                            return data
+                    else:
+                        UPSTREAM_ERRORS.inc("quote")
             except Exception as e:
-                print(f"获取基金 {fund_code} 失败: {e}")
+                logger.warning("获取基金 %s 失败: %s", fund_code, e)
+                UPSTREAM_ERRORS.inc("quote")
                 self.failure_count += 1
                 if self.failure_count >= 3:
                     # 触发熔断
-                    self.circuit_breaker_until = datetime.now() + timedelta(minutes=10)
-                    print("API熔断触发，暂停10分钟")
+                    self._cache_set(CIRCUIT_BREAKER_KEY, time.time() + 600)
+                    logger.error("API熔断触发，暂停10分钟")
                 return None
 
     async def get_fund_realtime(self, fund_code: str) -> Optional[Dict]:
         """获取单个基金实时数据"""
         # 检查缓存
-        if self._is_cache_valid(fund_code):
-            return self.cache[fund_code]
+        with timing.span("cache"):
+            entry = self._cache_get(fund_code)
+        if self._is_entry_valid(entry):
+            CACHE_REQUESTS.inc("quote", "hit")
+            return entry[0]
+        CACHE_REQUESTS.inc("quote", "miss")
 
         # 从API获取
         async with aiohttp.ClientSession() as session:
             data = await self._fetch_from_api(session, fund_code)
             if data:
-                self.cache[fund_code] = data
-                self.cache_timestamps[fund_code] = datetime.now()
+                self._cache_set(fund_code, data)
                 return data
 
             # 返回缓存的旧数据（如果有）
-            return self.cache.get(fund_code)
-
-    async def get_funds_realtime_batch(self, fund_codes: List[str]) -> Dict[str, Dict]:
-        """批量获取基金实时数据"""
-        results = {}
-
-        # 去重
-        unique_codes = list(set(fund_codes))
-
-        async with aiohttp.ClientSession() as session:
-            # 分组查询，每组10个
-            for i in range(0, len(unique_codes), 10):
-                batch = unique_codes[i:i+10]
-                tasks = []
-
-                for code in batch:
-                    # 检查缓存
-                    if self._is_cache_valid(code):
-                        results[code] = self.cache[code]
-                    else:
-                        tasks.append(self._fetch_from_api(session, code))
-
-                # 并发执行
-                if tasks:
-                    batch_results = await asyncio.gather(*tasks)
-                    for j, data in enumerate(batch_results):
-                        if data:
-                            code = batch[j] if j < len(batch) else None
-                            if code:
-                                self.cache[code] = data
-                                self.cache_timestamps[code] = datetime.now()
-                                results[code] = data
-
-                # 组间延迟
-                if i + 10 < len(unique_codes):
-                    await asyncio.sleep(0.5)
-
-        return results
+            return entry[0] if entry else None
+
+    async def get_funds_realtime_batch(self, fund_codes: List[str], force: bool = False) -> Dict[str, Dict]:
+        """批量获取基金实时数据
+
+        Args:
+            fund_codes: 基金代码列表
+            force: 是否忽略缓存强制从API获取（用于后台定时刷新）
+        """
+        fresh, _ = await self.get_funds_realtime_partial(fund_codes, force=force)
+        return fresh
+
+    async def get_funds_realtime_partial(self, fund_codes: List[str], timeout: Optional[float] = None,
+                                         force: bool = False) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """批量获取基金实时数据，最多等待 timeout 秒
+
+        缓存未命中的基金在后台任务中从API获取，超时后任务继续执行并写入缓存，后续请求即可命中。
+
+        Args:
+            fund_codes: 基金代码列表
+            timeout: 等待API的最长时间（秒），None 表示等待全部完成
+            force: 是否忽略缓存强制从API获取
+
+        Returns:
+            (fresh, stale): fresh 为缓存有效或本次获取到的数据；
+            stale 为未能及时获取、但缓存中有过期数据的基金及其最后一次的数据
+        """
+        unique_codes = list(dict.fromkeys(fund_codes))
+
+        # 一次性读取缓存
+        with timing.span("cache"):
+            cached = {} if force else self._cache_get_many(unique_codes)
+        ttl = self._get_cache_ttl()
+        fresh = {}
+        pending = []
+        for code in unique_codes:
+            entry = cached.get(code)
+            if self._is_entry_valid(entry, ttl):
+                fresh[code] = entry[0]
+            else:
+                pending.append(code)
+
+        if not force:
+            CACHE_REQUESTS.inc("quote", "hit", amount=len(fresh))
+            CACHE_REQUESTS.inc("quote", "miss", amount=len(pending))
+        if not pending:
+            return fresh, {}
+
+        futures = self._fetch_in_background(pending)
+        await asyncio.wait(futures.values(), timeout=timeout)
+        for code, future in futures.items():
+            if future.done() and future.result():
+                fresh[code] = future.result()
+
+        stale = {code: cached[code][0] for code in pending if code not in fresh and cached.get(code)}
+        return fresh, stale
+
+    def _fetch_in_background(self, fund_codes: List[str]) -> Dict[str, asyncio.Future]:
+        """在后台任务中获取基金数据，返回各基金结果的 Future（获取失败时结果为None）"""
+        loop = asyncio.get_running_loop()
+        futures = {}
+        new_codes = []
+        for code in fund_codes:
+            future = self._inflight.get(code)
+            if future is None:
+                future = self._inflight[code] = loop.create_future()
+                new_codes.append(code)
+            futures[code] = future
+
+        if new_codes:
+            task = asyncio.ensure_future(self._fetch_pending({code: futures[code] for code in new_codes}))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        return futures
+
+    async def _fetch_pending(self, futures: Dict[str, asyncio.Future]):
+        fund_codes = list(futures)
+        try:
+            async with aiohttp.ClientSession() as session:
+                # 分组查询，每组10个
+                for i in range(0, len(fund_codes), 10):
+                    batch = fund_codes[i:i+10]
+
+                    # 并发执行
+                    await asyncio.gather(*(self._fetch_one(session, code, futures[code]) for code in batch))
+
+                    # 组间延迟
+                    if i + 10 < len(fund_codes):
+                        with timing.span("ratelimit"):
+                            await asyncio.sleep(0.5)
+        finally:
+            # 异常或取消时，未完成的基金按获取失败处理
+            for code, future in futures.items():
+                self._resolve(code, future, None)
+
+    async def _fetch_one(self, session: aiohttp.ClientSession, fund_code: str, future: asyncio.Future):
+        data = await self._fetch_from_api(session, fund_code)
+        if data:
+            self._cache_set(fund_code, data)
+        self._resolve(fund_code, future, data)
+
+    def _resolve(self, fund_code: str, future: asyncio.Future, data: Optional[Dict]):
+        if self._inflight.get(fund_code) is future:
+            del self._inflight[fund_code]
+        if not future.done():
+            future.set_result(data)
+
+    async def shutdown(self):
+        """取消尚未完成的后台获取任务"""
+        tasks = list(self._background)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     def clear_cache(self):
         """清空缓存"""
         self.cache.clear()
-        self.cache_timestamps.clear()
 
-    async def search_fund_by_name(self, keyword: str) -> Optional[Dict]:
-        """通过基金名称关键词搜索基金，返回最匹配的结果"""
+    async def search_fund_by_name(self, keyword: str,
+                                  session: Optional[aiohttp.ClientSession] = None) -> Optional[Dict]:
+        """通过基金名称关键词搜索基金，返回最匹配的结果
+
+        Args:
+            keyword: 基金名称关键词
+            session: 复用的HTTP会话，批量搜索时共用一个连接池
+        """
         if not keyword or len(keyword) < 2:
             return None
 
         # 清理关键词
         keyword = keyword.strip().replace('（', '(').replace('）', ')')
 
-        # 搜索缓存
+        # 搜索缓存，无匹配结果（值为None）只缓存较短时间
+        with timing.span("cache"):
+            entry = self._cache_get(f"search:{keyword}")
+        if entry and self._is_entry_valid(entry, 86400 if entry[0] else settings.FUND_SEARCH_MISS_TTL):
+            CACHE_REQUESTS.inc("search", "hit")
+            return entry[0]
+
+        future = self._search_inflight.get(keyword)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._search_inflight[keyword] = asyncio.get_running_loop().create_future()
+        result = None
+        try:
+            result = await self._search_upstream(keyword, session)
+            return result
+        finally:
+            del self._search_inflight[keyword]
+            future.set_result(result)
+
+    async def _search_upstream(self, keyword: str,
+                               session: Optional[aiohttp.ClientSession] = None) -> Optional[Dict]:
+        """调用搜索接口并写入搜索缓存，接口正常返回但没有匹配的基金时缓存None"""
         search_cache_key = f"search:{keyword}"
-        if search_cache_key in self.cache:
-            cache_time = self.cache_timestamps.get(search_cache_key)
-            if cache_time and (datetime.now() - cache_time).total_seconds() < 86400:
-                return self.cache[search_cache_key]
-
         # 使用天天基金搜索接口
         url = "https://fundsuggest.eastmoney.com/FundSearch/api/FundSearchAPI.ashx"
         params = {
@@ -161,74 +318,89 @@ class FundService:
             "pagesize": "10"
         }
 
+        if session is None:
+            async with aiohttp.ClientSession() as own_session:
+                return await self._search_upstream(keyword, own_session)
+
+        CACHE_REQUESTS.inc("search", "miss")
         async with self.semaphore:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                        if response.status == 200:
-                            # API返回text/plain，需要手动解析JSON
-                            text = await response.text()
-                            data = json.loads(text)
-
-                            if data and "Datas" in data and data["Datas"]:
-                                best_match = None
-                                best_score = 0
-
-                                for fund in data["Datas"]:
-                                    fund_name = fund.get("NAME", "")
-                                    fund_code = fund.get("CODE", "")
-
-                                    # 跳过场内基金（代码以5或1开头且为6位的是场内ETF）
-                                    # 用户持仓通常是场外联接基金
-                                    is_etf_on_exchange = len(fund_code) == 6 and fund_code[0] in ('5', '1')
-
-                                    # 计算匹配度
-                                    score = 0
-                                    # 关键词在名称中
-                                    if keyword in fund_name:
-                                        score = len(keyword) / len(fund_name) * 100
-                                    # 名称以关键词开头
-                                    if fund_name.startswith(keyword[:min(4, len(keyword))]):
-                                        score += 30
-                                    # 关键词开头匹配名称开头
-                                    if keyword[:min(3, len(keyword))] == fund_name[:min(3, len(fund_name))]:
-                                        score += 20
-
-                                    # 优先选择联接基金（场外基金）
-                                    if '联接' in fund_name:
-                                        score += 50
-                                    # 场内ETF降低优先级
-                                    if is_etf_on_exchange and '联接' not in fund_name:
-                                        score -= 30
-
-                                    if score > best_score:
-                                        best_score = score
-                                        best_match = {
-                                            "fund_code": fund_code,
-                                            "fund_name": fund_name,
-                                            "fund_type": fund.get("FundBaseInfo", {}).get("FTYPE", "") if fund.get("FundBaseInfo") else "",
-                                        }
-
-                                if best_match and best_score > 20:
-                                    self.cache[search_cache_key] = best_match
-                                    self.cache_timestamps[search_cache_key] = datetime.now()
-                                    return best_match
+                start = time.perf_counter()
+                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    if response.status == 200:
+                        # API返回text/plain，需要手动解析JSON
+                        text = await response.text()
+                        elapsed = time.perf_counter() - start
+                        UPSTREAM_DURATION.observe(elapsed, "search")
+                        timing.record("upstream", elapsed)
+                        data = json.loads(text)
+
+                        if data and "Datas" in data and data["Datas"]:
+                            best_match = None
+                            best_score = 0
+
+                            for fund in data["Datas"]:
+                                fund_name = fund.get("NAME", "")
+                                fund_code = fund.get("CODE", "")
+
+                                # 跳过场内基金（代码以5或1开头且为6位的是场内ETF）
+                                # 用户持仓通常是场外联接基金
+                                is_etf_on_exchange = len(fund_code) == 6 and fund_code[0] in ('5', '1')
+
+                                # 计算匹配度
+                                score = 0
+                                # 关键词在名称中
+                                if keyword in fund_name:
+                                    score = len(keyword) / len(fund_name) * 100
+                                # 名称以关键词开头
+                                if fund_name.startswith(keyword[:min(4, len(keyword))]):
+                                    score += 30
+                                # 关键词开头匹配名称开头
+                                if keyword[:min(3, len(keyword))] == fund_name[:min(3, len(fund_name))]:
+                                    score += 20
+
+                                # 优先选择联接基金（场外基金）
+                                if '联接' in fund_name:
+                                    score += 50
+                                # 场内ETF降低优先级
+                                if is_etf_on_exchange and '联接' not in fund_name:
+                                    score -= 30
+
+                                if score > best_score:
+                                    best_score = score
+                                    best_match = {
+                                        "fund_code": fund_code,
+                                        "fund_name": fund_name,
+                                        "fund_type": fund.get("FundBaseInfo", {}).get("FTYPE", "") if fund.get("FundBaseInfo") else "",
+                                    }
+
+                            if best_match and best_score > 20:
+                                self._cache_set(search_cache_key, best_match)
+                                return best_match
+                        self._cache_set(search_cache_key, None)
+                    else:
+                        UPSTREAM_ERRORS.inc("search")
             except Exception as e:
-                print(f"搜索基金失败: {e}")
+                logger.warning("搜索基金失败: %s", e)
+                UPSTREAM_ERRORS.inc("search")
 
         return None
 
     async def search_funds_batch(self, keywords: List[str]) -> Dict[str, Dict]:
-        """批量搜索基金"""
-        results = {}
-        for keyword in keywords:
-            if keyword:
-                result = await self.search_fund_by_name(keyword)
-                if result:
-                    results[keyword] = result
-                await asyncio.sleep(0.1)  # 避免请求过快
-        return results
+        """批量搜索基金，并发执行（并发数受信号量限制），共用一个HTTP会话"""
+        unique_keywords = list(dict.fromkeys(k for k in keywords if k))
+        if not unique_keywords:
+            return {}
+
+        async with aiohttp.ClientSession() as session:
+            matches = await asyncio.gather(
+                *(self.search_fund_by_name(keyword, session) for keyword in unique_keywords)
+            )
+        return {keyword: match for keyword, match in zip(unique_keywords, matches) if match}
 
 
 # 全局实例
 fund_service = FundService()
+
+Gauge("fund_circuit_breaker_open", "上游基金接口是否处于熔断状态（1为熔断）",
+      func=lambda: int(fund_service._is_circuit_open()))
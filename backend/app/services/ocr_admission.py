@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Tuple
+from .ocr_pool import OCRBusyError
+from ..utils import timing
+
+
+class PixelBudget:
+    """按解码后像素数的准入控制
+
+    正在解码和识别的图片像素总数不超过预算，超出预算的请求按到达顺序排队，
+    等待超过 timeout 秒时报忙。没有在处理的请求时总会放行一张，
+    保证单张图片大于预算时不会永远等待（单张图片的尺寸另有上限）。
+    """
+
+    def __init__(self, budget: int, timeout: float):
+        self.budget = budget
+        self.timeout = timeout
+        self.in_flight_pixels = 0
+        self.in_flight = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        # 统计
+        self.admitted = 0
+        self.timeouts = 0
+        self.queued = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _fits(self, pixels: int) -> bool:
+        return self.in_flight == 0 or self.in_flight_pixels + pixels <= self.budget
+
+    def _grant(self, pixels: int):
+        self.in_flight_pixels += pixels
+        self.in_flight += 1
+
+    def _wake(self):
+        """按顺序放行排在最前面且预算足够的请求"""
+        while self._waiters:
+            pixels, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(pixels):
+                break
+            self._waiters.popleft()
+            self._grant(pixels)
+            future.set_result(None)
+
+    async def acquire(self, pixels: int):
+        start = time.monotonic()
+        if not self._waiters and self._fits(pixels):
+            self._grant(pixels)
+            self.admitted += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (pixels, future)
+        self._waiters.append(entry)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 超时与放行同时发生：已分配的预算要归还
+                self.release(pixels)
+            else:
+                try:
+                    self._waiters.remove(entry)
+                except ValueError:
+                    pass
+                # 排在前面的大图离开后，后面的请求可能可以放行
+                self._wake()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise OCRBusyError("OCR处理中的图片过多，请稍后重试")
+            raise
+
+        wait = time.monotonic() - start
+        self.admitted += 1
+        self.waited += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        timing.record("ocr-admission", wait)
+
+    def release(self, pixels: int):
+        self.in_flight_pixels -= pixels
+        self.in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def hold(self, pixels: int):
+        await self.acquire(pixels)
+        try:
+            yield
+        finally:
+            self.release(pixels)
+
+    def status(self) -> Dict:
+        return {
+            "budget_mp": round(self.budget / 1e6, 1),
+            "in_flight": self.in_flight,
+            "in_flight_mp": round(self.in_flight_pixels / 1e6, 1),
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "timeouts": self.timeouts,
+            "avg_wait": round(self.total_wait / self.waited, 3) if self.waited else 0.0,
+            "max_wait": round(self.max_wait, 3),
+        }
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import cv2
+import numpy as np
+from ..config import settings
+
+
+def content_hash(image: np.ndarray) -> str:
+    """解码后像素数据的哈希，同一张图片无论以文件还是base64上传都得到相同的值"""
+    image = np.ascontiguousarray(image)
+    digest = hashlib.sha256(f"{image.shape}{image.dtype}".encode())
+    digest.update(memoryview(image).cast("B"))
+    return digest.hexdigest()
+
+
+def perceptual_hash(image: np.ndarray, size: int = 16) -> int:
+    """差值哈希（dHash），size×size 位
+
+    图片缩小后比较相邻像素的明暗，重新压缩或轻微缩放后的图片哈希值只有少数位不同。
+    """
+    # 先隔行隔列采样再缩小，长截图上可省去大部分计算
+    step = max(1, min(image.shape[0], image.shape[1]) // (size * 8))
+    sampled = np.ascontiguousarray(image[::step, ::step])
+    gray = cv2.cvtColor(sampled, cv2.COLOR_BGR2GRAY) if sampled.ndim == 3 else sampled
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class OCRResultCache:
+    """OCR结果缓存
+
+    以像素哈希为键，保存识别出的文本行和提取的基金（补充信息前），
+    同一张图片再次上传时直接返回，不再经过模型推理。
+    可选按感知哈希匹配尺寸相同、内容近似的图片（如重新压缩过的截图）。
+    数据保存在SQLite文件中，总大小超过上限时按最近访问时间淘汰。
+    读写是同步的SQLite操作，应在线程中调用（连接按线程创建）；数据库文件在第一次读写时才创建。
+    """
+
+    def __init__(self, path: str, max_bytes: int, phash_distance: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.phash_distance = phash_distance
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    self._create_schema(conn)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            "key TEXT PRIMARY KEY, pipeline TEXT NOT NULL, phash TEXT NOT NULL, "
+            "height INTEGER NOT NULL, width INTEGER NOT NULL, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ocr_cache_dims ON ocr_cache (height, width)"
+        )
+        # 淘汰时按访问时间顺序读取
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ocr_cache_accessed ON ocr_cache (accessed_at)"
+        )
+
+    def fingerprint(self, image: np.ndarray) -> Tuple[str, int, Tuple[int, int]]:
+        """计算缓存键，返回 (像素哈希, 感知哈希, (高, 宽))"""
+        return content_hash(image), perceptual_hash(image), image.shape[:2]
+
+    def get(self, fingerprint: Tuple[str, int, Tuple[int, int]], pipeline: str) -> Optional[Dict]:
+        key, phash, (height, width) = fingerprint
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT key, value FROM ocr_cache WHERE key = ? AND pipeline = ?", (key, pipeline)
+        ).fetchone()
+
+        if row is None and self.phash_distance is not None:
+            # 只在尺寸相同的图片中比较感知哈希，只读取最接近的一条的值
+            candidates = conn.execute(
+                "SELECT key, phash FROM ocr_cache WHERE height = ? AND width = ? AND pipeline = ?",
+                (height, width, pipeline)
+            )
+            best = None
+            for cand_key, cand_phash in candidates:
+                distance = bin(int(cand_phash, 16) ^ phash).count("1")
+                if distance <= self.phash_distance and (best is None or distance < best[0]):
+                    best = (distance, cand_key)
+            if best is not None:
+                row = conn.execute("SELECT key, value FROM ocr_cache WHERE key = ?", (best[1],)).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        conn.execute("UPDATE ocr_cache SET accessed_at = ? WHERE key = ?", (time.time(), row[0]))
+        return json.loads(row[1])
+
+    def set(self, fingerprint: Tuple[str, int, Tuple[int, int]], pipeline: str, value: Dict):
+        key, phash, (height, width) = fingerprint
+        data = json.dumps(value, ensure_ascii=False)
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO ocr_cache "
+            "(key, pipeline, phash, height, width, value, size, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, pipeline, format(phash, "x"), height, width, data, len(data.encode()), time.time())
+        )
+        self._evict()
+
+    def _evict(self):
+        """总大小超过上限时删除最久未访问的条目"""
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 沿访问时间索引读取，删够即停
+        rows = conn.execute("SELECT key, size FROM ocr_cache ORDER BY accessed_at")
+        expired = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            expired.append((key,))
+            total -= size
+        rows.close()
+        conn.executemany("DELETE FROM ocr_cache WHERE key = ?", expired)
+
+    def status(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_ocr_cache() -> Optional[OCRResultCache]:
+    """根据配置创建OCR结果缓存，未启用时返回None"""
+    if not settings.OCR_CACHE_ENABLED:
+        return None
+    return OCRResultCache(
+        settings.OCR_CACHE_PATH,
+        settings.OCR_CACHE_MAX_MB * 1024 * 1024,
+        settings.OCR_CACHE_PHASH_DISTANCE if settings.OCR_CACHE_PHASH else None
+    )
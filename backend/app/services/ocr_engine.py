@@ -0,0 +1,261 @@
+import os
+import logging
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# 推理档位：在CPU主机上用准确率换吞吐
+# tier: 检测/识别模型规格 mobile / server
+# threads: 每个工作者的推理线程数，"auto" 按CPU核数平分给各工作者，None 使用库默认值
+# mkldnn: 是否启用oneDNN加速，None 使用库默认值
+# max_side / limit_type: 检测阶段输入的边长限制，"max" 时最长边超出 max_side 则等比缩小，
+#   None 使用库默认的限制方式（PaddleOCR 3.x 默认按最短边放大）
+# angle_cls: 是否做文本行方向分类（截图文字都是正向的，可关闭）
+# doc_preprocess: 是否做文档方向矫正和去扭曲（PaddleOCR 3.x），None 使用库默认值
+ENGINE_PROFILES = {
+    # 与引入档位前的行为一致
+    "default": {"tier": "mobile", "threads": None, "mkldnn": None, "max_side": 1920, "limit_type": None,
+                "angle_cls": True, "doc_preprocess": None},
+    "accurate": {"tier": "server", "threads": "auto", "mkldnn": True, "max_side": 1920, "limit_type": "max",
+                 "angle_cls": True, "doc_preprocess": False},
+    "cpu": {"tier": "mobile", "threads": "auto", "mkldnn": True, "max_side": 1280, "limit_type": "max",
+            "angle_cls": False, "doc_preprocess": False},
+    "cpu_fast": {"tier": "mobile", "threads": "auto", "mkldnn": True, "max_side": 960, "limit_type": "max",
+                 "angle_cls": False, "doc_preprocess": False},
+}
+
+
+def resolve_engine_config(profile: str, workers: int = 1) -> Dict:
+    """把推理档位展开为引擎配置，加入语言、GPU和线程数等部署相关的设置
+
+    配置是普通字典，可以传给进程池中的工作者。
+    """
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"不支持的推理档位: {profile}")
+    config = dict(ENGINE_PROFILES[profile], profile=profile, lang=settings.OCR_LANG, use_gpu=settings.OCR_USE_GPU)
+    if settings.OCR_CPU_THREADS > 0:
+        config["threads"] = settings.OCR_CPU_THREADS
+    elif config["threads"] == "auto":
+        config["threads"] = max(1, (os.cpu_count() or 1) // max(1, workers))
+    return config
+
+
+def _to_box(points) -> Optional[List[int]]:
+    """把多边形顶点或 [x0, y0, x1, y1] 转换为外接矩形"""
+    try:
+        arr = np.asarray(points, dtype=np.float32)
+        if arr.ndim == 1 and arr.size == 4:
+            x0, y0, x1, y1 = arr
+        elif arr.ndim == 2 and arr.shape[1] == 2:
+            x0, y0 = arr.min(axis=0)
+            x1, y1 = arr.max(axis=0)
+        else:
+            return None
+        return [int(x0), int(y0), int(x1), int(y1)]
+    except (TypeError, ValueError):
+        return None
+
+
+def _line_text(value) -> Optional[str]:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)) and len(value) > 0:
+        return str(value[0])
+    return None
+
+
+def extract_lines_from_result(result) -> List[Dict]:
+    """从OCR结果中提取文本行及其位置，兼容不同版本的PaddleOCR
+
+    Returns:
+        [{"text": 文本, "box": [x0, y0, x1, y1] 或 None, "score": 置信度}]
+    """
+    lines = []
+
+    if not result:
+        return lines
+
+    try:
+        for item in result:
+            if item is None:
+                continue
+
+            # PaddleX OCRResult 对象（类字典）
+            if hasattr(item, 'keys'):
+                for key in ['rec_texts', 'rec_text', 'texts', 'text']:
+                    if key in item:
+                        val = item[key]
+                        texts = val if isinstance(val, list) else [val]
+                        boxes = item['rec_boxes'] if 'rec_boxes' in item else (
+                            item['rec_polys'] if 'rec_polys' in item else None)
+                        scores = item['rec_scores'] if 'rec_scores' in item else None
+                        for idx, t in enumerate(texts):
+                            text = _line_text(t)
+                            if text is None:
+                                continue
+                            box = _to_box(boxes[idx]) if boxes is not None and idx < len(boxes) else None
+                            score = float(scores[idx]) if scores is not None and idx < len(scores) else 1.0
+                            lines.append({"text": text, "box": box, "score": score})
+                        break
+
+            # 旧版格式: [[多边形, (文本, 置信度)], ...]
+            elif isinstance(item, (list, tuple)):
+                for line in item:
+                    if isinstance(line, (list, tuple)) and len(line) >= 2:
+                        text_info = line[-1]
+                        text = _line_text(text_info)
+                        if text is None:
+                            continue
+                        score = 1.0
+                        if isinstance(text_info, (list, tuple)) and len(text_info) >= 2:
+                            score = float(text_info[1])
+                        lines.append({"text": text, "box": _to_box(line[0]), "score": score})
+    except Exception as e:
+        logger.warning("提取文本失败: %s", e)
+
+    return lines
+
+
+class OCREngine:
+    """OCR推理引擎接口
+
+    每个工作线程/进程持有一个实例，输入BGR图片，输出文本行
+    [{"text": 文本, "box": [x0, y0, x1, y1] 或 None, "score": 置信度}]。
+    """
+
+    name = "base"
+
+    def __init__(self, config: Dict):
+        self.config = config
+
+    def recognize_batch(self, images: List[np.ndarray]) -> List[List[Dict]]:
+        """批量识别，返回与输入一一对应的文本行"""
+        return [self.recognize(image) for image in images]
+
+    def recognize(self, image: np.ndarray) -> List[Dict]:
+        raise NotImplementedError
+
+
+class PaddleOCREngine(OCREngine):
+    """PaddleOCR推理引擎，兼容PaddleOCR 2.x和PaddleOCR 3.x（PaddleX）"""
+
+    name = "paddle"
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        self.ocr = self._create()
+
+    def _v3_args(self) -> Dict:
+        config = self.config
+        args = {
+            "device": "gpu" if config["use_gpu"] else "cpu",
+            "use_textline_orientation": config["angle_cls"],
+            "text_det_limit_side_len": config["max_side"],
+            "text_det_box_thresh": 0.3,
+            "text_det_unclip_ratio": 1.6,
+        }
+        # 指定语言时PaddleOCR按语言选择模型，只有中文模型区分mobile/server规格
+        if config["lang"] == "ch":
+            args["text_detection_model_name"] = f"PP-OCRv5_{config['tier']}_det"
+            args["text_recognition_model_name"] = f"PP-OCRv5_{config['tier']}_rec"
+        else:
+            args["lang"] = config["lang"]
+        if config["limit_type"] is not None:
+            args["text_det_limit_type"] = config["limit_type"]
+        if config["doc_preprocess"] is not None:
+            args["use_doc_orientation_classify"] = config["doc_preprocess"]
+            args["use_doc_unwarping"] = config["doc_preprocess"]
+        if config["threads"]:
+            args["cpu_threads"] = config["threads"]
+        if config["mkldnn"] is not None:
+            args["enable_mkldnn"] = config["mkldnn"]
+        return args
+
+    def _v2_args(self) -> Dict:
+        config = self.config
+        args = {
+            "use_angle_cls": config["angle_cls"],
+            "lang": config["lang"],
+            "use_gpu": config["use_gpu"],
+            "det_limit_side_len": config["max_side"],
+            "det_db_box_thresh": 0.3,
+            "det_db_unclip_ratio": 1.6,
+        }
+        if config["limit_type"] is not None:
+            args["det_limit_type"] = config["limit_type"]
+        if config["threads"]:
+            args["cpu_threads"] = config["threads"]
+        if config["mkldnn"] is not None:
+            args["enable_mkldnn"] = config["mkldnn"]
+        return args
+
+    def _create(self):
+        """创建PaddleOCR实例"""
+        os.environ['PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK'] = 'True'
+        import paddleocr
+        from paddleocr import PaddleOCR
+        # 注意：PaddleX版本（3.x）的参数与PaddleOCR 2.x不同
+        major = int(str(getattr(paddleocr, "__version__", "2")).split(".")[0] or 2)
+        if major < 3 and self.config["tier"] == "server":
+            logger.warning("PaddleOCR 2.x 不支持按名称选择server模型，使用默认模型")
+        try:
+            return PaddleOCR(**(self._v3_args() if major >= 3 else self._v2_args()))
+        except (TypeError, ValueError) as e:
+            # 降级到基本参数
+            logger.warning("PaddleOCR不支持优化参数，使用基本参数: %s", e)
+            return PaddleOCR(lang=self.config["lang"])
+
+    def _run(self, image: np.ndarray):
+        """执行一次OCR推理，兼容PaddleX和PaddleOCR的API"""
+        try:
+            # PaddleOCR API
+            return self.ocr.ocr(image, cls=self.config["angle_cls"])
+        except TypeError:
+            # PaddleX API (predict方法)
+            return self.ocr.predict(image)
+
+    def recognize(self, image: np.ndarray) -> List[Dict]:
+        return extract_lines_from_result(self._run(image))
+
+    def recognize_batch(self, images: List[np.ndarray]) -> List[List[Dict]]:
+        """批量推理
+
+        PaddleX的predict支持列表输入，检测和识别阶段按批执行；
+        旧版PaddleOCR只支持单张图片，逐张推理。
+        """
+        if len(images) > 1 and hasattr(self.ocr, "predict"):
+            try:
+                results = list(self.ocr.predict(images))
+                if len(results) == len(images):
+                    return [extract_lines_from_result([result]) for result in results]
+            except TypeError:
+                pass
+        return [self.recognize(image) for image in images]
+
+
+class FakeOCREngine(OCREngine):
+    """不加载模型的假引擎，用于测试和压测
+
+    对每张图片返回配置中的固定文本行（默认为空），
+    可按 seconds_per_mp 模拟与像素量成正比的推理耗时。
+    """
+
+    name = "fake"
+
+    def recognize(self, image: np.ndarray) -> List[Dict]:
+        delay = self.config.get("seconds_per_mp", 0.0) * image.shape[0] * image.shape[1] / 1e6
+        if delay > 0:
+            time.sleep(delay)
+        return [dict(line) for line in self.config.get("lines", [])]
+
+
+ENGINES = {engine.name: engine for engine in (PaddleOCREngine, FakeOCREngine)}
+
+
+def create_engine(name: str, config: Dict) -> OCREngine:
+    if name not in ENGINES:
+        raise ValueError(f"不支持的OCR引擎: {name}")
+    return ENGINES[name](config)
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+from ..config import settings
+from ..utils.cache_backend import SQLiteCacheBackend
+from .ocr_service import ocr_service
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+FINISHED_STATES = (JOB_DONE, JOB_FAILED)
+
+
+class OCRJobService:
+    """异步OCR识别任务
+
+    提交图片后立即返回任务ID，识别在后台执行；任务状态、进度事件和最终结果
+    写入SQLite任务库，多个worker共用，客户端可从任意worker轮询或订阅事件流，
+    连接断开后可以凭任务ID重新获取，不需要重新上传图片。
+    任务在最后一次更新 OCR_JOB_TTL 秒后被清理。
+
+    每个进度事件单独保存为一行（任务ID + 序号），任务记录只保存状态和事件数，
+    写入量与片段数成正比。写入在单独的线程中按提交顺序执行，不阻塞事件循环。
+    """
+
+    # 两次清理过期任务的最小间隔（秒）
+    PURGE_INTERVAL = 60
+
+    def __init__(self, path: str, ttl: int):
+        self.store = SQLiteCacheBackend(path, "ocr_job")
+        self.event_store = SQLiteCacheBackend(path, "ocr_job_event")
+        self.ttl = ttl
+        self._tasks = set()
+        self._last_purge = 0.0
+        # 单线程执行写入，保证同一任务的事件和状态按顺序落盘
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-job-store")
+
+    @staticmethod
+    def _event_key(job_id: str, seq: int) -> str:
+        return f"{job_id}:{seq}"
+
+    def _write(self, job: Dict, event: Optional[Dict] = None):
+        """在写入线程中执行：先写事件再写任务状态，读到事件数时对应的事件已存在"""
+        if event is not None:
+            self.event_store.set(self._event_key(job["id"], event["seq"]), event)
+        self.store.set(job["id"], job)
+
+    def _save(self, job: Dict, event: Optional[Dict] = None) -> Future:
+        """提交一次写入（任务状态的快照及可选的新事件），返回写入的 Future"""
+        job["updated_at"] = time.time()
+        return self._writer.submit(self._write, dict(job), event)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """获取任务，不存在或已过期时返回None（同步读取SQLite，异步代码中应在线程中调用）"""
+        entry = self.store.get(job_id)
+        if entry is None:
+            return None
+        job, updated_at = entry
+        if time.time() - updated_at > self.ttl:
+            return None
+        return job
+
+    def _purge(self, before: float):
+        self.store.purge(before)
+        self.event_store.purge(before)
+
+    def purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        self._writer.submit(self._purge, now - self.ttl)
+
+    async def submit(self, image: np.ndarray, on_finish: Optional[Callable[[], Awaitable]] = None) -> Dict:
+        """创建识别任务并在后台执行，任务写入任务库后返回
+
+        Args:
+            on_finish: 提取完成、不再需要图片时调用，用于释放图片占用的资源（像素预算）；
+                任务结束时会再调用一次，须可重复调用
+        """
+        self.purge_expired()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": JOB_QUEUED,
+            "created_at": time.time(),
+            "total_segments": None,
+            "done_segments": 0,
+            "event_count": 0,
+            "result": None,
+            "error": None,
+        }
+        await asyncio.wrap_future(self._save(job))
+        task = asyncio.create_task(self._run(job, image, on_finish))
+        # 保留任务引用，避免被垃圾回收
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def _add_event(self, job: Dict, event: str, data: Dict) -> Future:
+        job["event_count"] += 1
+        return self._save(job, {"seq": job["event_count"], "event": event, "data": data})
+
+    async def _run(self, job: Dict, image: np.ndarray, on_finish: Optional[Callable[[], Awaitable]] = None):
+        def on_progress(event: str, data: Dict):
+            if event == "segmented":
+                job["total_segments"] = data["total"]
+            elif event == "segment":
+                job["done_segments"] += 1
+            self._add_event(job, event, data)
+
+        job["status"] = JOB_RUNNING
+        self._save(job)
+        try:
+            recognition = ocr_service.recognize_from_image(image, progress=on_progress, release=on_finish)
+            # 图片只由识别过程持有，提取完成后即可回收
+            del image
+            results = await recognition
+            job["status"] = JOB_DONE
+            job["result"] = results
+            self._add_event(job, "done", {"count": len(results), "data": results})
+        except Exception as e:
+            logger.warning("OCR任务 %s 失败: %s", job["id"], e)
+            job["status"] = JOB_FAILED
+            job["error"] = str(e)
+            self._add_event(job, "failed", {"detail": str(e)})
+        finally:
+            if job["status"] not in FINISHED_STATES:
+                # 被取消（如服务关闭），不等待TTL过期，直接标记为失败
+                job["status"] = JOB_FAILED
+                job["error"] = "任务已取消"
+                self._add_event(job, "failed", {"detail": job["error"]})
+            if on_finish is not None:
+                await on_finish()
+
+    def events_since(self, job: Dict, last_seq: int) -> List[Dict]:
+        """序号大于 last_seq 的事件（同步读取SQLite，异步代码中应在线程中调用）"""
+        keys = [self._event_key(job["id"], seq) for seq in range(last_seq + 1, job.get("event_count", 0) + 1)]
+        entries = self.event_store.get_many(keys)
+        events = []
+        for key in keys:
+            if key not in entries:
+                break
+            events.append(entries[key][0])
+        return events
+
+    def summary(self, job: Dict) -> Dict:
+        """任务状态，partial 为已识别片段中初步提取的基金（同步读取SQLite）"""
+        partial = [
+            fund for event in self.events_since(job, 0) if event["event"] == "segment"
+            for fund in event["data"]["funds"]
+        ]
+        return dict(job, partial=partial)
+
+
+# 全局实例
+ocr_job_service = OCRJobService(settings.OCR_JOB_STORE_PATH, settings.OCR_JOB_TTL)
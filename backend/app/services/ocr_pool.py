@@ -0,0 +1,311 @@
+import time
+import logging
+import asyncio
+import threading
+import multiprocessing
+import cv2
+import numpy as np
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Optional
+from ..config import settings
+from .ocr_engine import create_engine, resolve_engine_config
+
+logger = logging.getLogger(__name__)
+
+
+class OCRNotReadyError(RuntimeError):
+    """OCR模型未就绪（加载失败或等待超时）"""
+
+
+class OCRBusyError(RuntimeError):
+    """OCR队列已满"""
+
+
+# 每个工作线程/进程各自持有的推理引擎
+_worker = threading.local()
+
+
+def _worker_init(engine: str, config: Dict):
+    """工作线程/进程初始化：创建推理引擎并用空白图片预热
+
+    异常不向外抛出，否则整个执行器会被标记为损坏；错误记录下来由任务报告。
+    """
+    start = time.perf_counter()
+    _worker.engine = None
+    _worker.error = None
+    try:
+        instance = create_engine(engine, config)
+        instance.recognize(np.full((64, 256, 3), 255, dtype=np.uint8))
+        _worker.engine = instance
+    except Exception as e:
+        _worker.error = str(e)
+    _worker.load_time = time.perf_counter() - start
+
+
+def _worker_status() -> Dict:
+    """返回当前工作线程/进程的模型状态"""
+    return {"ok": _worker.engine is not None, "load_time": _worker.load_time, "error": _worker.error}
+
+
+def _worker_recognize_batch(images: List[np.ndarray]) -> List:
+    """在工作线程/进程中批量识别图片，返回每张图片的文本行（含位置）
+
+    批量推理失败时逐张重试，单张失败以异常对象返回，不影响同批其他图片。
+    """
+    if _worker.engine is None:
+        raise OCRNotReadyError(f"OCR模型加载失败: {_worker.error}")
+    # 灰度图以单通道传入工作者，减少进程间传输，推理前再转为三通道
+    images = [cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image for image in images]
+    try:
+        return _worker.engine.recognize_batch(images)
+    except Exception:
+        if len(images) == 1:
+            raise
+
+    outputs = []
+    for image in images:
+        try:
+            outputs.append(_worker.engine.recognize(image))
+        except Exception as e:
+            outputs.append(RuntimeError(str(e)))
+    return outputs
+
+
+def _resolve_waiter(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class OCRWorkerPool:
+    """OCR推理工作池
+
+    推理在线程池或进程池中执行，不阻塞事件循环；每个工作者在初始化时加载自己的模型。
+    PaddleOCR推理主要在C++中完成并释放GIL，默认使用线程池，内存占用更小；
+    Python前后处理成为瓶颈时可切换为进程池。
+    等待中的推理任务数量有上限，超过上限的请求等待空位，超时后报忙。
+
+    推理前经过动态批处理：同一张图片的各个片段以及并发请求的片段，
+    在 batch_window 时间内或工作者忙碌期间累积起来，合并为一次批量推理，
+    结果再按请求分发回去。
+
+    engine 为推理引擎名称（见 ocr_engine.ENGINES），engine_config 为引擎配置，
+    默认按 OCR_ENGINE_PROFILE 档位生成。
+    """
+
+    def __init__(self, mode: str = "thread", workers: int = 1, max_queue: int = 8,
+                 batch_size: int = 8, batch_window: float = 0.01,
+                 engine: str = "paddle", engine_config: Optional[Dict] = None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"不支持的OCR工作模式: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.engine = engine
+        self.engine_config = engine_config or resolve_engine_config(settings.OCR_ENGINE_PROFILE, self.workers)
+        self.max_queue = max(0, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self._executor: Optional[Executor] = None
+        # 模型状态: idle / loading / ready / failed
+        self._state = "idle"
+        self._load_time: Optional[float] = None
+        self._load_error: Optional[str] = None
+        self._failed_at: Optional[float] = None
+        self._state_lock = threading.Lock()
+        # 等待本次加载结束的请求：(事件循环, Future)，加载结束时从加载线程通知
+        self._waiters: List = []
+        # 以下异步对象绑定在创建它们的事件循环上
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._pending = 0
+        self._batch_count = 0
+        self._batched_items = 0
+
+    def _create_executor(self) -> Executor:
+        if self.mode == "process":
+            # 使用spawn避免fork带有线程和连接的父进程
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_worker_init,
+                initargs=(self.engine, self.engine_config)
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="ocr-worker",
+            initializer=_worker_init,
+            initargs=(self.engine, self.engine_config)
+        )
+
+    def start(self, force: bool = False):
+        """创建工作池并在后台加载模型，已在加载或已就绪时不重复创建
+
+        加载失败后 OCR_RETRY_INTERVAL 秒内不重新加载（期间请求直接报告失败），force 时立即重新加载。
+        """
+        with self._state_lock:
+            if self._state in ("loading", "ready"):
+                return
+            if self._state == "failed" and not force \
+                    and time.monotonic() - self._failed_at < settings.OCR_RETRY_INTERVAL:
+                return
+            self._state = "loading"
+            self._load_time = None
+            self._load_error = None
+            old_executor, self._executor = self._executor, self._create_executor()
+        if old_executor is not None:
+            old_executor.shutdown(wait=False, cancel_futures=True)
+        threading.Thread(target=self._warmup, args=(self._executor,), name="ocr-warmup", daemon=True).start()
+
+    def _warmup(self, executor: Executor):
+        """同时提交与工作者数量相同的任务，促使每个工作者都完成初始化"""
+        start = time.perf_counter()
+        errors = []
+        try:
+            futures = [executor.submit(_worker_status) for _ in range(self.workers)]
+        except Exception as e:
+            futures = []
+            errors.append(str(e))
+        for future in futures:
+            try:
+                status = future.result()
+            except Exception as e:
+                status = {"ok": False, "error": str(e)}
+            if status["ok"]:
+                if self._state != "ready":
+                    self._finish_loading("ready", time.perf_counter() - start)
+                    logger.info("OCR模型加载完成，耗时 %.1fs", self._load_time)
+            else:
+                errors.append(status["error"])
+
+        if self._state != "ready":
+            self._finish_loading("failed", time.perf_counter() - start, errors[0] if errors else None)
+            logger.error("OCR模型加载失败: %s", self._load_error)
+
+    def _finish_loading(self, state: str, load_time: float, error: Optional[str] = None):
+        """在加载线程中结束本次加载，唤醒等待的请求"""
+        with self._state_lock:
+            self._load_time = load_time
+            self._load_error = error
+            if state == "failed":
+                self._failed_at = time.monotonic()
+            self._state = state
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve_waiter, future)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    async def wait_ready(self):
+        """模型未就绪时排队等待后台加载完成
+
+        等待的请求只占用一个 Future，不占用线程；加载结束时由加载线程通知。
+        """
+        if self._state == "ready":
+            return
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._state_lock:
+            loading = self._state == "loading"
+            if loading:
+                self._waiters.append(waiter)
+        if loading:
+            try:
+                await asyncio.wait_for(future, settings.OCR_READY_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise OCRNotReadyError("OCR模型加载中，请稍后重试")
+            finally:
+                with self._state_lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+        if self._state != "ready":
+            raise OCRNotReadyError(f"OCR模型加载失败: {self._load_error}")
+
+    def _ensure_batcher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._batcher is None or self._batcher.done():
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.workers + self.max_queue)
+            self._queue = asyncio.Queue()
+            self._batcher = loop.create_task(self._batch_loop())
+
+    async def recognize(self, image: np.ndarray) -> List[Dict]:
+        """在工作池中识别一张图片，返回文本行及其在该图片中的位置"""
+        await self.wait_ready()
+        self._ensure_batcher()
+        slots = self._slots
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=settings.OCR_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise OCRBusyError("OCR任务繁忙，请稍后重试")
+
+        self._pending += 1
+        try:
+            future = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((image, future))
+            return await future
+        finally:
+            self._pending -= 1
+            slots.release()
+
+    async def _batch_loop(self):
+        """收集排队的图片，凑成批次后提交给空闲的工作者"""
+        queue = self._queue
+        idle_workers = asyncio.Semaphore(self.workers)
+        while True:
+            batch = [await queue.get()]
+            # 等待空闲工作者，工作者忙碌期间新到的图片会进入同一批次
+            await idle_workers.acquire()
+            if queue.qsize() < self.batch_size - 1 and self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            asyncio.get_running_loop().create_task(self._run_batch(batch, idle_workers))
+
+    async def _run_batch(self, batch: List, idle_workers: asyncio.Semaphore):
+        images = [image for image, _ in batch]
+        self._batch_count += 1
+        self._batched_items += len(batch)
+        try:
+            loop = asyncio.get_running_loop()
+            outputs = await loop.run_in_executor(self._executor, _worker_recognize_batch, images)
+        except Exception as e:
+            outputs = [e] * len(batch)
+        finally:
+            idle_workers.release()
+
+        for (_, future), output in zip(batch, outputs):
+            if future.done():
+                continue
+            if isinstance(output, Exception):
+                future.set_exception(output)
+            else:
+                future.set_result(output)
+
+    def status(self) -> Dict:
+        """工作池状态，用于健康检查"""
+        return {
+            "state": self._state,
+            "load_time": round(self._load_time, 3) if self._load_time is not None else None,
+            "error": self._load_error,
+            "mode": self.mode,
+            "workers": self.workers,
+            "engine": self.engine,
+            "engine_profile": self.engine_config.get("profile"),
+            "pending": self._pending,
+            "batches": self._batch_count,
+            "avg_batch_size": round(self._batched_items / self._batch_count, 2) if self._batch_count else None
+        }
+
+    def shutdown(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._state = "idle"
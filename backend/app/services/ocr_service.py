@@ -1,134 +1,435 @@
 import re
+import os
+import json
+import time
+import hashlib
+import asyncio
+import logging
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
 import cv2
 import numpy as np
-from PIL import Image
-from typing import List, Dict, Optional
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 from decimal import Decimal
-import base64
-import io
+from ..config import settings
+from .ocr_pool import OCRWorkerPool, OCRNotReadyError, OCRBusyError
+from .ocr_cache import create_ocr_cache
+from ..utils.keyword_matcher import KeywordMatcher
+from .ocr_admission import PixelBudget
+from .alias_service import alias_service
+from ..utils.image_io import EncodedImage, ImageTooLargeError, plan_reduce
+from ..utils.metrics import OCR_STAGE_DURATION, Gauge
+from ..utils.log import detail_level
+from ..utils import timing
+
+logger = logging.getLogger(__name__)
+
+# OCR文本分类关键词（基金类型、基金公司、排除词），可直接编辑数据文件扩充
+KEYWORDS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "ocr_keywords.json")
+
+FUND_CODE_PATTERN = re.compile(r'(\d{6})')
+FUND_CODE_FORMAT = re.compile(r'^\d{6}$')
+AMOUNT_PATTERN = re.compile(r'^\d+\.?\d*$')
+CHINESE_CHAR_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+
+
+def _load_keywords(path: str = KEYWORDS_PATH) -> Dict[str, List[str]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# 按类别匹配的关键词：fund_types 基金名称必须包含的基金类型，company_prefixes 基金公司名称前缀，
+# exclude 排除关键词（非基金内容）
+KEYWORDS = KeywordMatcher(_load_keywords())
+
+
+@contextmanager
+def _timed(timings: Optional[Dict[str, float]], stage: str):
+    """把代码块的耗时（秒）记入 ocr_stage_seconds 指标和当前请求的 Server-Timing，
+    并累加到 timings[stage]（timings 为None时不累加）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        OCR_STAGE_DURATION.observe(elapsed, stage)
+        timing.record(f"ocr-{stage}", elapsed)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
 
 
 class OCRService:
+    # 识别流程（分割、推理、提取规则）变化时递增，使旧的缓存结果失效
+    PIPELINE_VERSION = "2"
+
+    # 预处理配置，速度从慢到快；各步骤对耗时和召回率的影响见 benchmarks/bench_preprocess.py
+    # crop_chrome: 裁掉状态栏和底部导航栏
+    # grayscale: 转为灰度图
+    # text_height: 缩小图片使文字高度接近该值（像素）
+    # crop_right: 只保留左侧该比例的宽度（基金名称和金额所在区域）
+    PREPROCESS_PROFILES = {
+        "off": {},
+        "accurate": {"crop_chrome": True},
+        "balanced": {"crop_chrome": True, "grayscale": True, "text_height": 24},
+        "fast": {"crop_chrome": True, "grayscale": True, "text_height": 16, "crop_right": 0.6},
+    }
+
     def __init__(self):
-        self._ocr = None
-
-    def _get_ocr(self):
-        """延迟加载PaddleOCR"""
-        if self._ocr is None:
-            import os
-            os.environ['PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK'] = 'True'
-            from paddleocr import PaddleOCR
-            # 优化配置以提高检测率
-            # 注意：PaddleX版本的参数与PaddleOCR不同
-            try:
-                # 尝试使用优化参数（PaddleOCR）
-                self._ocr = PaddleOCR(
-                    use_angle_cls=True,
-                    lang='ch',
-                    det_limit_side_len=1920,
-                    det_db_box_thresh=0.3,
-                    det_db_unclip_ratio=1.6
-                )
-            except:
-                # 降级到基本参数（PaddleX）
-                self._ocr = PaddleOCR(
-                    use_angle_cls=True,
-                    lang='ch'
-                )
-        return self._ocr
+        self.pool = OCRWorkerPool(
+            mode=settings.OCR_WORKER_MODE,
+            workers=settings.OCR_WORKERS,
+            max_queue=settings.OCR_MAX_QUEUE,
+            batch_size=settings.OCR_BATCH_SIZE,
+            batch_window=settings.OCR_BATCH_WINDOW_MS / 1000,
+            engine=settings.OCR_ENGINE
+        )
+        if settings.OCR_PREPROCESS_PROFILE not in self.PREPROCESS_PROFILES:
+            raise ValueError(f"不支持的预处理配置: {settings.OCR_PREPROCESS_PROFILE}")
+        self.cache = create_ocr_cache()
+        self.admission = PixelBudget(settings.OCR_PIXEL_BUDGET_MP * 1_000_000, settings.OCR_ADMISSION_TIMEOUT)
+        self.downscaled = 0
+
+    def start_warmup(self):
+        """在后台加载模型"""
+        self.pool.start()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    def status(self) -> Dict:
+        """模型状态，用于健康检查"""
+        status = self.pool.status()
+        status["admission"] = dict(self.admission.status(), downscaled=self.downscaled)
+        if self.cache is not None:
+            status["cache"] = self.cache.status()
+        return status
+
+    # 影响识别结果的引擎配置项，线程数、GPU等只影响速度，不计入缓存键
+    ENGINE_CACHE_KEYS = ("profile", "tier", "lang", "max_side", "limit_type", "angle_cls", "doc_preprocess")
+
+    def _pipeline_id(self) -> str:
+        """识别流程标识，作为结果缓存键的一部分
+
+        包含预处理配置、引擎和引擎配置的摘要，切换任一项后不会命中其他配置下缓存的结果。
+        """
+        config = {key: self.pool.engine_config.get(key) for key in self.ENGINE_CACHE_KEYS}
+        digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+        return f"{self.PIPELINE_VERSION}:{settings.OCR_PREPROCESS_PROFILE}:{self.pool.engine}:{digest}"
 
-    def _split_long_image(self, image: np.ndarray, window_height: int = 1000) -> List[np.ndarray]:
-        """使用滑动窗口将长图分割成多个小图
+    def _blank_row_mask(self, image: np.ndarray, threshold: float = 6.0) -> np.ndarray:
+        """逐行方差投影，返回每一行是否为纯色背景
+
+        在灰度图上隔列采样即可判断整行是否为纯色，纯色色块（如横幅背景）同样视为空白。
+        方差由 E[x²] - E[x]² 通过 cv2.reduce 按行求得，避免对整图做浮点标准差。
+        """
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        sample = np.ascontiguousarray(gray[:, ::4]).astype(np.float32)
+        mean = cv2.reduce(sample, 1, cv2.REDUCE_AVG)
+        mean_sq = cv2.reduce(sample * sample, 1, cv2.REDUCE_AVG)
+        variance = np.maximum(mean_sq - mean * mean, 0).ravel()
+        return variance < threshold * threshold
+
+    def _blank_bands(self, blank: np.ndarray, min_gap: int) -> Tuple[np.ndarray, np.ndarray]:
+        """找出高度不小于 min_gap 的空白水平带，返回各带的 (起始行, 结束行)"""
+        edges = np.diff(np.concatenate(([0], blank.view(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        keep = (ends - starts) >= min_gap
+        return starts[keep], ends[keep]
+
+    def _find_blank_bands(self, blank: np.ndarray, min_gap: int) -> np.ndarray:
+        """找出高度不小于 min_gap 的空白水平带，返回各带中线的行号"""
+        starts, ends = self._blank_bands(blank, min_gap)
+        return (starts + ends) // 2
+
+    def _segment_bounds(self, image: np.ndarray, window_height: int = 1000,
+                        min_gap: int = 6, fallback_overlap: int = 100) -> List[Tuple[int, int]]:
+        """在空白行处切分长图，返回各片段的 (起始行, 结束行)
+
+        只在文字行之间的空白带切分，片段之间没有重叠，每行文字只被识别一次。
+        窗口内找不到空白带时（如整段为图片）才按窗口高度硬切，并保留少量重叠。
 
         Args:
             image: 输入图像
-            window_height: 滑动窗口高度，较小的窗口可以提高OCR检测率
-
-        Returns:
-            分割后的图像片段列表
+            window_height: 片段最大高度，较小的窗口可以提高OCR检测率
+            min_gap: 可切分的空白带最小高度
+            fallback_overlap: 硬切时的重叠高度
         """
-        height, width = image.shape[:2]
+        height = image.shape[0]
 
         # 对于较短的图片，直接返回
         if height <= window_height:
-            return [image]
+            return [(0, height)]
 
-        # 使用滑动窗口，重叠50%以确保不会遗漏边界内容
-        overlap = window_height // 2
-        segments = []
-        y = 0
+        blank = self._blank_row_mask(image)
+        cut_points = self._find_blank_bands(blank, min_gap)
 
+        bounds = []
+        y = 0
         while y < height:
-            end_y = min(y + window_height, height)
-            segment = image[y:end_y, :]
-            segments.append(segment)
-
-            # 如果已经到达末尾，退出
-            if end_y >= height:
-                break
-
-            # 移动到下一个窗口（重叠50%）
-            y += overlap
+            if height - y <= window_height:
+                end_y, next_y = height, height
+            else:
+                limit = y + window_height
+                # 取窗口后半段中最靠后的空白带，避免片段过短
+                idx = np.searchsorted(cut_points, limit, side="right") - 1
+                if idx >= 0 and cut_points[idx] > y + window_height // 2:
+                    end_y = next_y = int(cut_points[idx])
+                else:
+                    end_y, next_y = limit, limit - fallback_overlap
+
+            # 跳过全空白的片段
+            if not blank[y:end_y].all():
+                bounds.append((y, end_y))
+            y = next_y
+
+        return bounds
+
+    def _estimate_text_height(self, blank: np.ndarray, width: int) -> Optional[float]:
+        """以非空白行段高度的中位数估计文字高度"""
+        edges = np.diff(np.concatenate(([0], (~blank).view(np.int8), [0])))
+        runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+        runs = runs[(runs >= 6) & (runs <= width // 5)]
+        if len(runs) == 0:
+            return None
+        return float(np.median(runs))
+
+    def _chrome_bounds(self, image: np.ndarray, blank: np.ndarray) -> Tuple[int, int]:
+        """找出状态栏下方和底部导航栏上方的切分行，返回保留区域 (起始行, 结束行)
+
+        只处理整屏截图（高度不小于宽度的1.6倍），并且只在空白带处切分，不会切断文字。
+        """
+        height, width = image.shape[:2]
+        if height < width * 1.6:
+            return 0, height
+        starts, ends = self._blank_bands(blank, 4)
+        centers = (starts + ends) // 2
+        top_limit = int(width * 0.08)
+        bottom_limit = height - int(width * 0.16)
+
+        # 状态栏下方：起点在限制范围内的最后一个空白带（不计顶部边缘）
+        top = 0
+        top_bands = np.flatnonzero((starts > 0) & (starts <= top_limit))
+        if len(top_bands):
+            idx = top_bands[-1]
+            top = int(min(centers[idx], top_limit))
+
+        # 导航栏上方：终点在限制范围内的第一个空白带（不计底部边缘）
+        bottom = height
+        bottom_bands = np.flatnonzero((ends < height) & (ends >= bottom_limit))
+        if len(bottom_bands):
+            idx = bottom_bands[0]
+            bottom = int(max(centers[idx], bottom_limit))
+        return top, bottom
+
+    def _preprocess_image(self, image: np.ndarray, profile: Optional[Dict] = None) -> Tuple[np.ndarray, Dict]:
+        """按预处理配置减少送入OCR的像素
+
+        步骤依次为：裁掉状态栏和底部导航栏、转灰度、按目标文字高度缩小、裁掉右侧非持仓区域。
+        返回处理后的图片和变换信息（缩放比例、裁剪偏移、各步骤耗时），
+        变换信息用于把识别结果的坐标映射回原图。
 
-        print(f"长图分割: 图片高度 {height}px，分割成 {len(segments)} 个片段")
-        return segments
+        Args:
+            image: 输入图像
+            profile: 预处理配置，默认使用 OCR_PREPROCESS_PROFILE 对应的配置
+        """
+        if profile is None:
+            profile = self.PREPROCESS_PROFILES[settings.OCR_PREPROCESS_PROFILE]
+        info = {"scale": 1.0, "offset_y": 0, "timings": {}}
+        timings = info["timings"]
+
+        if profile.get("crop_chrome"):
+            start = time.perf_counter()
+            top, bottom = self._chrome_bounds(image, self._blank_row_mask(image))
+            image = image[top:bottom]
+            info["offset_y"] = top
+            timings["crop_chrome"] = time.perf_counter() - start
+
+        if profile.get("grayscale") and image.ndim == 3:
+            start = time.perf_counter()
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            timings["grayscale"] = time.perf_counter() - start
+
+        target = profile.get("text_height")
+        if target:
+            start = time.perf_counter()
+            text_height = self._estimate_text_height(self._blank_row_mask(image), image.shape[1])
+            if text_height:
+                # 只缩小不放大，且不低于原图的40%
+                scale = min(1.0, max(0.4, target / text_height))
+                if scale < 0.95:
+                    image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                    info["scale"] = scale
+            timings["text_height"] = time.perf_counter() - start
+
+        crop_right = profile.get("crop_right")
+        if crop_right:
+            start = time.perf_counter()
+            image = image[:, :int(image.shape[1] * crop_right)]
+            timings["crop_right"] = time.perf_counter() - start
+
+        return image, info
+
+    def _to_image_space(self, box: Optional[List[int]], top: int, transform: Dict) -> Optional[List[int]]:
+        """把片段内的坐标映射回原图坐标"""
+        if box is None:
+            return None
+        scale = transform["scale"]
+        offset_y = transform["offset_y"]
+        x0, y0, x1, y1 = box
+        return [
+            int(round(x0 / scale)),
+            int(round((y0 + top) / scale)) + offset_y,
+            int(round(x1 / scale)),
+            int(round((y1 + top) / scale)) + offset_y,
+        ]
+
+    def _merge_lines(self, lines: List[Dict]) -> List[Dict]:
+        """合并位置重叠的重复文本行（重叠区域被识别两次），保留外框较大的一条
+
+        较小的外框通常是在片段边缘被截断的残行。
+        """
+        boxed = sorted((line for line in lines if line["box"]), key=lambda line: line["box"][1])
+        merged: List[Dict] = []
+        for line in boxed:
+            x0, y0, x1, y1 = line["box"]
+            area = (x1 - x0) * (y1 - y0)
+            duplicate = None
+            # 只和垂直方向仍有重叠的已保留行比较
+            for idx in range(len(merged) - 1, -1, -1):
+                mx0, my0, mx1, my1 = merged[idx]["box"]
+                if my1 <= y0 and my0 < y0 - (y1 - y0) * 4:
+                    break
+                inter = max(0, min(x1, mx1) - max(x0, mx0)) * max(0, min(y1, my1) - max(y0, my0))
+                union = area + (mx1 - mx0) * (my1 - my0) - inter
+                if union > 0 and inter / union >= 0.5:
+                    duplicate = idx
+                    break
+            if duplicate is None:
+                merged.append(line)
+            else:
+                mx0, my0, mx1, my1 = merged[duplicate]["box"]
+                if area > (mx1 - mx0) * (my1 - my0):
+                    merged[duplicate] = line
+        return merged + [line for line in lines if not line["box"]]
+
+    def _reading_order(self, lines: List[Dict]) -> List[Dict]:
+        """按行（中线相近）从上到下、行内从左到右排序"""
+        if not lines or not all(line["box"] for line in lines):
+            return lines
+        line_height = float(np.median([line["box"][3] - line["box"][1] for line in lines])) or 1.0
+        ordered = sorted(lines, key=lambda line: line["box"][1] + line["box"][3])
+        rows: List[List[Dict]] = []
+        row_center = None
+        for line in ordered:
+            center = (line["box"][1] + line["box"][3]) / 2
+            if row_center is None or center - row_center > line_height / 2:
+                rows.append([])
+                row_center = center
+            rows[-1].append(line)
+        return [line for row in rows for line in sorted(row, key=lambda line: line["box"][0])]
+
+    def _extract_funds(self, lines: List[Dict]) -> List[Dict]:
+        """从文本行中提取基金信息，有位置信息时按版面关联，否则按行序关联"""
+        if lines and all(line["box"] for line in lines):
+            return self._extract_fund_info_spatial(lines)
+        return self._extract_fund_info([line["text"] for line in lines])
+
+    def _extract_fund_info_spatial(self, lines: List[Dict]) -> List[Dict]:
+        """按版面位置从文本行中提取基金信息
+
+        以基金名称（或没有名称的基金代码）为锚点，锚点下方到下一个锚点之间为同一张卡片；
+        金额取卡片中锚点下方第一行金额里与锚点左对齐的一个，避免把收益等其他列当成金额。
+        """
+        texts = [line["text"].strip() for line in lines]
+        boxes = [line["box"] for line in lines]
+        line_height = float(np.median([box[3] - box[1] for box in boxes])) or 1.0
+
+        # 每行只分类一次
+        is_code_line = [bool(FUND_CODE_FORMAT.match(text)) for text in texts]
+        codes = [match.group(1) if match else None for match in map(FUND_CODE_PATTERN.search, texts)]
+        amounts = [None if is_code_line[i] else self._parse_amount(text) for i, text in enumerate(texts)]
+        is_name = [self._is_fund_name(text) for text in texts]
+
+        names = [i for i in range(len(lines)) if is_name[i]]
+        name_tops = [boxes[i][1] for i in names]
+
+        def card_limit(anchor: int, anchor_tops: List[int]) -> float:
+            """锚点所在卡片的下边界：下一个锚点的顶部，最多向下8行"""
+            limit = boxes[anchor][3] + line_height * 8
+            for top in anchor_tops:
+                if top > boxes[anchor][1] + line_height / 2:
+                    return min(limit, top)
+            return limit
+
+        def find_amount(anchor: int, limit: float) -> Optional[Decimal]:
+            ax0, _, _, ay1 = boxes[anchor]
+            candidates = [
+                j for j in range(len(lines))
+                if amounts[j] is not None and boxes[j][1] >= ay1 - line_height * 0.3 and boxes[j][1] < limit
+            ]
+            if not candidates:
+                return None
+            # 锚点下方第一行金额中，与锚点左边缘最接近的一个
+            first_row = min(boxes[j][1] + boxes[j][3] for j in candidates) / 2
+            row = [j for j in candidates if (boxes[j][1] + boxes[j][3]) / 2 - first_row < line_height * 0.6]
+            return amounts[min(row, key=lambda j: abs(boxes[j][0] - ax0))]
 
-    def _preprocess_image(self, image: np.ndarray) -> List[np.ndarray]:
-        """图片预处理，只返回原图（简化处理）"""
-        # 对于长图，只使用原图策略，避免重复处理
-        return [image]
+        results = []
+        used_codes = set()
+        for i in names:
+            limit = card_limit(i, name_tops)
+            amount = find_amount(i, limit)
+            if amount is None:
+                continue
+            fund_code = codes[i] or ""
+            if not fund_code:
+                for j in range(len(lines)):
+                    if is_code_line[j] and j not in used_codes and boxes[i][1] < boxes[j][1] < limit:
+                        fund_code = codes[j]
+                        used_codes.add(j)
+                        break
+            results.append({
+                "fund_code": fund_code,
+                "amount": float(amount),
+                "shares": 0.0,
+                "fund_name": texts[i]
+            })
+
+        # 没有名称的基金代码单独作为锚点
+        code_anchors = [j for j in range(len(lines)) if is_code_line[j] and j not in used_codes]
+        anchor_tops = sorted(name_tops + [boxes[j][1] for j in code_anchors])
+        for j in code_anchors:
+            if any(boxes[i][1] <= boxes[j][1] < card_limit(i, name_tops) for i in names):
+                continue
+            amount = find_amount(j, card_limit(j, anchor_tops))
+            if amount is not None:
+                results.append({
+                    "fund_code": codes[j],
+                    "amount": float(amount),
+                    "shares": 0.0,
+                    "fund_name": ""
+                })
+
+        logger.debug("按版面识别: %d 只", len(results))
+        return results
 
     def _extract_fund_info(self, text_lines: List[str]) -> List[Dict]:
         """从OCR文本中提取基金信息"""
-        results = []
+        # 每行只解析一次金额，相邻窗口重叠的行不再重复解析
+        lines = [line.strip() for line in text_lines]
+        line_amounts = [self._parse_amount(line) for line in lines]
 
-        # 正则模式
-        fund_code_pattern = re.compile(r'(\d{6})')
-
-        # 基金名称必须包含的核心关键词（基金类型）
-        fund_type_keywords = ['债券', '混合', '指数', '股票', 'ETF', '联接', 'LOF', 'QDII',
-                              '货币', '理财', '增强', '量化', '灵活配置', '偏股', '偏债']
-
-        # 基金名称常见后缀（用于辅助识别）
-        fund_suffixes = ['A', 'B', 'C', 'D', 'E', 'F', 'R', 'H', 'I',
-                         'ETF', 'LOF', 'QDII', '联接A', '联接C', '联接']
-
-        # 基金公司名称前缀（扩充列表）
-        fund_company_prefixes = ['华夏', '易方达', '广发', '南方', '博时', '富国', '招商',
-                                 '汇添富', '嘉实', '鹏华', '工银', '建信', '中银', '交银',
-                                 '兴全', '景顺', '天弘', '银华', '国泰', '华安', '中欧',
-                                 '诺安', '平安', '大成', '申万', '长信', '华宝', '前海',
-                                 '财通', '德邦', '万家', '长城', '东方', '国投', '华商',
-                                 '兴业', '农银', '浦银', '民生', '永赢', '西部', '信达',
-                                 '金鹰', '泰达', '国联', '中加', '融通', '新华', '光大',
-                                 '摩根', '信澳', '中信', '海富通', '上投', '国海', '安信',
-                                 '方正', '中邮', '创金', '九泰', '中融', '鑫元', '红塔',
-                                 '睿远', '泓德', '朱雀', '淳厚', '合煦', '弘毅']
-
-        # 排除关键词（非基金内容）
-        exclude_keywords = ['降准', '降息', '影响', '锦囊', '投资建议',
-                           '分析师', '观点', '策略', '研报', '解读', '热点',
-                           '新闻', '资讯', '公告', '排行', '榜单',
-                           '昨日', '今日', '本周', '本月', '点击', '查看', '更多',
-                           '持仓金额', '持有份额', '累计收益', '持仓收益', '日收益',
-                           '总金额', '总收益', '安全', '保障', '我的', '全部',
-                           '自选', '关注', '加自选', '买入', '卖出',
-                           '基金经理说', '限额上调', '把握', '开门红',
-                           '拐点', '临近', '关注市场', '有哪些', '怎么',
-                           '如何', '为什么', '什么是', '对哪', '？',
-                           '!', '！', '金额/', '收益/', '份额/',
-                           '金选指数', '金选债券', '金选混合', '金选纯债']
+        def amounts_in(start: int, end: int) -> List[Decimal]:
+            return [amount for amount in line_amounts[start:min(end, len(lines))] if amount is not None]
 
         # 第一遍：尝试找基金代码
         code_based_results = []
         i = 0
         while i < len(text_lines):
-            line = text_lines[i]
-            code_match = fund_code_pattern.search(line)
+            code_match = FUND_CODE_PATTERN.search(text_lines[i])
             if code_match:
                 fund_code = code_match.group(1)
-                search_lines = text_lines[i:min(i+5, len(text_lines))]
-                amounts = self._find_amounts_in_lines(search_lines)
+                amounts = amounts_in(i, i + 5)
 
                 if amounts:
                     code_based_results.append({
@@ -144,23 +445,14 @@ class OCRService:
         # 第二遍：通过基金名称+金额识别（总是执行，补充没有代码的基金）
         name_based_results = []
         i = 0
-        while i < len(text_lines):
-            line = text_lines[i].strip()
-
-            # 排除明显不是基金的内容
-            if any(ex in line for ex in exclude_keywords):
-                i += 1
-                continue
-
-            # 检查是否是基金名称
-            is_fund_name = self._is_fund_name(line, fund_type_keywords,
-                                               fund_suffixes, fund_company_prefixes)
+        while i < len(lines):
+            line = lines[i]
 
-            if is_fund_name:
+            # 检查是否是基金名称（包含排除关键词的不是）
+            if self._is_fund_name(line):
                 fund_name = line
                 # 在后续行查找金额
-                search_lines = text_lines[i+1:min(i+4, len(text_lines))]
-                amounts = self._find_amounts_in_lines(search_lines)
+                amounts = amounts_in(i + 1, i + 4)
 
                 if amounts:
                     amount = max(amounts)
@@ -176,28 +468,26 @@ class OCRService:
 
         # 合并两种方式的结果（代码优先，但也保留名称匹配的结果）
         results = code_based_results + name_based_results
-        print(f"  通过代码识别: {len(code_based_results)} 只，通过名称识别: {len(name_based_results)} 只")
+        logger.debug("通过代码识别: %d 只，通过名称识别: %d 只", len(code_based_results), len(name_based_results))
 
         return results
 
-    def _is_fund_name(self, text: str, type_kws: List[str], suffixes: List[str],
-                      company_prefixes: List[str]) -> bool:
-        """判断文本是否是基金名称"""
+    def _is_fund_name(self, text: str) -> bool:
+        """判断文本是否是基金名称，各类关键词一次扫描"""
         if not text or len(text) < 4 or len(text) > 35:
             return False
 
-        # 必须包含基金类型关键词
-        has_type = any(kw in text for kw in type_kws)
-        if not has_type:
+        hits = KEYWORDS.find(text)
+        # 排除明显不是基金的内容，且必须包含基金类型关键词
+        if "exclude" in hits or "fund_types" not in hits:
             return False
 
         # 以基金公司名开头直接通过
-        has_company = any(text.startswith(cp) for cp in company_prefixes)
-        if has_company:
+        if hits.get("company_prefixes"):
             return True
 
         # 统计中文字符数量
-        chinese_count = sum(1 for c in text if '\u4e00' <= c <= '\u9fff')
+        chinese_count = len(CHINESE_CHAR_PATTERN.findall(text))
 
         # 中文字符足够多也可以（放宽条件）
         if chinese_count >= 3 and len(text) >= 5:
@@ -205,27 +495,22 @@ class OCRService:
 
         return False
 
-    def _find_amounts_in_lines(self, lines: List[str]) -> List[Decimal]:
-        """从文本行中提取金额"""
-        amounts = []
-        for line in lines:
-            line = line.strip()
-            # 跳过涨跌金额和百分比
-            if line.startswith('+') or line.startswith('-') or '%' in line:
-                continue
-            # 跳过非数字内容
-            if not line or not line[0].isdigit():
-                continue
-            try:
-                clean = line.replace(',', '')
-                # 金额格式：纯数字或带小数点
-                if re.match(r'^\d+\.?\d*$', clean):
-                    value = Decimal(clean)
-                    if 10 < value < 10000000:  # 合理的持仓金额范围
-                        amounts.append(value)
-            except:
-                pass
-        return amounts
+    def _parse_amount(self, line: str) -> Optional[Decimal]:
+        """解析持仓金额，不是金额的行返回None"""
+        # 跳过涨跌金额和百分比
+        if line.startswith('+') or line.startswith('-') or '%' in line:
+            return None
+        # 跳过非数字内容
+        if not line or not line[0].isdigit():
+            return None
+        clean = line.replace(',', '')
+        # 金额格式：纯数字或带小数点
+        if not AMOUNT_PATTERN.match(clean):
+            return None
+        value = Decimal(clean)
+        if 10 < value < 10000000:  # 合理的持仓金额范围
+            return value
+        return None
 
     def _validate_fund_data(self, data: Dict) -> bool:
         """验证基金数据合理性"""
@@ -237,7 +522,7 @@ class OCRService:
             return False
 
         # 如果有基金代码，检查格式
-        if fund_code and not re.match(r'^\d{6}$', fund_code):
+        if fund_code and not FUND_CODE_FORMAT.match(fund_code):
             return False
 
         # 检查金额
@@ -251,17 +536,51 @@ class OCRService:
 
         return True
 
-    async def recognize_from_base64(self, base64_data: str) -> List[Dict]:
-        """从base64图片识别基金信息"""
-        # 解码base64
-        if ',' in base64_data:
-            base64_data = base64_data.split(',')[1]
+    @asynccontextmanager
+    async def admit(self, encoded: EncodedImage):
+        """按像素预算准入并解码图片，退出时释放预算
 
-        image_data = base64.b64decode(base64_data)
-        image = Image.open(io.BytesIO(image_data))
-        image_np = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        按图片头中的尺寸决定是否在解码时缩小，解码之前占用预算，
+        解码后的图片在退出前一直计入预算；编码数据在解码后即关闭。
+        超过像素上限且不允许缩小时抛出 ImageTooLargeError，排队超时抛出 OCRBusyError。
+        """
+        max_pixels = settings.OCR_MAX_IMAGE_MP * 1_000_000
+        try:
+            if encoded.size is None:
+                # 无法从图片头读出尺寸时按上限占用预算
+                reduce, pixels = 1, max_pixels
+            else:
+                reduce = plan_reduce(encoded.size, max_pixels, settings.OCR_OVERSIZE_ACTION == "downscale")
+                width, height = encoded.size
+                pixels = -(-width // reduce) * -(-height // reduce)
+
+            async with self.admission.hold(pixels):
+                with _timed(None, "decode"):
+                    image = await asyncio.to_thread(encoded.decode, reduce)
+                encoded.close()
+                if reduce > 1:
+                    self.downscaled += 1
+                    logger.info("图片 %dx%d 超过像素上限，解码时缩小 %d 倍", encoded.size[0], encoded.size[1], reduce)
+                elif image.shape[0] * image.shape[1] > max_pixels:
+                    raise ImageTooLargeError(f"图片超过 {settings.OCR_MAX_IMAGE_MP} 百万像素上限")
+                yield image
+        finally:
+            encoded.close()
+
+    async def recognize_from_encoded(self, encoded: EncodedImage, enrich_info: bool = True) -> List[Dict]:
+        """经过像素预算准入后解码并识别，提取完成即释放预算，补充信息期间不占用"""
+        async with AsyncExitStack() as admission:
+            return await self.recognize_from_image(
+                await admission.enter_async_context(self.admit(encoded)),
+                enrich_info=enrich_info, release=admission.aclose
+            )
 
-        return await self.recognize_from_image(image_np)
+    async def recognize_from_base64(self, base64_data: str) -> List[Dict]:
+        """从base64图片识别基金信息"""
+        encoded = await asyncio.to_thread(
+            EncodedImage.from_base64, base64_data, settings.OCR_MAX_UPLOAD_MB * 1024 * 1024
+        )
+        return await self.recognize_from_encoded(encoded)
 
     async def recognize_from_file(self, file_path: str) -> List[Dict]:
         """从文件识别基金信息"""
@@ -271,104 +590,215 @@ class OCRService:
 
         return await self.recognize_from_image(image)
 
-    def _extract_text_from_result(self, result) -> List[str]:
-        """从OCR结果中提取文本，兼容不同版本的PaddleOCR"""
-        text_lines = []
-
-        if not result:
-            return text_lines
-
-        try:
-            for item in result:
-                if item is None:
-                    continue
-
-                # PaddleX OCRResult 对象（类字典）
-                if hasattr(item, 'keys'):
-                    for key in ['rec_texts', 'rec_text', 'texts', 'text']:
-                        if key in item:
-                            val = item[key]
-                            if isinstance(val, list):
-                                for t in val:
-                                    if isinstance(t, str):
-                                        text_lines.append(t)
-                                    elif isinstance(t, (list, tuple)) and len(t) > 0:
-                                        text_lines.append(str(t[0]))
-                            elif isinstance(val, str):
-                                text_lines.append(val)
-                            break
-
-                # 旧版格式
-                elif isinstance(item, (list, tuple)):
-                    for line in item:
-                        if isinstance(line, (list, tuple)) and len(line) >= 2:
-                            text_info = line[-1]
-                            if isinstance(text_info, (list, tuple)) and len(text_info) >= 1:
-                                text_lines.append(str(text_info[0]))
-                            elif isinstance(text_info, str):
-                                text_lines.append(text_info)
-        except Exception as e:
-            print(f"提取文本失败: {e}")
-
-        return text_lines
-
-    async def recognize_from_image(self, image: np.ndarray, enrich_info: bool = True) -> List[Dict]:
+    async def recognize_from_image(self, image: np.ndarray, enrich_info: bool = True,
+                                   progress: Optional[Callable[[str, Dict], None]] = None,
+                                   timings: Optional[Dict[str, float]] = None,
+                                   release: Optional[Callable[[], Awaitable]] = None) -> List[Dict]:
         """从图片数组识别基金信息
 
         Args:
             image: 图片数组
             enrich_info: 是否通过API搜索补充完整的基金代码和名称
+            progress: 进度回调 progress(事件类型, 数据)，事件依次为
+                segmented（分段完成）、segment（每个片段识别完成，附带该片段初步提取的基金）、
+                extracted（提取去重完成）、enriching（开始补充基金信息）
+            timings: 传入时记录各阶段耗时（秒）：cache / preprocess / split / infer /
+                merge / extract / dedupe / enrich，未执行的阶段不出现
+            release: 提取去重完成、不再需要图片时调用（成功或失败），用于在补充信息之前释放像素预算；
+                调用方应只通过本函数持有图片，释放后图片内存随之回收
         """
-        ocr = self._get_ocr()
+        def report(event: str, data: Dict):
+            if progress is not None:
+                progress(event, data)
 
-        # 对长图进行分段处理（使用更小的窗口提高检测率）
-        # 使用800px窗口，确保每个基金条目都被完整扫描
-        image_segments = self._split_long_image(image, window_height=800)
+        # 每个片段识别完成后立即预取其中基金的信息，与后续片段的识别同时进行
+        prefetches = []
 
-        all_text_lines = []
+        def on_segment_funds(funds: List[Dict]):
+            prefetch = self._prefetch_fund_info(funds)
+            if prefetch is not None:
+                prefetches.append(prefetch)
 
-        # 对每个分段进行OCR
-        for idx, segment in enumerate(image_segments):
-            try:
-                print(f"正在识别第 {idx+1}/{len(image_segments)} 个片段...")
-                # 兼容PaddleX和PaddleOCR的API
-                try:
-                    # PaddleOCR API
-                    result = ocr.ocr(segment, cls=True)
-                except TypeError:
-                    # PaddleX API (predict方法)
-                    result = ocr.predict(segment)
-
-                text_lines = self._extract_text_from_result(result)
-                print(f"  片段 {idx+1} 识别到 {len(text_lines)} 行文本")
-                all_text_lines.extend(text_lines)
-            except Exception as e:
-                print(f"OCR识别失败 (片段 {idx+1}): {e}")
-                import traceback
-                traceback.print_exc()
+        try:
+            fingerprint = None
+            cached = None
+            if self.cache is not None:
+                with _timed(timings, "cache"):
+                    fingerprint = await asyncio.to_thread(self.cache.fingerprint, image)
+                    cached = await asyncio.to_thread(self.cache.get, fingerprint, self._pipeline_id())
+
+            if cached is not None:
+                logger.debug("命中OCR结果缓存，%d 只基金", len(cached["funds"]))
+                results = cached["funds"]
+                report("extracted", {"count": len(results), "funds": results, "cached": True})
+            else:
+                all_lines, results, failed = await self._recognize_funds(
+                    image, progress, on_segment_funds if enrich_info else None, timings
+                )
+                if failed:
+                    # 结果不完整，不写入缓存，相同图片再次上传时重新识别
+                    logger.warning("%d 个片段识别失败，结果不写入缓存", failed)
+                elif self.cache is not None:
+                    with _timed(timings, "cache"):
+                        await asyncio.to_thread(
+                            self.cache.set, fingerprint, self._pipeline_id(), {"lines": all_lines, "funds": results}
+                        )
+                report("extracted", {"count": len(results), "funds": results})
+        finally:
+            # 之后只用到识别结果：先释放图片及其像素预算，等待预取和补充信息（上游接口）期间不阻塞其他上传
+            image = None
+            if release is not None:
+                await release()
+            # 等待预取完成，避免与最终的补充信息重复请求
+            if prefetches:
+                await asyncio.gather(*prefetches)
+
+        # 通过API搜索补充完整信息（估值和名称可能已变化，缓存命中时同样执行）
+        if enrich_info and results:
+            report("enriching", {"count": len(results)})
+            with _timed(timings, "enrich"):
+                results = await self._enrich_fund_info(results)
+
+        return results
+
+    async def recognize_from_images(self, loaders: List[Callable[[], Awaitable[EncodedImage]]],
+                                    enrich_info: bool = True) -> Dict:
+        """识别多张截图并合并结果
+
+        图片按需解码，同时处理的图片不超过 OCR_MULTI_IMAGE_CONCURRENCY 张，并经过像素预算准入，
+        各图片的片段仍由工作池合并为批量推理。单张图片解码或识别失败不影响其他图片；
+        合并后的基金按与单张图片相同的规则去重，再统一补充一次信息。
+
+        Args:
+            loaders: 每张图片一个异步加载函数，返回解码前的图片数据
+            enrich_info: 是否通过API搜索补充完整的基金代码和名称
+
+        Returns:
+            {"data": 合并后的基金列表, "images": 每张图片的 {"count", "error"}}
+        """
+        limit = asyncio.Semaphore(max(1, settings.OCR_MULTI_IMAGE_CONCURRENCY))
+
+        async def recognize_one(load: Callable[[], Awaitable[EncodedImage]]) -> List[Dict]:
+            async with limit:
+                return await self.recognize_from_encoded(await load(), enrich_info=False)
+
+        outcomes = await asyncio.gather(*(recognize_one(load) for load in loaders), return_exceptions=True)
+
+        merged = []
+        summaries = []
+        for idx, outcome in enumerate(outcomes):
+            if isinstance(outcome, (OCRNotReadyError, OCRBusyError)):
+                raise outcome
+            if isinstance(outcome, Exception):
+                logger.warning("第 %d 张图片识别失败: %s", idx + 1, outcome)
+                summaries.append({"count": 0, "error": str(outcome)})
                 continue
+            summaries.append({"count": len(outcome), "error": None})
+            merged.extend(outcome)
 
-        print(f"共提取到 {len(all_text_lines)} 行文本")
+        results = self._dedupe_funds(merged)
+        logger.info("%d 张图片合并去重后共 %d 只基金", len(loaders), len(results))
+        if enrich_info and results:
+            # 只有名称的基金补充代码后，可能与其他截图中带代码的同一基金重复
+            results = self._dedupe_funds(await self._enrich_fund_info(results))
 
-        # 调试：输出所有文本（可选，用于调试）
-        if len(all_text_lines) > 0:
-            print("\n所有识别文本（前100行）:")
-            for idx, line in enumerate(all_text_lines[:100], 1):
-                if line.strip():  # 只打印非空行
-                    print(f"  {idx}. {line}")
+        return {"data": results, "images": summaries}
 
-        # 从所有文本中提取基金信息
-        all_results = self._extract_fund_info(all_text_lines)
-        print(f"初步提取到 {len(all_results)} 条基金信息")
+    async def _recognize_funds(self, image: np.ndarray,
+                               progress: Optional[Callable[[str, Dict], None]] = None,
+                               on_segment_funds: Optional[Callable[[List[Dict]], None]] = None,
+                               timings: Optional[Dict[str, float]] = None
+                               ) -> Tuple[List[Dict], List[Dict], int]:
+        """分割、推理并提取去重，返回 (文本行, 基金列表, 识别失败的片段数)，文本行带有在原图中的位置
 
-        # 打印初步识别结果用于调试
-        for idx, item in enumerate(all_results, 1):
-            print(f"  [{idx}] {item.get('fund_name', '未识别')} - 金额: {item.get('amount', 0):.2f}")
+        Args:
+            image: 图片数组
+            progress: 进度回调
+            on_segment_funds: 每个片段识别完成后以该片段提取的基金调用
+            timings: 各阶段耗时记录，见 recognize_from_image
+        """
+        await self.pool.wait_ready()
+
+        with _timed(timings, "preprocess"):
+            image, transform = self._preprocess_image(image)
+
+        # 对长图进行分段处理（使用更小的窗口提高检测率）
+        # 使用800px窗口，确保每个基金条目都被完整扫描
+        with _timed(timings, "split"):
+            bounds = self._segment_bounds(image, window_height=800)
+        if len(bounds) > 1:
+            logger.debug("长图分割: 图片高度 %dpx，分割成 %d 个片段", image.shape[0], len(bounds))
+        if progress is not None:
+            progress("segmented", {"total": len(bounds)})
+
+        async def recognize_segment(idx: int, top: int, bottom: int) -> Optional[List[Dict]]:
+            try:
+                lines = await self.pool.recognize(image[top:bottom])
+                for line in lines:
+                    line["box"] = self._to_image_space(line["box"], top, transform)
+                logger.debug("片段 %d/%d 识别到 %d 行文本", idx + 1, len(bounds), len(lines))
+                if progress is not None or on_segment_funds is not None:
+                    funds = [item for item in self._extract_funds(self._reading_order(lines))
+                             if self._validate_fund_data(item)]
+                if on_segment_funds is not None:
+                    on_segment_funds(funds)
+                if progress is not None:
+                    progress("segment", {
+                        "index": idx,
+                        "total": len(bounds),
+                        "lines": len(lines),
+                        "funds": funds
+                    })
+                return lines
+            except (OCRNotReadyError, OCRBusyError):
+                raise
+            except Exception as e:
+                logger.exception("OCR识别失败 (片段 %d): %s", idx + 1, e)
+                return None
+
+        # 所有片段同时提交，由工作池合并为批量推理
+        with _timed(timings, "infer"):
+            segment_results = await asyncio.gather(
+                *(recognize_segment(idx, top, bottom) for idx, (top, bottom) in enumerate(bounds))
+            )
+        failed = sum(1 for lines in segment_results if lines is None)
+        # 硬切的片段之间有重叠，按位置合并重复的文本行
+        with _timed(timings, "merge"):
+            all_lines = self._reading_order(self._merge_lines(
+                [line for lines in segment_results if lines is not None for line in lines]
+            ))
+
+        # 调试详情：识别出的文本（前100行）和初步提取结果，只在请求开启调试或DEBUG级别时拼接
+        level = detail_level(logger)
+        if level is not None:
+            text = "\n".join(f"  {idx}. {line['text']}" for idx, line in enumerate(all_lines[:100], 1)
+                             if line["text"].strip())
+            logger.log(level, "共提取到 %d 行文本:\n%s", len(all_lines), text)
 
-        # 去重（基于fund_code或fund_name）
-        # 由于使用滑动窗口，可能会有重复，需要智能去重
+        # 从所有文本中提取基金信息
+        with _timed(timings, "extract"):
+            all_results = self._extract_funds(all_lines)
+
+        if level is not None:
+            items = "\n".join(f"  [{idx}] {item.get('fund_name', '未识别')} - 金额: {item.get('amount', 0):.2f}"
+                              for idx, item in enumerate(all_results, 1))
+            logger.log(level, "初步提取到 %d 条基金信息:\n%s", len(all_results), items)
+
+        with _timed(timings, "dedupe"):
+            results = self._dedupe_funds(all_results)
+        logger.info("识别到 %d 行文本、%d 只基金", len(all_lines), len(results),
+                    extra={"segments": len(bounds), "failed": failed,
+                           "height": image.shape[0], "width": image.shape[1]})
+        return all_lines, results, failed
+
+    def _dedupe_funds(self, funds: List[Dict]) -> List[Dict]:
+        """去重（基于fund_code或fund_name），丢弃验证失败的条目
+
+        同一基金在截图中出现多次时（如置顶和列表中各一次，或多张截图有重叠）只保留一条，
+        保持首次出现的顺序。
+        """
         unique_results = {}
-        for item in all_results:
+        for item in funds:
             if self._validate_fund_data(item):
                 # 优先使用基金代码作为key，其次使用名称
                 key = item["fund_code"] if item["fund_code"] else item["fund_name"]
@@ -377,16 +807,8 @@ class OCRService:
                     if key not in unique_results or item["amount"] > unique_results[key]["amount"]:
                         unique_results[key] = item
             else:
-                print(f"  验证失败: {item.get('fund_name', '未识别')} - 金额: {item.get('amount', 0)}")
-
-        results = list(unique_results.values())
-        print(f"去重后识别到 {len(results)} 只基金")
-
-        # 通过API搜索补充完整信息
-        if enrich_info and results:
-            results = await self._enrich_fund_info(results)
-
-        return results
+                logger.debug("验证失败: %s - 金额: %s", item.get("fund_name", "未识别"), item.get("amount", 0))
+        return list(unique_results.values())
 
     def _clean_fund_name(self, name: str) -> str:
         """清理基金名称，去除不完整的后缀"""
@@ -405,54 +827,106 @@ class OCRService:
         return name.strip()
 
     async def _enrich_fund_info(self, funds: List[Dict]) -> List[Dict]:
-        """通过API搜索补充完整的基金代码和名称"""
+        """通过API补充完整的基金代码和名称
+
+        有代码的基金一次批量查询估值获取名称，只有名称的基金并发批量搜索获取代码，两组同时进行；
+        代码查询失败但有名称的基金再按名称搜索一次。
+        名称先查别名表（用户导入持仓时确认过的识别名称），命中的不再调用搜索接口。
+        补充后的条目用 ocr_name 保留识别出的名称，导入持仓时据此记录别名。
+        """
         from .fund_service import fund_service
 
+        aliases = await alias_service.lookup(fund["fund_name"] for fund in funds if fund.get("fund_name"))
+        codes = [fund["fund_code"] for fund in funds if fund.get("fund_code")]
+        names = [self._clean_fund_name(fund["fund_name"]) for fund in funds
+                 if not fund.get("fund_code") and fund.get("fund_name") and fund["fund_name"] not in aliases]
+
+        quotes, matches = await asyncio.gather(
+            fund_service.get_funds_realtime_batch(codes),
+            fund_service.search_funds_batch(names)
+        )
+
+        # 代码查询失败的基金按名称补充搜索
+        retry_names = [self._clean_fund_name(fund["fund_name"]) for fund in funds
+                       if fund.get("fund_code") and fund["fund_code"] not in quotes
+                       and fund.get("fund_name") and fund["fund_name"] not in aliases]
+        if retry_names:
+            matches.update(await fund_service.search_funds_batch(retry_names))
+
         enriched = []
         for fund in funds:
             fund_code = fund.get("fund_code", "")
             fund_name = fund.get("fund_name", "")
-            amount = fund.get("amount", 0)
 
             # 如果已有基金代码，通过代码获取完整名称
-            if fund_code:
-                try:
-                    fund_data = await fund_service.get_fund_realtime(fund_code)
-                    if fund_data:
-                        enriched.append({
-                            "fund_code": fund_code,
-                            "fund_name": fund_data.get("fund_name", fund_name),
-                            "amount": amount,
-                            "shares": fund.get("shares", 0.0)
-                        })
-                        continue
-                except:
-                    pass
-
-            # 如果只有名称，通过名称搜索获取代码
-            if fund_name:
-                # 清理不完整的名称
-                clean_name = self._clean_fund_name(fund_name)
-                try:
-                    search_result = await fund_service.search_fund_by_name(clean_name)
-                    if search_result:
-                        enriched.append({
-                            "fund_code": search_result.get("fund_code", ""),
-                            "fund_name": search_result.get("fund_name", fund_name),
-                            "amount": amount,
-                            "shares": fund.get("shares", 0.0)
-                        })
-                        print(f"搜索匹配: {fund_name} -> {search_result.get('fund_name')} ({search_result.get('fund_code')})")
-                        continue
-                except Exception as e:
-                    print(f"搜索基金失败: {e}")
-
-            # 搜索失败，保留原始数据
-            enriched.append(fund)
-
-        print(f"补充信息后共 {len(enriched)} 只基金")
+            fund_data = quotes.get(fund_code) if fund_code else None
+            if fund_data:
+                enriched.append({
+                    "fund_code": fund_code,
+                    "fund_name": fund_data.get("fund_name", fund_name),
+                    "ocr_name": fund_name,
+                    "amount": fund.get("amount", 0),
+                    "shares": fund.get("shares", 0.0)
+                })
+                continue
+
+            # 如果只有名称，先查别名表，再用名称搜索的结果
+            alias = aliases.get(fund_name) if fund_name else None
+            if alias:
+                enriched.append({
+                    "fund_code": alias["fund_code"],
+                    "fund_name": alias["fund_name"] or fund_name,
+                    "ocr_name": fund_name,
+                    "amount": fund.get("amount", 0),
+                    "shares": fund.get("shares", 0.0)
+                })
+                continue
+
+            search_result = matches.get(self._clean_fund_name(fund_name)) if fund_name else None
+            if search_result:
+                enriched.append({
+                    "fund_code": search_result.get("fund_code", ""),
+                    "fund_name": search_result.get("fund_name", fund_name),
+                    "ocr_name": fund_name,
+                    "amount": fund.get("amount", 0),
+                    "shares": fund.get("shares", 0.0)
+                })
+                logger.debug("搜索匹配: %s -> %s (%s)", fund_name, search_result.get("fund_name"),
+                             search_result.get("fund_code"))
+                continue
+
+            # 搜索失败，保留原始数据（用户手动填写代码后导入，同样记录别名）
+            enriched.append(dict(fund, ocr_name=fund_name))
+
+        logger.debug("补充信息后共 %d 只基金", len(enriched))
         return enriched
 
+    def _prefetch_fund_info(self, funds: List[Dict]) -> Optional[asyncio.Future]:
+        """后台预取部分识别结果的估值和搜索结果，写入缓存供最终补充信息时使用"""
+        from .fund_service import fund_service
+
+        codes = [fund["fund_code"] for fund in funds if fund.get("fund_code")]
+        raw_names = [fund["fund_name"] for fund in funds if not fund.get("fund_code") and fund.get("fund_name")]
+        if not codes and not raw_names:
+            return None
+
+        async def prefetch():
+            # 别名表命中的名称不需要搜索
+            aliases = await alias_service.lookup(raw_names)
+            names = [self._clean_fund_name(name) for name in raw_names if name not in aliases]
+            await asyncio.gather(
+                fund_service.get_funds_realtime_batch(codes),
+                fund_service.search_funds_batch(names),
+                return_exceptions=True
+            )
+
+        return asyncio.ensure_future(prefetch())
+
 
 # 全局实例
 ocr_service = OCRService()
+
+Gauge("ocr_queue_depth", "等待和正在推理的OCR片段数", func=lambda: ocr_service.pool.status()["pending"])
+Gauge("ocr_admission_in_flight_pixels", "正在解码和识别的图片像素总数",
+      func=lambda: ocr_service.admission.in_flight_pixels)
+Gauge("ocr_admission_waiting", "等待像素预算的请求数", func=lambda: ocr_service.admission.status()["waiting"])
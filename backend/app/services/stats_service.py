@@ -1,15 +1,30 @@
-from typing import Dict, List
+import time
+import logging
+from typing import Dict, List, Optional
 from decimal import Decimal
 from datetime import datetime, date
 from sqlalchemy.orm import Session
 from ..models import Portfolio, Holding, History
 from ..schemas.stats import RealtimeStats, HoldingStats, HistoryStats, HistoryPoint
 from .fund_service import fund_service
+from ..utils.response_cache import response_cache
+from ..utils.metrics import REALTIME_HOLDINGS, REALTIME_STATS_DURATION, size_bucket
+
+logger = logging.getLogger(__name__)
 
 
 class StatsService:
-    async def calculate_realtime_stats(self, db: Session, portfolio_id: int) -> RealtimeStats:
-        """计算实时收益统计"""
+    async def calculate_realtime_stats(self, db: Session, portfolio_id: int,
+                                       deadline: Optional[float] = None) -> RealtimeStats:
+        """计算实时收益统计
+
+        Args:
+            deadline: 最长耗时（秒），到时仍未取到估值的基金使用最后一次的估值（stale），
+                从未取到过的按成本计算（missing），其余获取在后台继续并写入缓存。None 表示等待全部估值
+
+        读取持仓后结束会话的事务，等待估值期间不占用数据库连接，调用方不应有未提交的修改。
+        """
+        start = time.perf_counter()
         # 获取组合
         portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
         if not portfolio:
@@ -18,6 +33,7 @@ class StatsService:
         # 获取持仓
         holdings = db.query(Holding).filter(Holding.portfolio_id == portfolio_id).all()
         if not holdings:
+            REALTIME_STATS_DURATION.observe(time.perf_counter() - start, size_bucket(0))
             return RealtimeStats(
                 portfolio_id=portfolio_id,
                 portfolio_name=portfolio.name,
@@ -29,9 +45,15 @@ class StatsService:
                 updated_at=datetime.now().isoformat()
             )
 
+        # 已加载的对象脱离会话后回滚，连接归还连接池，对象的属性仍可读取
+        for obj in [portfolio, *holdings]:
+            db.expunge(obj)
+        db.rollback()
+
         # 获取基金实时数据
         fund_codes = [h.fund_code for h in holdings]
-        funds_data = await fund_service.get_funds_realtime_batch(fund_codes)
+        timeout = None if deadline is None else max(0.0, deadline - (time.perf_counter() - start))
+        funds_data, stale_data = await fund_service.get_funds_realtime_partial(fund_codes, timeout)
 
         # 计算每只基金的收益
         holding_stats_list = []
@@ -40,14 +62,20 @@ class StatsService:
 
         for holding in holdings:
             fund_data = funds_data.get(holding.fund_code)
+            status = "fresh"
             if not fund_data:
-                continue
+                fund_data = stale_data.get(holding.fund_code)
+                status = "stale" if fund_data else "missing"
+            REALTIME_HOLDINGS.inc(status)
 
             # 计算成本净值
             cost_nav = holding.cost_nav or (holding.amount / holding.shares)
 
-            # 当前净值（优先使用估算净值）
-            current_nav = fund_data.get("estimated_nav") or fund_data.get("last_nav") or Decimal("0")
+            # 当前净值（优先使用估算净值），没有估值时按成本净值计，不计入收益
+            if fund_data:
+                current_nav = fund_data.get("estimated_nav") or fund_data.get("last_nav") or Decimal("0")
+            else:
+                current_nav = cost_nav
 
             # 持仓市值
             value = holding.shares * current_nav
@@ -59,13 +87,15 @@ class StatsService:
 
             holding_stats_list.append(HoldingStats(
                 fund_code=holding.fund_code,
-                fund_name=fund_data.get("fund_name") or holding.fund_name or "",
+                fund_name=(fund_data or {}).get("fund_name") or holding.fund_name or "",
                 shares=holding.shares,
                 cost_nav=cost_nav,
                 current_nav=current_nav,
                 value=value,
                 profit=profit,
-                profit_rate=profit_rate
+                profit_rate=profit_rate,
+                status=status,
+                quote_time=(fund_data or {}).get("estimated_time")
             ))
 
             total_cost += cost
@@ -75,6 +105,7 @@ class StatsService:
         total_profit = total_value - total_cost
         total_profit_rate = (total_profit / total_cost * 100) if total_cost > 0 else Decimal("0")
 
+        REALTIME_STATS_DURATION.observe(time.perf_counter() - start, size_bucket(len(holdings)))
         return RealtimeStats(
             portfolio_id=portfolio_id,
             portfolio_name=portfolio.name,
@@ -83,7 +114,8 @@ class StatsService:
             total_profit=total_profit,
             total_profit_rate=total_profit_rate,
             holdings=holding_stats_list,
-            updated_at=datetime.now().isoformat()
+            updated_at=datetime.now().isoformat(),
+            partial=any(h.status != "fresh" for h in holding_stats_list)
         )
 
     async def record_daily_history(self, db: Session, portfolio_id: int):
@@ -97,7 +129,7 @@ class StatsService:
         ).first()
 
         if existing:
-            print(f"组合 {portfolio_id} 今日已记录")
+            logger.info("组合 %d 今日已记录", portfolio_id)
             return
 
         # 计算实时收益
@@ -128,7 +160,8 @@ class StatsService:
         )
         db.add(history)
         db.commit()
-        print(f"组合 {portfolio_id} 今日收益已记录")
+        response_cache.bump(portfolio_id)
+        logger.info("组合 %d 今日收益已记录", portfolio_id)
 
     def get_history_stats(self, db: Session, portfolio_id: int, days: int = 30) -> HistoryStats:
         """获取历史收益统计"""
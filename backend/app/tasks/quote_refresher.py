@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Holding
+from ..services.fund_service import fund_service
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class QuoteRefresher:
+    """后台定时刷新持仓基金的实时估值
+
+    多worker部署时通过文件锁选出一个进程执行刷新，其他进程定期重试抢锁，
+    持锁进程退出后由其他进程接替。配合共享缓存后端，刷新结果对所有worker可见。
+    """
+
+    def __init__(self, lock_path: str, interval_minutes: int):
+        self.lock_path = lock_path
+        self.interval = interval_minutes * 60
+        self._lock_file = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_file is not None
+
+    def _try_acquire_lock(self) -> bool:
+        """尝试获取文件锁（非阻塞）"""
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            # 不支持文件锁的平台只按单进程处理
+            self._lock_file = True
+            return True
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info("进程 %d 负责后台估值刷新", os.getpid())
+        return True
+
+    def _release_lock(self):
+        if self._lock_file is not None and self._lock_file is not True:
+            self._lock_file.close()
+        self._lock_file = None
+
+    def _get_fund_codes(self):
+        db = SessionLocal()
+        try:
+            return [code for (code,) in db.query(Holding.fund_code).distinct().all()]
+        finally:
+            db.close()
+
+    async def refresh_once(self):
+        """刷新一次所有持仓基金的估值"""
+        fund_codes = await asyncio.to_thread(self._get_fund_codes)
+        if fund_codes:
+            await fund_service.get_funds_realtime_batch(fund_codes, force=True)
+
+    async def _run(self):
+        while True:
+            try:
+                if self._try_acquire_lock() and fund_service._is_trading_time():
+                    await self.refresh_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("后台估值刷新失败: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._release_lock()
+
+
+# 全局实例
+quote_refresher = QuoteRefresher(settings.SCHEDULER_LOCK_PATH, settings.UPDATE_INTERVAL)
@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional, Tuple
+from ..config import settings
+
+
+# 未设置忙等待时间时，等待其他连接释放数据库锁的秒数（sqlite3默认值）
+DEFAULT_BUSY_WAIT = 5.0
+
+
+class CacheBusyError(Exception):
+    """共享缓存的数据库被其他连接锁住，在忙等待时间内未能完成读写"""
+
+
+class CacheBackend:
+    """缓存后端接口
+
+    条目以 (值, 写入时间戳) 的形式返回，过期策略由调用方决定。
+    """
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Tuple[Any, float]]:
+        results = {}
+        for key in keys:
+            entry = self.get(key)
+            if entry is not None:
+                results[key] = entry
+        return results
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """原子递增计数器，返回递增后的值"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def purge(self, before: float) -> int:
+        """删除写入时间早于 before 的条目，返回删除数量"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """进程内缓存，每个worker独立"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        return self._data.get(key)
+
+    def set(self, key: str, value: Any):
+        self._data[key] = (value, time.time())
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = (self._data.get(key) or (0, 0))[0] + 1
+            self._data[key] = (value, time.time())
+            return value
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def purge(self, before: float) -> int:
+        expired = [key for key, (_, ts) in list(self._data.items()) if ts < before]
+        for key in expired:
+            self._data.pop(key, None)
+        return len(expired)
+
+    def clear(self):
+        self._data.clear()
+
+
+def _encode_value(obj):
+    if isinstance(obj, Decimal):
+        return {"$decimal": str(obj)}
+    raise TypeError(f"无法序列化类型 {type(obj).__name__}")
+
+
+def _decode_value(obj: Dict):
+    if len(obj) == 1 and "$decimal" in obj:
+        return Decimal(obj["$decimal"])
+    return obj
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """基于SQLite（WAL模式）的共享缓存
+
+    同一台机器上的多个uvicorn worker共用一个数据库文件，
+    一个worker获取的数据可以直接被其他worker使用。
+
+    设置 busy_timeout 时，数据库被锁住的情况下 get/get_many/set 最多等待这么久，
+    超时抛出 CacheBusyError，由调用方按未命中处理，避免在事件循环中长时间阻塞；
+    incr 等不能丢失的写入仍按默认时间等待。
+    """
+
+    def __init__(self, path: str, namespace: str, busy_timeout: Optional[float] = None):
+        self.path = path
+        self.namespace = namespace
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._patient() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3连接不能跨线程使用，每个线程各持有一个
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            timeout = DEFAULT_BUSY_WAIT if self.busy_timeout is None else self.busy_timeout
+            conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _patient(self):
+        """按默认时间等待数据库锁，用于不能按未命中处理的操作"""
+        conn = self._conn()
+        if self.busy_timeout is None:
+            yield conn
+            return
+        conn.execute(f"PRAGMA busy_timeout = {int(DEFAULT_BUSY_WAIT * 1000)}")
+        try:
+            yield conn
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+
+    @contextmanager
+    def _busy_as_error(self):
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            # 忙等待超时为 "database is locked"
+            if self.busy_timeout is not None and "locked" in str(e):
+                raise CacheBusyError(str(e)) from e
+            raise
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._busy_as_error():
+            row = self._conn().execute(
+                "SELECT value, updated_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0], object_hook=_decode_value), row[1]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Tuple[Any, float]]:
+        keys = list(keys)
+        results = {}
+        # SQLite默认最多999个绑定参数
+        for i in range(0, len(keys), 900):
+            chunk = keys[i:i+900]
+            placeholders = ",".join("?" * len(chunk))
+            with self._busy_as_error():
+                rows = self._conn().execute(
+                    f"SELECT key, value, updated_at FROM cache WHERE namespace = ? AND key IN ({placeholders})",
+                    (self.namespace, *chunk)
+                ).fetchall()
+            for key, value, updated_at in rows:
+                results[key] = (json.loads(value, object_hook=_decode_value), updated_at)
+        return results
+
+    def set(self, key: str, value: Any):
+        value = json.dumps(value, default=_encode_value, ensure_ascii=False)
+        with self._busy_as_error():
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, value, time.time())
+            )
+
+    def incr(self, key: str) -> int:
+        with self._patient() as conn:
+            row = conn.execute(
+                "INSERT INTO cache (namespace, key, value, updated_at) VALUES (?, ?, '1', ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET "
+                "value = CAST(value AS INTEGER) + 1, updated_at = excluded.updated_at "
+                "RETURNING value",
+                (self.namespace, key, time.time())
+            ).fetchone()
+        return int(row[0])
+
+    def delete(self, key: str):
+        with self._patient() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def purge(self, before: float) -> int:
+        with self._patient() as conn:
+            cursor = conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND updated_at < ?", (self.namespace, before)
+            )
+        return cursor.rowcount
+
+    def clear(self):
+        with self._patient() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+
+def create_cache_backend(namespace: str) -> CacheBackend:
+    """根据配置创建缓存后端"""
+    if settings.CACHE_BACKEND == "sqlite":
+        return SQLiteCacheBackend(settings.CACHE_SQLITE_PATH, namespace, settings.CACHE_SQLITE_BUSY_TIMEOUT)
+    if settings.CACHE_BACKEND != "memory":
+        raise ValueError(f"不支持的缓存后端: {settings.CACHE_BACKEND}")
+    return MemoryCacheBackend()
@@ -0,0 +1,223 @@
+import binascii
+import io
+import mmap
+import warnings
+from typing import Callable, Dict, Optional, Tuple, Union
+import cv2
+import numpy as np
+from fastapi import UploadFile
+from PIL import Image
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class ImageDecodeError(ValueError):
+    """图片数据无法解码"""
+
+
+class ImageTooLargeError(ValueError):
+    """上传的图片超过大小上限"""
+
+
+# 缩小解码的倍数对应的imdecode标志，JPEG可在解码时直接缩小，不需要先解码原尺寸
+_REDUCE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def decode_image(buffer: Buffer, reduce: int = 1) -> np.ndarray:
+    """把编码后的图片数据解码为BGR数组
+
+    所有上传入口共用的转换路径：np.frombuffer 只建立视图不复制，
+    cv2.imdecode 直接从该视图解码，灰度、带透明通道的图片统一转为三通道BGR。
+
+    Args:
+        reduce: 解码时缩小的倍数，1 / 2 / 4 / 8
+    """
+    if len(buffer) == 0:
+        raise ImageDecodeError("图片数据为空")
+    image = cv2.imdecode(np.frombuffer(buffer, np.uint8), _REDUCE_FLAGS[reduce])
+    if image is None:
+        raise ImageDecodeError("无法读取图片")
+    return image
+
+
+def probe_size(buffer: Buffer) -> Optional[Tuple[int, int]]:
+    """只读取图片头，返回 (宽, 高)，无法识别的格式返回None"""
+    stream = buffer if isinstance(buffer, mmap.mmap) else io.BytesIO(buffer)
+    try:
+        with warnings.catch_warnings():
+            # 尺寸上限由调用方判断，这里只需要读出尺寸
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(stream) as image:
+                return image.size
+    except Image.DecompressionBombError:
+        raise ImageTooLargeError("图片像素数过大")
+    except Exception:
+        return None
+    finally:
+        stream.seek(0)
+
+
+def plan_reduce(size: Tuple[int, int], max_pixels: int, downscale: bool) -> int:
+    """按像素上限选择解码时缩小的倍数，不允许缩小或缩小8倍仍超限时拒绝"""
+    width, height = size
+    pixels = width * height
+    if pixels <= max_pixels:
+        return 1
+    if downscale:
+        for factor in (2, 4, 8):
+            if pixels // (factor * factor) <= max_pixels:
+                return factor
+    raise ImageTooLargeError(f"图片尺寸 {width}x{height} 超过 {max_pixels / 1e6:.0f} 百万像素上限")
+
+
+class EncodedImage:
+    """解码前的图片数据
+
+    先读出图片头中的尺寸用于准入控制，准入后再解码；
+    数据可能是上传文件的只读映射，用完需要关闭。
+    """
+
+    def __init__(self, buffer: Buffer, close: Optional[Callable[[], None]] = None):
+        self.buffer = buffer
+        self._close = close
+        self.size = probe_size(buffer)
+
+    @classmethod
+    def from_upload(cls, file: UploadFile, max_bytes: int) -> "EncodedImage":
+        """读取上传文件（同步执行，调用方放到线程中）
+
+        上传文件由multipart解析器流式写入SpooledTemporaryFile，小文件在内存、大文件在磁盘：
+        - 已落盘时用只读mmap映射文件，由页缓存直接提供数据，不在进程堆上复制；
+        - 仍在内存时读入按大小预分配的数组，只复制一次压缩数据。
+        """
+        spool = file.file
+        size = file.size
+        if size is None:
+            spool.seek(0, 2)
+            size = spool.tell()
+        if size > max_bytes:
+            raise ImageTooLargeError(f"图片超过 {max_bytes // (1024 * 1024)}MB 上限")
+        if size == 0:
+            raise ImageDecodeError("图片数据为空")
+
+        spool.seek(0)
+        # 已落盘的临时文件有文件名（描述符或路径），仍在内存中的 name 为None
+        if getattr(spool, "name", None) is not None:
+            try:
+                mapped = mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+            except (io.UnsupportedOperation, OSError, ValueError):
+                pass
+            else:
+                return cls(mapped, mapped.close)
+
+        buffer = np.empty(size, np.uint8)
+        read = spool.readinto(memoryview(buffer))
+        return cls(memoryview(buffer)[:read])
+
+    @classmethod
+    def from_base64(cls, data: str, max_bytes: int) -> "EncodedImage":
+        """解码base64图片（可带 data:image/...;base64, 前缀）
+
+        a2b_base64 直接把字符串解码为bytes，不经过PIL图片对象和额外的数组转换。
+        """
+        comma = data.find(",", 0, 256)
+        if comma >= 0:
+            data = data[comma + 1:]
+        # base64每4个字符对应3个字节，超限时不必解码
+        if len(data) // 4 * 3 > max_bytes + 3:
+            raise ImageTooLargeError(f"图片超过 {max_bytes // (1024 * 1024)}MB 上限")
+        try:
+            raw = binascii.a2b_base64(data)
+        except (binascii.Error, ValueError):
+            raise ImageDecodeError("base64数据无效")
+        return cls(raw)
+
+    def decode(self, reduce: int = 1) -> np.ndarray:
+        return decode_image(self.buffer, reduce)
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+    def __enter__(self) -> "EncodedImage":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class UploadSizeLimitMiddleware:
+    """按路径前缀限制请求体的大小
+
+    limits 按顺序匹配，取第一个匹配的前缀（更具体的前缀写在前面）。
+    带 Content-Length 的请求在读取请求体之前直接返回413；
+    分块传输的请求在接收过程中累计字节数，超限时中止读取，
+    避免超大请求体在解析阶段就被完整写入临时文件。
+    中止读取后应用给出的响应（请求体解析失败的400等）被丢弃，改为返回413。
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        max_bytes = None
+        if scope["type"] == "http":
+            max_bytes = next(
+                (limit for prefix, limit in self.limits.items() if scope["path"].startswith(prefix)), None
+            )
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > max_bytes:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    exceeded = True
+                    raise ImageTooLargeError("请求体超过大小上限")
+            return message
+
+        async def guarded_send(message: Message):
+            nonlocal response_started
+            if exceeded:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            await self._reject(send)
+
+    async def _reject(self, send: Send):
+        body = '{"detail":"请求体超过大小上限"}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
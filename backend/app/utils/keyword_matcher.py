@@ -0,0 +1,87 @@
+import re
+from typing import Dict, FrozenSet, Iterable, Set
+
+
+def _trie_pattern(node: Dict) -> str:
+    """把字典树转换为正则表达式，公共前缀只出现一次"""
+    terminal = "" in node
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+    pattern = "(?:" + "|".join(branches) + ")"
+    # 当前节点本身是关键词时后续字符可选，贪婪匹配保证取最长关键词
+    return pattern + "?" if terminal else pattern
+
+
+class KeywordMatcher:
+    """多类别关键词匹配
+
+    所有类别的关键词构建为一棵字典树，编译成一个按公共前缀合并的多选分支正则表达式，
+    一次 findall 扫描即可得到文本中出现了哪些类别的关键词。
+    re 是回溯引擎而不是 Aho-Corasick 自动机：在文本的每个起始位置沿字典树逐层尝试分支，
+    公共前缀只比较一次，匹配在C层完成，替代逐个关键词扫描全文的 any(kw in text)。
+
+    findall 在每处只取最长的匹配且互不重叠，被覆盖的关键词按以下方式补上：
+    包含在匹配内部的关键词预先记入该匹配的类别；与匹配部分重叠、且带来新类别的关键词，
+    预先把两者拼接成的串也加入字典树，重叠出现时匹配到更长的拼接串。
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        direct: Dict[str, Set[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                if keyword:
+                    direct.setdefault(keyword, set()).add(category)
+
+        def found_in(text: str) -> FrozenSet[str]:
+            size = len(text)
+            return frozenset().union(*(direct.get(text[start:end], ())
+                                       for start in range(size) for end in range(start + 1, size + 1)))
+
+        # 每个串中出现的所有关键词的类别
+        anywhere = {keyword: found_in(keyword) for keyword in direct}
+        # 拼接串的类别严格多于原串，类别数有限，拼接必然终止
+        frontier = list(direct)
+        while frontier:
+            combos = []
+            for entry in frontier:
+                for keyword in direct:
+                    for start in range(max(1, len(entry) - len(keyword) + 1), len(entry)):
+                        if not keyword.startswith(entry[start:]) or anywhere[keyword] <= anywhere[entry]:
+                            continue
+                        combo = entry[:start] + keyword
+                        if combo not in anywhere:
+                            anywhere[combo] = found_in(combo)
+                            combos.append(combo)
+            frontier = combos
+
+        trie: Dict = {}
+        self._anywhere: Dict[str, Dict[str, bool]] = {}
+        # 从串开头开始的关键词的类别
+        self._leading: Dict[str, Dict[str, bool]] = {}
+        for entry, found in anywhere.items():
+            node = trie
+            for char in entry:
+                node = node.setdefault(char, {})
+            node[""] = {}
+            self._anywhere[entry] = dict.fromkeys(found, False)
+            self._leading[entry] = dict.fromkeys(
+                frozenset().union(*(direct.get(entry[:end], ()) for end in range(1, len(entry) + 1))), True
+            )
+        # 空关键词表不匹配任何文本
+        self._pattern = re.compile(_trie_pattern(trie) if trie else r"(?!)")
+
+    def find(self, text: str) -> Dict[str, bool]:
+        """返回文本中出现的关键词类别，值表示是否有该类关键词出现在文本开头"""
+        found = self._pattern.findall(text)
+        if not found:
+            return {}
+        hits: Dict[str, bool] = {}
+        for entry in found:
+            hits.update(self._anywhere[entry])
+        # 最左边的匹配从开头开始时文本必以它开头
+        if text.startswith(found[0]):
+            hits.update(self._leading[found[0]])
+        return hits
@@ -0,0 +1,116 @@
+import json
+import logging
+import queue
+import sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from ..config import settings
+
+# 应用日志的根记录器，各模块使用 logging.getLogger(__name__) 得到其子记录器
+ROOT_LOGGER = "app"
+
+# LogRecord 的标准属性，其余属性（通过 extra= 传入）作为结构化字段输出
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# 当前请求是否输出调试详情（如OCR识别出的全部文本），由接口按请求开启
+_debug_request: ContextVar[bool] = ContextVar("debug_request", default=False)
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+# setup_logging 之前 "app" 记录器的 propagate 设置，关闭时恢复
+_propagate = True
+
+
+class JSONFormatter(logging.Formatter):
+    """每条日志输出一行JSON，extra= 传入的字段原样附加"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ExtraFormatter(logging.Formatter):
+    """文本格式，extra= 传入的字段以 key=value 附加在消息后"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        extra = " ".join(
+            f"{key}={value}" for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRS and not key.startswith("_")
+        )
+        return f"{text} {extra}" if extra else text
+
+
+def setup_logging():
+    """配置应用日志，重复调用无效果
+
+    请求路径上的日志调用只把记录放入内存队列（QueueHandler），
+    格式化和写stdout在后台线程（QueueListener）中完成，不阻塞事件循环。
+    低于 LOG_LEVEL 的日志在调用处即被丢弃，使用 %s 占位符时连参数格式化也不会发生。
+    """
+    global _listener, _queue_handler, _propagate
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(_ExtraFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    _queue_handler = QueueHandler(log_queue)
+    logger.addHandler(_queue_handler)
+    # 不再交给根记录器，避免与uvicorn的日志配置重复输出
+    _propagate = logger.propagate
+    logger.propagate = False
+
+
+def shutdown_logging():
+    """停止后台写日志的线程，写完队列中剩余的日志
+
+    同时移除 "app" 记录器上的队列处理器并恢复 propagate，
+    之后的日志（如关闭过程中的日志）交回根记录器，不会写入已无人消费的队列。
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.removeHandler(_queue_handler)
+    logger.propagate = _propagate
+    _queue_handler = None
+    _listener.stop()
+    _listener = None
+
+
+def enable_debug_request():
+    """为当前请求（及其创建的后台任务）开启调试详情输出"""
+    _debug_request.set(True)
+
+
+def detail_level(logger: logging.Logger) -> Optional[int]:
+    """调试详情的输出级别：请求开启了调试时为INFO，否则按记录器是否开启DEBUG决定，不输出时为None
+
+    调用方据此决定是否拼接大段的调试内容，生产环境下不产生任何开销。
+    """
+    if _debug_request.get():
+        return logging.INFO
+    if logger.isEnabledFor(logging.DEBUG):
+        return logging.DEBUG
+    return None
@@ -0,0 +1,261 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """指标基类
+
+    每个线程写入自己的分片（threading.local 中的字典），热路径上没有锁；
+    采集时把所有分片相加。事件循环线程和线程池中的线程各有一个分片，线程数有限，分片数也有限。
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        REGISTRY.append(self)
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            # list.append 在GIL下是原子的
+            self._shards.append(values)
+            return values
+
+    def _snapshots(self) -> List[List[Tuple[Labels, object]]]:
+        snapshots = []
+        for shard in list(self._shards):
+            while True:
+                try:
+                    snapshots.append(list(shard.items()))
+                    break
+                except RuntimeError:
+                    # 其他线程正在插入新的标签组合，重试即可
+                    continue
+        return snapshots
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def collect(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for items in self._snapshots():
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.collect().items())
+        ]
+
+
+class Histogram(_Metric):
+    """分桶统计，分片中保存各桶（不累积）的计数、总和与次数"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # [各桶计数..., +Inf桶计数, 总和, 次数]
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def collect(self) -> Dict[Labels, List]:
+        totals: Dict[Labels, List] = {}
+        for items in self._snapshots():
+            for labels, state in items:
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = list(state)
+                else:
+                    for i, value in enumerate(state):
+                        total[i] += value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = []
+        bounds = self.buckets + (float("inf"),)
+        for labels, state in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{suffix} {state[-1]}")
+        return lines
+
+
+class Gauge(_Metric):
+    """采集时调用函数取当前值，函数返回数值，或 {标签值元组: 数值}"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 func: Optional[Callable[[], Union[float, Dict[Labels, float]]]] = None):
+        super().__init__(name, help, labelnames)
+        self.func = func
+
+    def render(self) -> List[str]:
+        if self.func is None:
+            return []
+        try:
+            value = self.func()
+        except Exception:
+            # 采集失败的指标不输出，不影响其他指标
+            return []
+        if value is None:
+            return []
+        values = value if isinstance(value, dict) else {(): value}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(number)}"
+            for labels, number in sorted(values.items())
+        ]
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """按Prometheus文本格式（0.0.4）输出所有指标
+
+    指标按进程统计，多worker部署时每个进程分别采集。
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def size_bucket(count: int) -> str:
+    """把数量归入固定的区间，作为标签时避免标签值过多"""
+    for bound in (0, 10, 50, 200):
+        if count <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+# HTTP请求
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP请求数", ["method", "route", "status"])
+HTTP_DURATION = Histogram("http_request_duration_seconds", "HTTP请求耗时", ["route"])
+HTTP_DB_QUERIES = Histogram("http_request_db_queries", "每个HTTP请求执行的数据库查询数", ["route"],
+                            buckets=(0, 1, 2, 5, 10, 20, 50, 100))
+
+# 上游基金接口
+UPSTREAM_DURATION = Histogram("fund_upstream_request_seconds", "上游基金接口请求耗时", ["endpoint"])
+UPSTREAM_ERRORS = Counter("fund_upstream_errors_total", "上游基金接口请求失败数", ["endpoint"])
+UPSTREAM_REJECTED = Counter("fund_upstream_rejected_total", "熔断期间未发出的请求数", ["endpoint"])
+CACHE_REQUESTS = Counter("fund_cache_requests_total", "基金数据缓存查询数", ["cache", "result"])
+
+# 收益统计
+REALTIME_STATS_DURATION = Histogram("realtime_stats_duration_seconds", "计算实时收益的耗时，按持仓数分组",
+                                    ["holdings"])
+REALTIME_HOLDINGS = Counter("realtime_stats_holdings_total", "实时收益中各估值状态的持仓数", ["status"])
+
+# OCR
+OCR_STAGE_DURATION = Histogram("ocr_stage_seconds", "OCR各阶段耗时", ["stage"])
+
+# 当前请求的数据库查询计数，由中间件设置；线程池中执行的同步接口会复制上下文，共用同一个列表
+_db_queries: ContextVar[Optional[List[int]]] = ContextVar("db_queries", default=None)
+
+
+def instrument_engine(engine):
+    """在SQLAlchemy引擎上统计每个请求的查询数"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        counter = _db_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+class MetricsMiddleware:
+    """统计HTTP请求数、耗时和数据库查询数
+
+    路由标签使用匹配到的路由模板（如 /api/portfolios/{portfolio_id}/realtime），
+    未匹配的请求归为 unmatched，避免标签值随路径参数增长。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        counter = [0]
+        token = _db_queries.set(counter)
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _db_queries.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(scope["method"], route, str(status))
+            HTTP_DURATION.observe(time.perf_counter() - start, route)
+            HTTP_DB_QUERIES.observe(counter[0], route)
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+from fastapi import Response
+from ..config import settings
+from .cache_backend import CacheBusyError, create_cache_backend
+
+
+class ResponseCache:
+    """读接口响应缓存
+
+    缓存序列化后的JSON字节，键为 (路由, 参数, 版本号)。
+    每个组合维护一个版本号，写接口调用 bump() 递增版本号后，
+    旧版本的缓存条目不会再被命中，最终由LRU淘汰。
+    版本号保存在缓存后端中，使用共享后端时一个worker的写入会让所有worker的缓存失效；
+    共享后端忙、读不到版本号时不使用也不写入缓存。
+    """
+
+    # 组合列表使用的版本作用域
+    PORTFOLIO_LIST = "portfolios"
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._versions = create_cache_backend("response_version")
+        self._lock = threading.Lock()
+
+    def version(self, scope: Hashable) -> Optional[int]:
+        """获取作用域当前版本号，缓存后端忙时返回None"""
+        try:
+            entry = self._versions.get(str(scope))
+        except CacheBusyError:
+            return None
+        return entry[0] if entry else 0
+
+    def bump(self, *scopes: Hashable):
+        """递增版本号，使对应作用域的缓存失效"""
+        for scope in scopes:
+            self._versions.incr(str(scope))
+
+    def get(self, route: str, params: Tuple, scope: Hashable):
+        version = self.version(scope)
+        if version is None:
+            return None
+        key = (route, params, scope, version)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, route: str, params: Tuple, scope: Hashable, body: bytes, version: int):
+        key = (route, params, scope, version)
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def respond(self, route: str, params: Tuple, scope: Hashable,
+                build: Callable[[], bytes], media_type: str = "application/json") -> Response:
+        """返回缓存的响应，未命中时调用 build() 生成并缓存
+
+        build 中抛出的异常（如404）不会被缓存。
+        """
+        body = self.get(route, params, scope)
+        if body is None:
+            # 先取版本号再计算，计算期间发生写入时结果会落在旧版本上，不会被误用
+            version = self.version(scope)
+            body = build()
+            if version is not None:
+                self.set(route, params, scope, body, version)
+        return Response(content=body, media_type=media_type)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局实例
+response_cache = ResponseCache(max_entries=settings.RESPONSE_CACHE_SIZE)
@@ -0,0 +1,141 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+from ..schemas.stats import RealtimeStats, HistoryStats
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_MEDIA_TYPE = "application/vnd.fund.columnar+json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+# 各字段的定点数精度（小数位数），None 表示原样输出（字符串或null）
+TOTAL_SCALES = {
+    "total_cost": 2,
+    "total_value": 2,
+    "total_profit": 2,
+    "total_profit_rate": 2,
+}
+HOLDING_SCALES = {
+    "fund_code": None,
+    "fund_name": None,
+    "shares": 2,
+    "cost_nav": 4,
+    "current_nav": 4,
+    "value": 2,
+    "profit": 2,
+    "profit_rate": 2,
+    "status": None,
+    "quote_time": None,
+}
+HISTORY_SCALES = {
+    "date": None,
+    "total_value": 2,
+    "total_cost": 2,
+    "daily_profit": 2,
+    "daily_profit_rate": 2,
+    "cumulative_profit": 2,
+    "cumulative_profit_rate": 2,
+}
+
+realtime_adapter = TypeAdapter(RealtimeStats)
+history_adapter = TypeAdapter(HistoryStats)
+
+
+def negotiate(request: Request) -> str:
+    """根据Accept头选择响应格式，无法匹配时使用JSON"""
+    accept = request.headers.get("accept")
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    candidates = []
+    for idx, part in enumerate(accept.split(",")):
+        media_type, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        candidates.append((-q, idx, media_type.strip().lower()))
+
+    for neg_q, _, media_type in sorted(candidates):
+        if neg_q == 0:
+            break
+        if media_type == COLUMNAR_MEDIA_TYPE:
+            return COLUMNAR_MEDIA_TYPE
+        if media_type == MSGPACK_MEDIA_TYPE and msgpack is not None:
+            return MSGPACK_MEDIA_TYPE
+        if media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            return JSON_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def to_fixed(value: Decimal, scale: int) -> int:
+    """Decimal 转定点整数，value = 整数 / 10^scale"""
+    return int(value.scaleb(scale).to_integral_value(ROUND_HALF_UP))
+
+
+def _columns(rows: List[BaseModel], scales: Dict[str, Optional[int]]) -> Dict:
+    """将模型列表转换为按列存储的数组"""
+    columns = {"count": len(rows), "scales": {k: v for k, v in scales.items() if v is not None}}
+    for field, scale in scales.items():
+        values = [getattr(row, field) for row in rows]
+        if scale is None:
+            columns[field] = [v if v is None or isinstance(v, str) else str(v) for v in values]
+        else:
+            columns[field] = [to_fixed(v, scale) for v in values]
+    return columns
+
+
+def realtime_to_columnar(stats: RealtimeStats) -> Dict:
+    """实时收益的紧凑表示：汇总字段与持仓列均为定点整数"""
+    data = {
+        "portfolio_id": stats.portfolio_id,
+        "portfolio_name": stats.portfolio_name,
+        "updated_at": stats.updated_at,
+        "partial": stats.partial,
+        "scales": TOTAL_SCALES,
+    }
+    for field, scale in TOTAL_SCALES.items():
+        data[field] = to_fixed(getattr(stats, field), scale)
+    data["holdings"] = _columns(stats.holdings, HOLDING_SCALES)
+    return data
+
+
+def history_to_columnar(stats: HistoryStats) -> Dict:
+    """历史收益的紧凑表示"""
+    return {
+        "portfolio_id": stats.portfolio_id,
+        "portfolio_name": stats.portfolio_name,
+        "history": _columns(stats.history, HISTORY_SCALES),
+    }
+
+
+def encode_realtime(stats: RealtimeStats, media_type: str) -> bytes:
+    if media_type == JSON_MEDIA_TYPE:
+        return realtime_adapter.dump_json(stats)
+    return _encode_compact(realtime_to_columnar(stats), media_type)
+
+
+def encode_history(stats: HistoryStats, media_type: str) -> bytes:
+    if media_type == JSON_MEDIA_TYPE:
+        return history_adapter.dump_json(stats)
+    return _encode_compact(history_to_columnar(stats), media_type)
+
+
+def _encode_compact(data: Dict, media_type: str) -> bytes:
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(data, use_bin_type=True)
+    return to_json(data)
+
+
+def encoded_response(body: bytes, media_type: str) -> Response:
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
@@ -0,0 +1,161 @@
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..config import settings
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # 可选依赖，未安装时用 cProfile
+    Profiler = None
+
+# 当前请求各阶段的 [累计耗时（秒）, 次数]，由中间件设置；
+# 子任务和 asyncio.to_thread 会复制上下文，共用同一个字典
+_spans: ContextVar[Optional[Dict[str, List]]] = ContextVar("request_spans", default=None)
+
+
+def record(name: str, seconds: float):
+    """把一段耗时计入当前请求的阶段，不在请求中时忽略"""
+    spans = _spans.get()
+    if spans is None:
+        return
+    span = spans.get(name)
+    if span is None:
+        spans[name] = [seconds, 1]
+    else:
+        span[0] += seconds
+        span[1] += 1
+
+
+@contextmanager
+def span(name: str):
+    """统计代码块的耗时，计入当前请求的阶段"""
+    if _spans.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def instrument_engine(engine):
+    """把SQLAlchemy查询耗时计入当前请求的 db 阶段"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        if _spans.get() is not None and context is not None:
+            context._timing_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_timing_start", None)
+        if start is not None:
+            record("db", time.perf_counter() - start)
+
+
+def format_server_timing(spans: Dict[str, List], total: float) -> bytes:
+    parts = [
+        f'{name};dur={seconds * 1000:.1f};desc="{count}x"'
+        for name, (seconds, count) in spans.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts).encode()
+
+
+class ServerTimingMiddleware:
+    """按请求记录各阶段耗时，通过 Server-Timing 响应头返回
+
+    阶段：db（数据库查询）、cache（基金数据缓存读取）、upstream（上游接口）、ratelimit（请求间隔等待）、
+    serialize（响应序列化）和 OCR 各阶段（ocr-*）。并发执行的阶段按各自耗时累加，可能超过 total。
+    开启 PROFILE_ENABLED 时，带 ?profile=1 的请求返回该请求的性能分析报告而不是原响应：
+    安装了 pyinstrument 时为采样分析的HTML报告，否则为 cProfile 的文本报告。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if settings.PROFILE_ENABLED and self._wants_profile(scope):
+            await self._profile(scope, receive, send)
+            return
+        if not settings.SERVER_TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        spans: Dict[str, List] = {}
+        token = _spans.set(spans)
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", format_server_timing(spans, time.perf_counter() - start)))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _spans.reset(token)
+
+    @staticmethod
+    def _wants_profile(scope: Scope) -> bool:
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return query.get("profile", [""])[0] in ("1", "true")
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send):
+        """执行请求并丢弃原响应，返回性能分析报告
+
+        分析期间同一进程中并发执行的其他请求也会计入报告，应在空闲时使用。
+        """
+        status = 500
+
+        async def discard(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        if Profiler is not None:
+            profiler = Profiler(interval=0.001, async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profiler.stop()
+            body = profiler.output_html().encode()
+            content_type = b"text/html; charset=utf-8"
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(50)
+            body = output.getvalue().encode()
+            content_type = b"text/plain; charset=utf-8"
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profiled-status", str(status).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1 @@
+# 性能基准测试脚本，在 backend 目录下以 python -m benchmarks.xxx 运行
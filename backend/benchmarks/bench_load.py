@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+"""
+API负载测试
+
+在临时目录中创建SQLite数据库，写入 N 个组合 × M 只持仓和每个组合的历史记录，
+fund_service 的上游接口替换为本地桩（按 --upstream-ms 模拟延迟，不访问网络），
+通过进程内ASGI客户端（httpx.ASGITransport）驱动 app，不经过网络和uvicorn。
+
+每个虚拟用户按权重随机选择请求并循环发送，直到持续时间结束：
+- realtime: GET /api/portfolios/{id}/realtime
+- history: GET /api/portfolios/{id}/history
+- list: GET /api/portfolios/{id}/holdings
+- import: POST /api/portfolios/{id}/holdings/batch（写入单独的导入组合）
+--users 可给出多个并发数，依次运行，用于找出 realtime p99 开始变差的并发数。
+报告每种请求的吞吐量和延迟分位数，--output 保存为JSON便于对比不同版本。
+
+用法: python -m benchmarks.bench_load [--portfolios 20] [--holdings 30] [--users 1,10,50]
+      [--duration 10] [--mix realtime=70,history=15,list=10,import=5] [--upstream-ms 50]
+      [--no-cache] [--output result.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+OPERATIONS = ["realtime", "history", "list", "import"]
+
+
+def configure_environment(workdir: str):
+    """在导入app之前设置配置，所有数据文件写入临时目录"""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'database.db')}",
+        "OCR_JOB_STORE_PATH": os.path.join(workdir, "ocr_jobs.db"),
+        "OCR_CACHE_PATH": os.path.join(workdir, "ocr_cache.db"),
+        "CACHE_SQLITE_PATH": os.path.join(workdir, "cache.db"),
+        "SCHEDULER_LOCK_PATH": os.path.join(workdir, "scheduler.lock"),
+        "CACHE_BACKEND": "memory",
+        "ENABLE_SCHEDULER": "false",
+        "OCR_WARMUP": "false",
+        "LOG_LEVEL": "WARNING",
+    })
+
+
+def fund_code(i: int) -> str:
+    return f"{100000 + i:06d}"
+
+
+def seed_database(portfolios: int, holdings: int, history_days: int) -> List[int]:
+    """写入组合、持仓和历史记录，返回组合ID"""
+    from app.database import SessionLocal
+    from app.models import Portfolio, Holding, History
+
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        ids = []
+        for p in range(portfolios):
+            portfolio = Portfolio(name=f"压测组合{p}")
+            db.add(portfolio)
+            db.flush()
+            ids.append(portfolio.id)
+            for h in rng.sample(range(holdings * 4), holdings):
+                shares = Decimal(rng.randint(100, 1000000)) / 100
+                cost_nav = Decimal(rng.randint(5000, 30000)) / 10000
+                db.add(Holding(portfolio_id=portfolio.id, fund_code=fund_code(h), fund_name=f"压测基金{h}",
+                               shares=shares, amount=shares * cost_nav, cost_nav=cost_nav))
+            start = date.today() - timedelta(days=history_days)
+            for d in range(history_days):
+                value = Decimal(rng.randint(1000000, 9000000)) / 100
+                cost = Decimal(rng.randint(1000000, 9000000)) / 100
+                db.add(History(portfolio_id=portfolio.id, record_date=start + timedelta(days=d),
+                               total_value=value, total_cost=cost, daily_profit=Decimal("0"),
+                               daily_profit_rate=Decimal("0"), cumulative_profit=value - cost,
+                               cumulative_profit_rate=(value - cost) / cost * 100))
+        import_portfolio = Portfolio(name="压测导入")
+        db.add(import_portfolio)
+        db.commit()
+        return ids + [import_portfolio.id]
+    finally:
+        db.close()
+
+
+def install_upstream_stub(upstream_ms: float, cache: bool):
+    """把上游估值接口替换为本地桩，返回每次调用的计数器"""
+    from app.services.fund_service import fund_service
+
+    calls = {"count": 0}
+
+    async def fetch(session, code: str) -> Optional[Dict]:
+        calls["count"] += 1
+        if upstream_ms > 0:
+            await asyncio.sleep(upstream_ms / 1000)
+        nav = Decimal(1000 + int(code) % 1000) / 1000
+        return {
+            "fund_code": code,
+            "fund_name": f"压测基金{code}",
+            "last_nav": nav,
+            "estimated_nav": nav * Decimal("1.01"),
+            "estimated_growth_rate": Decimal("1.00"),
+            "estimated_time": "2024-01-01 15:00",
+            "last_nav_date": "2024-01-01",
+        }
+
+    fund_service._fetch_from_api = fetch
+    if not cache:
+        # 缓存始终过期，每次请求都经过上游
+        fund_service._get_cache_ttl = lambda: 0
+    return calls
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"未知的请求类型: {name}，可选 {','.join(OPERATIONS)}")
+        mix[name] = int(weight)
+    return mix
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def run_level(app, portfolio_ids: List[int], import_id: int, users: int, duration: float,
+                    mix: Dict[str, int], think_ms: float) -> Dict:
+    """以指定并发数运行一轮，返回各请求类型的统计"""
+    import httpx
+
+    latencies: Dict[str, List[float]] = {name: [] for name in mix}
+    errors: Dict[str, int] = {name: 0 for name in mix}
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    import_seq = [0]
+
+    def build_request(op: str, rng: random.Random):
+        portfolio_id = rng.choice(portfolio_ids)
+        if op == "realtime":
+            return "GET", f"/api/portfolios/{portfolio_id}/realtime", None
+        if op == "history":
+            return "GET", f"/api/portfolios/{portfolio_id}/history?days={rng.choice([7, 30, 90])}", None
+        if op == "list":
+            return "GET", f"/api/portfolios/{portfolio_id}/holdings", None
+        import_seq[0] += 1
+        base = 500000 + import_seq[0] * 10
+        holdings = [{"fund_code": fund_code(base + i), "shares": "100", "amount": "123.45"} for i in range(5)]
+        return "POST", f"/api/portfolios/{import_id}/holdings/batch", {"holdings": holdings}
+
+    async def user(idx: int, client):
+        rng = random.Random(1000 + idx)
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            op = rng.choices(names, weights)[0]
+            method, url, body = build_request(op, rng)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                if response.status_code >= 400:
+                    errors[op] += 1
+            except Exception:
+                errors[op] += 1
+            latencies[op].append(time.perf_counter() - start)
+            if think_ms > 0:
+                await asyncio.sleep(rng.uniform(0, think_ms * 2) / 1000)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(user(i, client) for i in range(users)))
+        elapsed = time.perf_counter() - start
+
+    result = {"users": users, "elapsed": elapsed, "operations": {}}
+    for op, values in latencies.items():
+        result["operations"][op] = {
+            "requests": len(values),
+            "errors": errors[op],
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p90_ms": percentile(values, 90) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": max(values) * 1000 if values else 0.0,
+        }
+    total = sum(len(values) for values in latencies.values())
+    result["total_rps"] = total / elapsed
+    return result
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_level(result: Dict):
+    print(f"\n并发 {result['users']}，总吞吐 {result['total_rps']:.1f} 请求/秒")
+    print(f"  {'请求':<10}{'次数':>8}{'失败':>6}{'请求/秒':>10}{'p50ms':>9}{'p90ms':>9}{'p99ms':>9}{'最大ms':>9}")
+    for op, stats in result["operations"].items():
+        print(f"  {op:<10}{stats['requests']:>8}{stats['errors']:>6}{stats['rps']:>10.1f}"
+              f"{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API负载测试")
+    parser.add_argument("--portfolios", type=int, default=20, help="组合数")
+    parser.add_argument("--holdings", type=int, default=30, help="每个组合的持仓数")
+    parser.add_argument("--history-days", type=int, default=90, help="每个组合的历史记录天数")
+    parser.add_argument("--users", default="1,10,50", help="并发用户数，逗号分隔，依次运行")
+    parser.add_argument("--duration", type=float, default=10, help="每轮持续时间（秒）")
+    parser.add_argument("--mix", default="realtime=70,history=15,list=10,import=5", help="请求类型及权重")
+    parser.add_argument("--think-ms", type=float, default=0, help="用户两次请求之间的平均间隔（毫秒）")
+    parser.add_argument("--upstream-ms", type=float, default=50, help="模拟的上游接口延迟（毫秒）")
+    parser.add_argument("--no-cache", action="store_true", help="估值缓存始终过期，每次请求都访问上游")
+    parser.add_argument("--output", help="把结果保存为JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    levels = [int(u) for u in args.users.split(",")]
+
+    with tempfile.TemporaryDirectory(prefix="bench_load_") as workdir:
+        configure_environment(workdir)
+        from app.main import app
+
+        ids = seed_database(args.portfolios, args.holdings, args.history_days)
+        portfolio_ids, import_id = ids[:-1], ids[-1]
+        calls = install_upstream_stub(args.upstream_ms, not args.no_cache)
+        print(f"{args.portfolios} 个组合 × {args.holdings} 只持仓，上游延迟 {args.upstream_ms:.0f}ms，"
+              f"估值缓存{'关闭' if args.no_cache else '开启'}，请求比例 {args.mix}")
+
+        async def run_levels() -> List[Dict]:
+            # 所有轮次在同一个事件循环中运行，服务中的信号量等对象绑定在该循环上
+            levels_results = []
+            for users in levels:
+                calls["count"] = 0
+                result = await run_level(app, portfolio_ids, import_id, users, args.duration, mix, args.think_ms)
+                result["upstream_calls"] = calls["count"]
+                levels_results.append(result)
+                print_level(result)
+            return levels_results
+
+        results = asyncio.run(run_levels())
+
+    if args.output:
+        report = {
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "levels": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+"""
+服务层与数据路径微基准测试
+
+在临时目录中创建SQLite数据库，使用固定随机种子生成的本地数据，逐项测量热点函数，不访问网络：
+- stats.realtime: StatsService.calculate_realtime_stats（估值全部命中缓存），按持仓数
+- stats.history: StatsService.get_history_stats，按天数
+- ocr.extract: OCRService._extract_fund_info，按OCR文本行数（合成的基金名称、代码、金额与干扰文本）
+- fund.cache: FundService.get_funds_realtime_batch 全部命中缓存的查找路径，按基金数
+- fund.jsonp: 估值接口jsonp响应的解析（parse_quote）
+- holdings.batch: create_holdings_batch 批量导入，按条数（每次导入到新建的组合）
+
+每项先自动确定单轮的调用次数（单轮至少 --min-time 秒），再运行 --repeat 轮，报告每次调用耗时的中位数。
+--save-baseline 把结果保存为JSON；--compare 与保存的基线对比，
+任一项变慢超过 --threshold（默认20%）时以退出码1结束，可在CI中提前发现热点路径的性能回退。
+
+用法: python -m benchmarks.bench_micro [--filter stats] [--repeat 7] [--min-time 0.05]
+      [--save-baseline baseline.json] [--compare baseline.json] [--threshold 20]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.bench_load import configure_environment, fund_code, git_revision, seed_database
+
+REALTIME_SCALES = [10, 100, 1000]
+HISTORY_SCALES = [30, 365]
+EXTRACT_SCALES = [100, 1000, 5000]
+CACHE_SCALES = [10, 100, 1000]
+BATCH_SCALES = [10, 100, 500]
+
+# (名称, 被测函数, 每次调用前执行且不计时的准备函数)
+Case = Tuple[str, Callable, Optional[Callable]]
+
+
+def quote(code: str) -> Dict:
+    from decimal import Decimal
+
+    nav = Decimal(1000 + int(code) % 1000) / 1000
+    return {
+        "fund_code": code,
+        "fund_name": f"压测基金{code}",
+        "last_nav": nav,
+        "estimated_nav": nav * Decimal("1.01"),
+        "estimated_growth_rate": Decimal("1.00"),
+        "estimated_time": "2024-01-01 15:00",
+        "last_nav_date": "2024-01-01",
+    }
+
+
+def warm_fund_cache(codes: List[str]):
+    """直接写入估值缓存，被测路径全部命中"""
+    from app.services.fund_service import fund_service
+
+    for code in codes:
+        fund_service.cache.set(code, quote(code))
+
+
+def build_ocr_lines(count: int, seed: int = 42) -> List[str]:
+    """合成OCR文本：基金名称、代码、金额、收益等行，夹杂资讯和界面文字"""
+    from app.services.ocr_service import _load_keywords
+
+    keywords = _load_keywords()
+    rng = random.Random(seed)
+    lines: List[str] = []
+    while len(lines) < count:
+        kind = rng.random()
+        if kind < 0.35:
+            name = f"{rng.choice(keywords['company_prefixes'])}{rng.choice(['中证', '沪深', '成长', '价值', '科技'])}" \
+                   f"{rng.choice(keywords['fund_types'])}{rng.choice(['A', 'C', ''])}"
+            lines.append(name)
+            if rng.random() < 0.3:
+                lines.append(f"{rng.randint(0, 999999):06d}")
+            lines.append(f"{rng.randint(100, 500000)}.{rng.randint(0, 99):02d}")
+            lines.append(f"{rng.choice(['+', '-'])}{rng.randint(0, 9999) / 100:.2f}")
+        elif kind < 0.5:
+            lines.append(f"{rng.choice(keywords['exclude'])}{rng.choice(['利好', '来了', '解读'])}")
+        else:
+            lines.append(rng.choice(["持有金额", "昨日收益", "持有收益", "全部", "基金", "理财", "我的"]))
+    return lines[:count]
+
+
+def build_jsonp(code: str) -> str:
+    payload = {
+        "fundcode": code, "name": f"压测基金{code}", "jzrq": "2024-01-01", "dwjz": "1.2345",
+        "gsz": "1.2468", "gszzl": "1.00", "gztime": "2024-01-02 15:00",
+    }
+    return f"jsonpgz({json.dumps(payload, ensure_ascii=False)});"
+
+
+def build_cases(loop: asyncio.AbstractEventLoop) -> List[Case]:
+    from app.api.holdings import create_holdings_batch
+    from app.database import SessionLocal
+    from app.models import Holding, Portfolio
+    from app.schemas.holding import HoldingBatch
+    from app.services.fund_service import fund_service, parse_quote
+    from app.services.ocr_service import ocr_service
+    from app.services.stats_service import stats_service
+
+    cases: List[Case] = []
+
+    def with_session(func: Callable) -> Callable:
+        # 每次调用使用新的会话，与请求中的用法一致
+        def run():
+            db = SessionLocal()
+            try:
+                return func(db)
+            finally:
+                db.close()
+        return run
+
+    for count in REALTIME_SCALES:
+        portfolio_id = seed_database(1, count, 0)[0]
+        db = SessionLocal()
+        warm_fund_cache([h.fund_code for h in db.query(Holding).filter(Holding.portfolio_id == portfolio_id)])
+        db.close()
+        cases.append((f"stats.realtime[{count}]", with_session(
+            lambda db, pid=portfolio_id: loop.run_until_complete(stats_service.calculate_realtime_stats(db, pid))
+        ), None))
+
+    history_id = seed_database(1, 1, max(HISTORY_SCALES))[0]
+    for days in HISTORY_SCALES:
+        cases.append((f"stats.history[{days}]", with_session(
+            lambda db, d=days: stats_service.get_history_stats(db, history_id, d)
+        ), None))
+
+    for count in EXTRACT_SCALES:
+        lines = build_ocr_lines(count)
+        cases.append((f"ocr.extract[{count}]", lambda lines=lines: ocr_service._extract_fund_info(lines), None))
+
+    for count in CACHE_SCALES:
+        codes = [fund_code(900000 + i) for i in range(count)]
+        warm_fund_cache(codes)
+        cases.append((f"fund.cache[{count}]", lambda codes=codes: loop.run_until_complete(
+            fund_service.get_funds_realtime_batch(codes)
+        ), None))
+
+    text = build_jsonp("000001")
+    cases.append(("fund.jsonp", lambda: parse_quote(text), None))
+
+    for count in BATCH_SCALES:
+        rng = random.Random(count)
+        batch = HoldingBatch(holdings=[
+            {
+                "fund_code": fund_code(i),
+                "fund_name": f"压测基金{i}",
+                "shares": f"{rng.randint(100, 100000)}.00",
+                "amount": f"{rng.randint(100, 100000)}.00",
+                # 部分条目带识别名称，覆盖别名记录
+                "ocr_name": f"压测基金{i}" if i % 3 == 0 else None,
+            }
+            for i in range(count)
+        ])
+        target = {}
+
+        def new_portfolio(target=target):
+            db = SessionLocal()
+            try:
+                portfolio = Portfolio(name="微基准导入")
+                db.add(portfolio)
+                db.commit()
+                target["id"] = portfolio.id
+            finally:
+                db.close()
+
+        cases.append((f"holdings.batch[{count}]", with_session(
+            lambda db, batch=batch, target=target: create_holdings_batch(target["id"], batch, db)
+        ), new_portfolio))
+
+    return cases
+
+
+def measure(func: Callable, setup: Optional[Callable], repeat: int, min_time: float) -> float:
+    """返回每次调用耗时（秒）的中位数；需要准备函数的用例每轮只调用一次"""
+    if setup is not None:
+        samples = []
+        for _ in range(repeat + 1):
+            setup()
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples[1:])
+
+    # 确定单轮调用次数，同时作为预热
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="服务层与数据路径微基准测试")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=7, help="每项的轮数")
+    parser.add_argument("--min-time", type=float, default=0.05, help="单轮最短耗时（秒）")
+    parser.add_argument("--save-baseline", help="把结果保存为基线JSON")
+    parser.add_argument("--compare", help="与基线JSON对比")
+    parser.add_argument("--threshold", type=float, default=20, help="判定为性能回退的变慢比例（%%）")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.compare) if args.compare else {}
+    results: Dict[str, float] = {}
+    regressions = []
+
+    with tempfile.TemporaryDirectory(prefix="bench_micro_") as workdir:
+        configure_environment(workdir)
+        # 导入app以创建数据表，与服务运行时的数据库监听等配置一致
+        import app.main  # noqa: F401
+
+        loop = asyncio.new_event_loop()
+        try:
+            cases = build_cases(loop)
+            if args.filter:
+                cases = [case for case in cases if args.filter in case[0]]
+
+            header = f"{'用例':<24}{'每次耗时':>12}"
+            if baseline:
+                header += f"{'基线':>12}{'变化':>10}"
+            print(header)
+            for name, func, setup in cases:
+                elapsed = measure(func, setup, args.repeat, args.min_time)
+                results[name] = elapsed
+                line = f"{name:<24}{format_time(elapsed):>12}"
+                if name in baseline:
+                    change = (elapsed / baseline[name] - 1) * 100
+                    line += f"{format_time(baseline[name]):>12}{change:>+9.1f}%"
+                    if change > args.threshold:
+                        regressions.append(name)
+                        line += "  回退"
+                print(line)
+        finally:
+            loop.close()
+
+    if args.save_baseline:
+        report = {
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "results": results,
+        }
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到 {args.save_baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} 项变慢超过 {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
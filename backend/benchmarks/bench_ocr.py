@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+OCR端到端基准测试
+
+在合成截图语料上运行 OCRService.recognize_from_image（不补充基金信息、不使用结果缓存），
+语料按基金数量、截图宽度（高度随之变化）、字体、字号和噪声等级组合生成，附带代码/名称/金额标注。
+报告：
+- 每百万像素延迟
+- 各阶段耗时：解码、预处理、分割、推理、合并、提取、去重
+- 基金级精确率和召回率：代码（无代码时名称）和金额都一致才算正确
+--engine-profiles 指定多个推理档位时，同一语料在每个档位上各运行一遍，汇总按档位对比。
+默认需要安装PaddleOCR；--engine fake 不加载模型，只测量识别以外各阶段的开销。
+结果可用 --output 保存为JSON，便于对比改动前后。
+
+用法: python -m benchmarks.bench_ocr [--sizes 5,20,40] [--widths 1080,720]
+      [--noise clean,light,heavy] [--fonts 1] [--font-scales 1.0]
+      [--engine-profiles default,cpu,cpu_fast] [--output result.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from itertools import product
+from typing import Dict, List, Tuple
+import cv2
+from app.config import settings
+from app.services.ocr_engine import ENGINE_PROFILES, ENGINES
+from app.utils.image_io import decode_image
+from benchmarks.synthetic import NOISE_LEVELS, find_fonts, generate_sample
+
+STAGES = ["decode", "preprocess", "split", "infer", "merge", "extract", "dedupe"]
+STAGE_NAMES = ["解码", "预处理", "分割", "推理", "合并", "提取", "去重"]
+
+
+def match_funds(predicted: List[Dict], expected: List[Dict]) -> int:
+    """统计识别正确的基金数，每条标注最多匹配一次"""
+    by_code = {fund["fund_code"]: fund for fund in expected}
+    by_name = {fund["fund_name"]: fund for fund in expected}
+    matched = set()
+    for item in predicted:
+        label = by_code.get(item.get("fund_code")) or by_name.get(item.get("fund_name"))
+        if label is None or label["fund_code"] in matched:
+            continue
+        if abs(item["amount"] - label["amount"]) < 0.005:
+            matched.add(label["fund_code"])
+    return len(matched)
+
+
+async def run_sample(service, sample: Dict) -> Dict:
+    """按上传路径编码再解码，识别并记录各阶段耗时"""
+    encoded = cv2.imencode(".png", sample["image"])[1]
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    image = decode_image(encoded)
+    timings["decode"] = time.perf_counter() - start
+    funds = await service.recognize_from_image(image, enrich_info=False, timings=timings)
+    total = time.perf_counter() - start
+
+    correct = match_funds(funds, sample["funds"])
+    return {
+        "height": image.shape[0],
+        "width": image.shape[1],
+        "megapixels": image.shape[0] * image.shape[1] / 1e6,
+        "total": total,
+        "timings": timings,
+        "predicted": len(funds),
+        "expected": len(sample["funds"]),
+        "correct": correct,
+    }
+
+
+def precision_recall(correct: int, predicted: int, expected: int) -> Tuple[float, float]:
+    return (correct / predicted if predicted else 0.0), (correct / expected if expected else 0.0)
+
+
+def build_corpus(args) -> List[Dict]:
+    """按参数组合生成语料，每一项为 {"meta": 生成参数, "sample": 截图与标注}"""
+    fonts = find_fonts()[:args.fonts] or [None]
+    if fonts == [None]:
+        print("未找到中文字体（可设置 BENCH_FONT），中文将渲染为方块，精确率和召回率仅供参考")
+    sizes = [int(s) for s in args.sizes.split(",")]
+    widths = [int(w) for w in args.widths.split(",")]
+    noises = args.noise.split(",")
+    scales = [float(s) for s in args.font_scales.split(",")]
+
+    corpus = []
+    for seed, (count, width, noise, scale, (font_idx, font)) in enumerate(
+            product(sizes, widths, noises, scales, enumerate(fonts)), start=2025):
+        sample = generate_sample(count, seed=seed, width=width, font_path=font, font_scale=scale, noise=noise)
+        corpus.append({
+            "meta": {"funds": count, "noise": noise, "font_scale": scale, "font": font, "font_idx": font_idx},
+            "sample": sample,
+        })
+    return corpus
+
+
+async def run_profile(args, profile: str, corpus: List[Dict]) -> List[Dict]:
+    """在一个推理档位上运行整个语料"""
+    from app.services.ocr_service import OCRService
+    settings.OCR_ENGINE = args.engine
+    settings.OCR_ENGINE_PROFILE = profile
+    service = OCRService()
+    service.cache = None
+    await service.pool.wait_ready()
+
+    # 预热：首次推理包含模型内部初始化，不计入结果
+    await run_sample(service, generate_sample(2, seed=1))
+
+    print(f"\n推理档位 {profile}")
+    header = f"{'基金':>4}{'宽':>6}{'高':>7}  {'噪声':<6}{'字号':>5}{'字体':>4}{'ms/MP':>9}"
+    header += "".join(f"{name:>7}" for name in STAGE_NAMES) + f"{'精确率':>8}{'召回率':>8}"
+    print(header)
+
+    rows = []
+    for item in corpus:
+        meta = item["meta"]
+        # 重复识别时取耗时最短的一次
+        result = min([await run_sample(service, item["sample"]) for _ in range(args.repeat)],
+                     key=lambda row: row["total"])
+        result.update(meta, engine_profile=profile)
+        rows.append(result)
+
+        precision, recall = precision_recall(result["correct"], result["predicted"], result["expected"])
+        line = (f"{meta['funds']:>4}{result['width']:>6}{result['height']:>7}  {meta['noise']:<6}"
+                f"{meta['font_scale']:>5.2f}{meta['font_idx']:>4}"
+                f"{result['total'] * 1000 / result['megapixels']:>9.1f}")
+        line += "".join(f"{result['timings'].get(stage, 0) * 1000:>7.1f}" for stage in STAGES)
+        line += f"{precision:>8.1%}{recall:>8.1%}"
+        print(line)
+
+    service.shutdown()
+    return rows
+
+
+def summarize(rows: List[Dict]):
+    """按推理档位和噪声等级汇总，并给出每个档位的总体结果"""
+    print("\n汇总")
+    print(f"{'档位':<10}{'噪声':<8}{'样本':>5}{'ms/MP':>9}{'推理占比':>9}{'精确率':>8}{'召回率':>8}")
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["engine_profile"], row["noise"]), []).append(row)
+        groups.setdefault((row["engine_profile"], "全部"), []).append(row)
+    for (profile, noise), group in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1] == "全部")):
+        megapixels = sum(row["megapixels"] for row in group)
+        total = sum(row["total"] for row in group)
+        infer = sum(row["timings"].get("infer", 0) for row in group)
+        precision, recall = precision_recall(
+            sum(row["correct"] for row in group),
+            sum(row["predicted"] for row in group),
+            sum(row["expected"] for row in group)
+        )
+        print(f"{profile:<10}{noise:<8}{len(group):>5}{total * 1000 / megapixels:>9.1f}{infer / total:>9.1%}"
+              f"{precision:>8.1%}{recall:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR端到端基准测试")
+    parser.add_argument("--sizes", default="5,20,40", help="每张截图的基金数量，逗号分隔")
+    parser.add_argument("--widths", default="1080,720", help="截图宽度，逗号分隔")
+    parser.add_argument("--noise", default=",".join(NOISE_LEVELS), help="噪声等级，逗号分隔")
+    parser.add_argument("--fonts", type=int, default=1, help="使用本机找到的前几个中文字体")
+    parser.add_argument("--font-scales", default="1.0", help="字号比例，逗号分隔，如 0.9,1.0,1.15")
+    parser.add_argument("--repeat", type=int, default=1, help="每张截图的识别次数，取最快的一次")
+    parser.add_argument("--verbose", action="store_true", help="显示识别过程的调试输出")
+    parser.add_argument("--profile", choices=["off", "accurate", "balanced", "fast"],
+                        help="预处理配置，默认使用 OCR_PREPROCESS_PROFILE")
+    parser.add_argument("--engine", default="paddle", choices=list(ENGINES), help="推理引擎")
+    parser.add_argument("--engine-profiles", default=None,
+                        help=f"推理档位，逗号分隔，可选 {','.join(ENGINE_PROFILES)}，默认使用 OCR_ENGINE_PROFILE")
+    parser.add_argument("--output", help="把每张截图的结果保存为JSON")
+    args = parser.parse_args()
+
+    # 识别过程的日志会打乱表格，默认只显示警告
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+
+    if args.engine == "paddle":
+        try:
+            import paddleocr  # noqa: F401
+        except ImportError:
+            parser.exit(1, "未安装PaddleOCR，无法运行OCR基准测试（可用 --engine fake 测量其他阶段）\n")
+    if args.profile:
+        settings.OCR_PREPROCESS_PROFILE = args.profile
+    profiles = args.engine_profiles.split(",") if args.engine_profiles else [settings.OCR_ENGINE_PROFILE]
+
+    corpus = build_corpus(args)
+    rows = []
+    for profile in profiles:
+        rows += asyncio.run(run_profile(args, profile, corpus))
+    summarize(rows)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"preprocess_profile": settings.OCR_PREPROCESS_PROFILE, "rows": rows}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
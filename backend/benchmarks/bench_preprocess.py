@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+图片预处理基准测试
+
+在合成截图上分别测量每个预处理步骤和每个预处理配置：
+- 预处理耗时
+- 像素比：处理后像素数 / 原图像素数
+- 数据比：处理后字节数 / 原图字节数（灰度图为单通道）
+加 --ocr 且已安装PaddleOCR时，额外测量识别耗时、标注文字召回率和基金提取召回率，
+用于在速度和准确率之间选择 OCR_PREPROCESS_PROFILE。
+
+用法: python -m benchmarks.bench_preprocess [--sizes 5,10,20] [--ocr]
+"""
+
+import argparse
+import time
+from typing import Dict, List, Tuple
+import cv2
+from app.services.ocr_service import OCRService
+from benchmarks.synthetic import generate_corpus, find_fonts
+
+WINDOW_HEIGHT = 800
+
+# 单独测量的步骤
+STEPS = {
+    "原图": {},
+    "裁剪系统栏": {"crop_chrome": True},
+    "灰度": {"grayscale": True},
+    "文字高24": {"text_height": 24},
+    "文字高16": {"text_height": 16},
+    "裁右侧40%": {"crop_right": 0.6},
+}
+
+
+def run_ocr(service: OCRService, engine, image) -> Tuple[float, List[str]]:
+    """按服务的分割方式识别整张图片，返回 (耗时秒, 文本行)"""
+    start = time.perf_counter()
+    lines = []
+    for top, bottom in service._segment_bounds(image, WINDOW_HEIGHT):
+        segment = image[top:bottom]
+        if segment.ndim == 2:
+            segment = cv2.cvtColor(segment, cv2.COLOR_GRAY2BGR)
+        lines.extend(line["text"] for line in engine.recognize(segment))
+    return time.perf_counter() - start, lines
+
+
+def recall(service: OCRService, sample: Dict, lines: List[str]) -> Tuple[float, float]:
+    """返回 (名称与金额文字召回率, 基金提取召回率)"""
+    texts = {line.strip() for line in lines}
+    expected = []
+    for fund in sample["funds"]:
+        expected += [fund["fund_name"], f"{fund['amount']:,.2f}"]
+    text_recall = sum(1 for text in expected if text in texts) / len(expected)
+
+    extracted = {(item["fund_name"], round(item["amount"], 2)) for item in service._extract_fund_info(lines)}
+    found = sum(1 for fund in sample["funds"] if (fund["fund_name"], fund["amount"]) in extracted)
+    return text_recall, found / len(sample["funds"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图片预处理基准测试")
+    parser.add_argument("--sizes", default="5,10,20", help="每张截图的基金数量，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=10, help="预处理耗时的重复次数")
+    parser.add_argument("--ocr", action="store_true", help="运行PaddleOCR测量识别耗时和召回率")
+    args = parser.parse_args()
+
+    if not find_fonts():
+        print("未找到中文字体（可设置 BENCH_FONT），中文将渲染为方块，召回率仅供参考")
+
+    service = OCRService()
+    ocr = None
+    if args.ocr:
+        from app.config import settings
+        from app.services.ocr_engine import create_engine, resolve_engine_config
+        ocr = create_engine("paddle", resolve_engine_config(settings.OCR_ENGINE_PROFILE))
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    corpus = generate_corpus(sizes, seed=2024)
+    variants = dict(STEPS)
+    for name, profile in service.PREPROCESS_PROFILES.items():
+        if name != "off":
+            variants[f"配置:{name}"] = profile
+
+    header = f"{'基金数':>6}  {'预处理':<12}{'耗时ms':>8}{'像素比':>8}{'数据比':>8}"
+    if ocr is not None:
+        header += f"{'OCR秒':>8}{'文字召回':>8}{'基金召回':>8}"
+    print(header)
+
+    for count, sample in zip(sizes, corpus):
+        image = sample["image"]
+        for name, profile in variants.items():
+            service._preprocess_image(image, profile)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                processed, _ = service._preprocess_image(image, profile)
+            elapsed_ms = (time.perf_counter() - start) / args.repeat * 1000
+            pixel_ratio = processed.shape[0] * processed.shape[1] / (image.shape[0] * image.shape[1])
+            row = f"{count:>6}  {name:<12}{elapsed_ms:>8.2f}{pixel_ratio:>8.2f}{processed.nbytes / image.nbytes:>8.2f}"
+            if ocr is not None:
+                ocr_seconds, lines = run_ocr(service, ocr, processed)
+                text_recall, fund_recall = recall(service, sample, lines)
+                row += f"{ocr_seconds:>8.2f}{text_recall:>8.1%}{fund_recall:>8.1%}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+长图分割基准测试
+
+在合成截图上对比原50%重叠滑动窗口与按空白带切分：
+- 分割耗时、片段数
+- 送入OCR的像素量（相对原图）
+- 被片段边界截断的文字行数（任何一个片段都不能完整包含该行）
+- 残行数：片段边界穿过文字行，片段中只包含该行一部分的次数（产生残缺文本）
+加 --ocr 且已安装PaddleOCR时，额外对比识别耗时和标注文字的召回率。
+
+用法: python -m benchmarks.bench_segmentation [--sizes 5,10,20,40] [--ocr]
+"""
+
+import argparse
+import time
+from typing import Dict, List, Tuple
+from app.services.ocr_service import OCRService
+from benchmarks.synthetic import generate_corpus, find_fonts
+
+WINDOW_HEIGHT = 800
+
+
+def sliding_window_bounds(height: int, window_height: int) -> List[Tuple[int, int]]:
+    """原实现：50%重叠的滑动窗口"""
+    if height <= window_height:
+        return [(0, height)]
+    bounds = []
+    y = 0
+    while y < height:
+        end_y = min(y + window_height, height)
+        bounds.append((y, end_y))
+        if end_y >= height:
+            break
+        y += window_height // 2
+    return bounds
+
+
+def count_cut_lines(lines: List[Dict], bounds: List[Tuple[int, int]]) -> int:
+    """统计没有被任何片段完整包含的文字行"""
+    cut = 0
+    for line in lines:
+        top, bottom = line["box"][1], line["box"][3]
+        if not any(start <= top and bottom <= end for start, end in bounds):
+            cut += 1
+    return cut
+
+
+def count_partial_lines(lines: List[Dict], bounds: List[Tuple[int, int]]) -> int:
+    """统计片段边界穿过文字行的次数"""
+    partial = 0
+    for line in lines:
+        top, bottom = line["box"][1], line["box"][3]
+        for start, end in bounds:
+            overlaps = top < end and bottom > start
+            if overlaps and not (start <= top and bottom <= end):
+                partial += 1
+    return partial
+
+
+def ocr_recall(engine, sample: Dict, bounds: List[Tuple[int, int]]) -> Tuple[float, float]:
+    """识别各片段，返回 (耗时秒, 标注文字召回率)"""
+    start = time.perf_counter()
+    texts = set()
+    for top, bottom in bounds:
+        texts.update(line["text"].strip() for line in engine.recognize(sample["image"][top:bottom]))
+    elapsed = time.perf_counter() - start
+    expected = [line["text"] for line in sample["lines"]]
+    found = sum(1 for text in expected if text in texts)
+    return elapsed, found / len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长图分割基准测试")
+    parser.add_argument("--sizes", default="5,10,20,40", help="每张截图的基金数量，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=20, help="分割耗时的重复次数")
+    parser.add_argument("--ocr", action="store_true", help="运行PaddleOCR对比识别耗时和召回率")
+    args = parser.parse_args()
+
+    if not find_fonts():
+        print("未找到中文字体（可设置 BENCH_FONT），中文将渲染为方块，召回率仅供参考")
+
+    service = OCRService()
+    ocr = None
+    if args.ocr:
+        from app.config import settings
+        from app.services.ocr_engine import create_engine, resolve_engine_config
+        ocr = create_engine("paddle", resolve_engine_config(settings.OCR_ENGINE_PROFILE))
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    corpus = generate_corpus(sizes, seed=2024)
+
+    strategies = {
+        "滑动窗口": lambda image: sliding_window_bounds(image.shape[0], WINDOW_HEIGHT),
+        "空白带": lambda image: service._segment_bounds(image, WINDOW_HEIGHT),
+    }
+
+    header = f"{'基金数':>6}{'高度':>8}  {'策略':<8}{'分割ms':>8}{'片段':>6}{'像素比':>8}{'截断行':>8}{'残行':>6}"
+    if ocr is not None:
+        header += f"{'OCR秒':>8}{'召回率':>8}"
+    print(header)
+
+    for count, sample in zip(sizes, corpus):
+        image = sample["image"]
+        height, width = image.shape[:2]
+        for name, split in strategies.items():
+            split(image)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                bounds = split(image)
+            split_ms = (time.perf_counter() - start) / args.repeat * 1000
+            pixels = sum(bottom - top for top, bottom in bounds) * width
+            row = (f"{count:>6}{height:>8}  {name:<8}{split_ms:>8.2f}{len(bounds):>6}"
+                   f"{pixels / (height * width):>8.2f}{count_cut_lines(sample['lines'], bounds):>8}"
+                   f"{count_partial_lines(sample['lines'], bounds):>6}")
+            if ocr is not None:
+                elapsed, recall = ocr_recall(ocr, sample, bounds)
+                row += f"{elapsed:>8.2f}{recall:>8.1%}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+收益统计响应序列化基准测试
+
+对比 FastAPI 默认路径（jsonable_encoder + json.dumps）、pydantic 直接序列化、
+列式JSON 和 msgpack 的耗时与体积，结果按每1000条持仓/历史记录折算。
+
+用法: python -m benchmarks.bench_serialization [--holdings 1000] [--repeat 50]
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from app.schemas.stats import RealtimeStats, HoldingStats, HistoryStats, HistoryPoint
+from app.utils.serialization import (
+    JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, msgpack,
+    encode_realtime, encode_history
+)
+
+
+def build_realtime(count: int) -> RealtimeStats:
+    rng = random.Random(42)
+    holdings = []
+    for i in range(count):
+        shares = Decimal(rng.randint(100, 1000000)) / 100
+        cost_nav = Decimal(rng.randint(5000, 50000)) / 10000
+        current_nav = Decimal(rng.randint(5000, 50000)) / 10000
+        value = shares * current_nav
+        cost = shares * cost_nav
+        holdings.append(HoldingStats(
+            fund_code=f"{i:06d}",
+            fund_name=f"测试基金{i}混合A",
+            shares=shares,
+            cost_nav=cost_nav,
+            current_nav=current_nav,
+            value=value,
+            profit=value - cost,
+            profit_rate=(value - cost) / cost * 100
+        ))
+    total_cost = sum((h.shares * h.cost_nav for h in holdings), Decimal("0"))
+    total_value = sum((h.value for h in holdings), Decimal("0"))
+    return RealtimeStats(
+        portfolio_id=1,
+        portfolio_name="基准组合",
+        total_cost=total_cost,
+        total_value=total_value,
+        total_profit=total_value - total_cost,
+        total_profit_rate=(total_value - total_cost) / total_cost * 100,
+        holdings=holdings,
+        updated_at="2024-01-01T12:00:00"
+    )
+
+
+def build_history(count: int) -> HistoryStats:
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    points = []
+    for i in range(count):
+        value = Decimal(rng.randint(1000000, 9000000)) / 100
+        cost = Decimal(rng.randint(1000000, 9000000)) / 100
+        points.append(HistoryPoint(
+            date=start + timedelta(days=i),
+            total_value=value,
+            total_cost=cost,
+            daily_profit=Decimal(rng.randint(-100000, 100000)) / 100,
+            daily_profit_rate=Decimal(rng.randint(-1000, 1000)) / 100,
+            cumulative_profit=value - cost,
+            cumulative_profit_rate=(value - cost) / cost * 100
+        ))
+    return HistoryStats(portfolio_id=1, portfolio_name="基准组合", history=points)
+
+
+def fastapi_default(obj) -> bytes:
+    """模拟 FastAPI response_model 的默认序列化路径"""
+    data = type(obj).model_validate(obj.model_dump()).model_dump(mode="json")
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False).encode()
+
+
+def timeit(func, repeat: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(name: str, obj, encode, count: int, repeat: int):
+    cases = [
+        ("fastapi默认", lambda: fastapi_default(obj)),
+        ("json", lambda: encode(obj, JSON_MEDIA_TYPE)),
+        ("列式json", lambda: encode(obj, COLUMNAR_MEDIA_TYPE)),
+    ]
+    if msgpack is not None:
+        cases.append(("msgpack", lambda: encode(obj, MSGPACK_MEDIA_TYPE)))
+
+    print(f"\n{name}（{count} 条）")
+    print(f"  {'格式':<12}{'ms/1k条':>10}{'字节/条':>10}")
+    for label, func in cases:
+        elapsed = timeit(func, repeat)
+        size = len(func())
+        print(f"  {label:<12}{elapsed * 1000 * 1000 / count:>10.3f}{size / count:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="收益统计序列化基准测试")
+    parser.add_argument("--holdings", type=int, default=1000, help="持仓/历史记录条数")
+    parser.add_argument("--repeat", type=int, default=50, help="重复次数")
+    args = parser.parse_args()
+
+    if msgpack is None:
+        print("未安装 msgpack，跳过 msgpack 格式")
+    run("实时收益", build_realtime(args.holdings), encode_realtime, args.holdings, args.repeat)
+    run("历史收益", build_history(args.holdings), encode_history, args.holdings, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+上传解码路径内存基准测试
+
+把一张合成长截图分别以文件上传和base64两种方式解码，对比旧路径和当前路径：
+- 文件/旧: await file.read() 读出完整bytes后 cv2.imdecode
+- 文件/新: EncodedImage.from_upload，落盘的上传文件经mmap解码
+- base64/旧: 切分前缀 + b64decode + PIL + np.array + cvtColor
+- base64/新: EncodedImage.from_base64，a2b_base64 后直接 cv2.imdecode
+每种路径在独立子进程中运行，报告解码一次的峰值RSS增量（输入数据不计入）和耗时。
+Linux 上解码前通过 /proc/self/clear_refs 重置峰值，其他平台退回 ru_maxrss，
+准备输入数据的峰值可能掩盖解码的峰值。
+
+用法: python -m benchmarks.bench_upload [--funds 80] [--format png]
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+CASES = ["file_old", "file_new", "base64_old", "base64_new"]
+CASE_NAMES = {
+    "file_old": "文件/旧",
+    "file_new": "文件/新",
+    "base64_old": "base64/旧",
+    "base64_new": "base64/新",
+}
+
+
+def reset_peak_rss() -> bool:
+    """把进程峰值RSS重置为当前RSS（Linux）"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mb() -> float:
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def file_old(path: str) -> np.ndarray:
+    with open(path, "rb") as f:
+        contents = f.read()
+    return cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+
+
+def file_new(path: str) -> np.ndarray:
+    from fastapi import UploadFile
+    from app.utils.image_io import EncodedImage
+    # 与multipart解析器相同：超过1MB的上传写入磁盘
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    with open(path, "rb") as f:
+        while chunk := f.read(64 * 1024):
+            spool.write(chunk)
+    with EncodedImage.from_upload(UploadFile(spool), 1 << 40) as encoded:
+        return encoded.decode()
+
+
+def base64_old(data: str) -> np.ndarray:
+    from PIL import Image
+    if ',' in data:
+        data = data.split(',')[1]
+    image = Image.open(io.BytesIO(base64.b64decode(data)))
+    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+
+def base64_new(data: str) -> np.ndarray:
+    from app.utils.image_io import EncodedImage
+    return EncodedImage.from_base64(data, 1 << 40).decode()
+
+
+def run_case(case: str, path: str) -> dict:
+    """在当前进程中执行一种解码路径"""
+    # 预先导入依赖，模块加载的内存不计入
+    import PIL.Image  # noqa: F401
+    import fastapi  # noqa: F401
+    import app.utils.image_io  # noqa: F401
+    if case.startswith("base64"):
+        with open(path, "rb") as f:
+            arg = "data:image/png;base64," + base64.b64encode(f.read()).decode()
+    else:
+        arg = path
+    func = globals()[case]
+    baseline = current_rss_mb() if reset_peak_rss() else peak_rss_mb()
+    start = time.perf_counter()
+    image = func(arg)
+    elapsed = time.perf_counter() - start
+    return {
+        "peak_mb": peak_rss_mb() - baseline,
+        "image_mb": image.nbytes / (1024 * 1024),
+        "ms": elapsed * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上传解码路径内存基准测试")
+    parser.add_argument("--funds", type=int, default=80, help="合成截图中的基金数量")
+    parser.add_argument("--format", default="png", choices=["png", "jpg"], help="图片编码格式")
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.input)))
+        return
+
+    from benchmarks.synthetic import generate_sample
+    image = generate_sample(args.funds, seed=2024)["image"]
+    # 叠加轻微噪声，接近真实截图的压缩体积
+    noise = np.random.default_rng(2024).integers(0, 3, image.shape, dtype=np.uint8)
+    image = cv2.add(image, noise)
+    ok, encoded = cv2.imencode(f".{args.format}", image)
+    assert ok
+
+    fd, path = tempfile.mkstemp(suffix=f".{args.format}")
+    with os.fdopen(fd, "wb") as f:
+        f.write(encoded.tobytes())
+    try:
+        print(f"图片 {image.shape[1]}x{image.shape[0]}，像素 {image.nbytes / 1048576:.1f}MB，"
+              f"文件 {encoded.nbytes / 1048576:.1f}MB")
+        print(f"{'路径':<12}{'峰值RSS增量MB':>14}{'峰值/像素':>10}{'耗时ms':>10}")
+        for case in CASES:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_upload", "--case", case, "--input", path],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            copies = result["peak_mb"] / result["image_mb"]
+            print(f"{CASE_NAMES[case]:<12}{result['peak_mb']:>14.1f}{copies:>10.2f}{result['ms']:>10.1f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
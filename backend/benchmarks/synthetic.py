@@ -0,0 +1,193 @@
+"""
+合成支付宝风格的基金持仓截图
+
+每张截图附带标注：基金代码、名称、金额，以及每行文字的位置，
+用于在本地衡量OCR分割和识别的效果，不需要真实截图。
+可改变基金数量、宽度（截图高度随之变化）、字体、字号和噪声。
+"""
+
+import os
+import random
+from typing import Dict, List, Optional
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# 常见系统中文字体，可通过环境变量 BENCH_FONT 指定
+FONT_CANDIDATES = [
+    "/System/Library/Fonts/PingFang.ttc",
+    "/System/Library/Fonts/STHeiti Medium.ttc",
+    "/System/Library/Fonts/Hiragino Sans GB.ttc",
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/wqy-microhei/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+]
+
+COMPANIES = ['华夏', '易方达', '广发', '南方', '博时', '富国', '招商', '汇添富', '嘉实', '鹏华',
+             '工银', '建信', '中欧', '兴全', '景顺长城', '天弘', '银华', '国泰', '华安', '前海开源']
+THEMES = ['蓝筹精选', '消费行业', '医疗健康', '新能源', '半导体', '沪深300', '中证500', '成长优选',
+          '价值精选', '科技创新', '高端制造', '稳健收益', '信用债', '纯债', '红利低波', '创业板']
+TYPES = ['混合A', '混合C', '股票A', '指数增强A', 'ETF联接A', 'ETF联接C', '债券A', '债券C', 'LOF']
+
+PAGE_BG = (245, 245, 245)
+CARD_BG = (255, 255, 255)
+TEXT_DARK = (33, 33, 33)
+TEXT_GRAY = (140, 140, 140)
+TEXT_RED = (232, 65, 58)
+TEXT_GREEN = (30, 160, 90)
+
+# 噪声等级：模拟截图被重新压缩、转发后的画质
+NOISE_LEVELS = {
+    "clean": {},
+    "light": {"sigma": 3.0, "jpeg_quality": 85},
+    "heavy": {"sigma": 8.0, "jpeg_quality": 55, "blur": 3},
+}
+
+
+def find_fonts() -> List[str]:
+    """返回本机可用的中文字体路径"""
+    env_font = os.environ.get("BENCH_FONT")
+    candidates = [env_font] if env_font else []
+    candidates += FONT_CANDIDATES
+    return [path for path in candidates if path and os.path.exists(path)]
+
+
+def load_font(path: Optional[str], size: int):
+    if path:
+        return ImageFont.truetype(path, size)
+    # 没有中文字体时使用Pillow自带字体，中文会显示为方块，仅适合测量分割与耗时
+    return ImageFont.load_default(size)
+
+
+def generate_funds(count: int, rng: random.Random) -> List[Dict]:
+    """生成不重复的基金标注"""
+    funds = []
+    used_names = set()
+    used_codes = set()
+    while len(funds) < count:
+        name = rng.choice(COMPANIES) + rng.choice(THEMES) + rng.choice(TYPES)
+        code = f"{rng.randint(1, 999999):06d}"
+        if name in used_names or code in used_codes:
+            continue
+        used_names.add(name)
+        used_codes.add(code)
+        amount = round(rng.uniform(100, 500000), 2)
+        funds.append({"fund_code": code, "fund_name": name, "amount": amount})
+    return funds
+
+
+def _draw_text(draw: ImageDraw.ImageDraw, lines: List[Dict], xy, text: str, font, fill):
+    draw.text(xy, text, font=font, fill=fill)
+    box = draw.textbbox(xy, text, font=font)
+    lines.append({"text": text, "box": box})
+
+
+def add_noise(image: np.ndarray, sigma: float = 0.0, jpeg_quality: Optional[int] = None,
+              blur: int = 0, seed: int = 0) -> np.ndarray:
+    """依次加入模糊、高斯噪声和JPEG重新压缩，不改变图片尺寸"""
+    if blur > 1:
+        image = cv2.GaussianBlur(image, (blur, blur), 0)
+    if sigma > 0:
+        noise = np.random.default_rng(seed).normal(0, sigma, image.shape)
+        image = np.clip(image + noise, 0, 255).astype(np.uint8)
+    if jpeg_quality is not None:
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        image = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    return image
+
+
+def render_screenshot(funds: List[Dict], width: int = 1080, font_path: Optional[str] = None,
+                      show_code: bool = True, seed: int = 0, font_scale: float = 1.0) -> Dict:
+    """渲染持仓截图
+
+    Args:
+        font_scale: 字号相对默认值的比例，模拟系统字体大小设置
+
+    Returns:
+        {"image": BGR图片, "funds": 基金标注, "lines": 每行文字及其外框}
+    """
+    rng = random.Random(seed)
+    scale = width / 1080
+    card_height = int(300 * scale)
+    header_height = int(560 * scale)
+    footer_height = int(160 * scale)
+    height = header_height + card_height * len(funds) + footer_height
+
+    image = Image.new("RGB", (width, height), PAGE_BG)
+    draw = ImageDraw.Draw(image)
+    lines: List[Dict] = []
+
+    def font(size):
+        return load_font(font_path, int(size * scale * font_scale))
+
+    margin = int(32 * scale)
+
+    # 状态栏与标题
+    _draw_text(draw, lines, (margin, int(20 * scale)), "9:41", font(34), TEXT_DARK)
+    _draw_text(draw, lines, (width // 2 - int(80 * scale), int(110 * scale)), "我的持仓", font(44), TEXT_DARK)
+
+    # 资产汇总
+    total = sum(f["amount"] for f in funds)
+    draw.rectangle([0, int(220 * scale), width, header_height - int(20 * scale)], fill=CARD_BG)
+    _draw_text(draw, lines, (margin, int(250 * scale)), "总金额(元)", font(30), TEXT_GRAY)
+    _draw_text(draw, lines, (margin, int(300 * scale)), f"{total:,.2f}", font(64), TEXT_DARK)
+    _draw_text(draw, lines, (margin, int(420 * scale)), "昨日收益", font(30), TEXT_GRAY)
+    _draw_text(draw, lines, (width // 2, int(420 * scale)), "持仓收益", font(30), TEXT_GRAY)
+
+    # 基金卡片
+    for idx, fund in enumerate(funds):
+        top = header_height + idx * card_height
+        draw.rectangle([0, top + int(16 * scale), width, top + card_height], fill=CARD_BG)
+
+        y = top + int(40 * scale)
+        _draw_text(draw, lines, (margin, y), fund["fund_name"], font(40), TEXT_DARK)
+        if show_code:
+            y += int(58 * scale)
+            _draw_text(draw, lines, (margin, y), fund["fund_code"], font(28), TEXT_GRAY)
+
+        y = top + int(160 * scale)
+        _draw_text(draw, lines, (margin, y), "金额", font(28), TEXT_GRAY)
+        _draw_text(draw, lines, (width // 2, y), "昨日收益", font(28), TEXT_GRAY)
+
+        y += int(44 * scale)
+        profit = round(rng.uniform(-500, 500), 2)
+        _draw_text(draw, lines, (margin, y), f"{fund['amount']:,.2f}", font(40), TEXT_DARK)
+        _draw_text(draw, lines, (width // 2, y), f"{profit:+,.2f}",
+                   font(40), TEXT_RED if profit >= 0 else TEXT_GREEN)
+
+    # 底部导航
+    draw.rectangle([0, height - footer_height, width, height], fill=CARD_BG)
+    for i, label in enumerate(["首页", "理财", "生活", "消息", "我的"]):
+        x = int((i + 0.35) * width / 5)
+        _draw_text(draw, lines, (x, height - int(100 * scale)), label, font(28), TEXT_GRAY)
+
+    bgr = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+    return {"image": bgr, "funds": funds, "lines": lines}
+
+
+def generate_sample(fund_count: int, seed: int = 0, width: int = 1080,
+                    font_path: Optional[str] = None, show_code: bool = True,
+                    font_scale: float = 1.0, noise: str = "clean") -> Dict:
+    """按种子生成一张带标注的截图
+
+    Args:
+        noise: NOISE_LEVELS 中的噪声等级
+    """
+    rng = random.Random(seed)
+    if font_path is None:
+        fonts = find_fonts()
+        font_path = fonts[0] if fonts else None
+    funds = generate_funds(fund_count, rng)
+    sample = render_screenshot(funds, width=width, font_path=font_path, show_code=show_code,
+                               seed=seed, font_scale=font_scale)
+    sample["image"] = add_noise(sample["image"], seed=seed, **NOISE_LEVELS[noise])
+    return sample
+
+
+def generate_corpus(sizes: List[int], seed: int = 0, **kwargs) -> List[Dict]:
+    """生成一组截图，sizes 为每张截图的基金数量"""
+    return [generate_sample(count, seed=seed + idx, **kwargs) for idx, count in enumerate(sizes)]
@@ -56,7 +56,32 @@ export const ocrAPI = {
       timeout: 300000  // OCR识别需要更长时间，设置5分钟超时
     })
   },
-  uploadBase64: (image) => api.post('/ocr/upload-base64', { image }, { timeout: 300000 })
+  uploadBase64: (image) => api.post('/ocr/upload-base64', { image }, { timeout: 300000 }),
+  // 多张截图一次上传，服务端并行识别并合并去重
+  uploadBatch: (files) => {
+    const formData = new FormData()
+    files.forEach(file => formData.append('files', file))
+    return api.post('/ocr/upload-batch', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+      timeout: 600000
+    })
+  },
+  // 异步识别任务：提交后立即返回任务ID，通过事件流获取进度
+  createJob: (file) => {
+    const formData = new FormData()
+    formData.append('file', file)
+    return api.post('/ocr/jobs', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' }
+    })
+  },
+  getJob: (jobId) => api.get(`/ocr/jobs/${jobId}`),
+  watchJob: (jobId, handlers) => {
+    const source = new EventSource(`${api.defaults.baseURL}/ocr/jobs/${jobId}/events`)
+    for (const [event, handler] of Object.entries(handlers)) {
+      source.addEventListener(event, (e) => handler(JSON.parse(e.data)))
+    }
+    return source
+  }
 }
 
 export default api